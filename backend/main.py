@@ -1,4 +1,5 @@
 import os
+import json
 import asyncio
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List
@@ -11,6 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from backend.database import engine, Base, AsyncSessionLocal
 from backend.models.models import SocialMediaPost, SentimentAnalysis, SentimentAlert
 from backend.services.alerting import AlertService
+from backend.services.rollup import sentiment_counts
 
 app = FastAPI(title="Sentiment Analysis API", version="1.0.0")
 
@@ -24,6 +26,7 @@ app.add_middleware(
 
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+BROADCAST_CHANNEL = os.getenv("REDIS_BROADCAST_CHANNEL", "sentiment_updates")
 redis_client = None
 
 connected_websockets: List[WebSocket] = []
@@ -40,6 +43,8 @@ async def startup():
 
     alert_service = AlertService(db_session_maker=AsyncSessionLocal, redis_client=redis_client)
     asyncio.create_task(alert_service.run_monitoring_loop())
+    if BROADCAST_CHANNEL:
+        asyncio.create_task(relay_worker_updates())
 
 
 async def get_db():
@@ -162,22 +167,7 @@ async def get_analytics(
 ):
     threshold = datetime.now(timezone.utc) - timedelta(hours=hours)
 
-    query = select(
-        SentimentAnalysis.sentiment_label,
-        func.count().label("count")
-    ).where(SentimentAnalysis.analyzed_at >= threshold)
-
-    if platform:
-        query = query.join(SocialMediaPost, SocialMediaPost.post_id == SentimentAnalysis.post_id)
-        query = query.where(SocialMediaPost.platform == platform)
-
-    query = query.group_by(SentimentAnalysis.sentiment_label)
-    result = await db.execute(query)
-
-    counts = {"positive": 0, "negative": 0, "neutral": 0}
-    for label, count in result.all():
-        if label in counts:
-            counts[label] = count
+    counts = await sentiment_counts(db, threshold, platform=platform)
 
     positive_count = counts["positive"]
     negative_count = counts["negative"]
@@ -229,17 +219,7 @@ async def websocket_endpoint(websocket: WebSocket):
                     now = datetime.now(timezone.utc)
 
                     async def get_counts(since: datetime):
-                        result = await db.execute(
-                            select(
-                                SentimentAnalysis.sentiment_label,
-                                func.count().label("count")
-                            ).where(SentimentAnalysis.analyzed_at >= since)
-                            .group_by(SentimentAnalysis.sentiment_label)
-                        )
-                        counts = {"positive": 0, "negative": 0, "neutral": 0, "total": 0}
-                        for label, count in result.all():
-                            if label in counts:
-                                counts[label] = count
+                        counts = await sentiment_counts(db, since)
                         counts["total"] = counts["positive"] + counts["negative"] + counts["neutral"]
                         return counts
 
@@ -303,3 +283,41 @@ async def broadcast_metrics(metrics: dict):
         except Exception:
             if ws in connected_websockets:
                 connected_websockets.remove(ws)
+
+
+async def broadcast_emotion_updates(updates: list):
+    message = {
+        "type": "emotion_update",
+        "data": {"updates": updates},
+        "timestamp": datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+    }
+
+    for ws in connected_websockets[:]:
+        try:
+            await ws.send_json(message)
+        except Exception:
+            if ws in connected_websockets:
+                connected_websockets.remove(ws)
+
+
+async def relay_worker_updates():
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(BROADCAST_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] != "message" or not connected_websockets:
+                    continue
+                payload = json.loads(message["data"])
+                if payload.get("type") == "new_posts":
+                    for post in payload.get("posts", []):
+                        await broadcast_new_post(post)
+                elif payload.get("type") == "emotion_updates":
+                    await broadcast_emotion_updates(payload.get("updates", []))
+        except Exception as e:
+            print(f"Worker update relay error: {e}. Resubscribing in 5s...")
+        finally:
+            # Each attempt holds its own connection; release it before the
+            # next subscribe so Redis blips do not leak connections.
+            await pubsub.aclose()
+        await asyncio.sleep(5)
@@ -1 +1 @@
-from backend.models.models import SocialMediaPost, SentimentAnalysis, SentimentAlert
+from backend.models.models import SocialMediaPost, SentimentAnalysis, SentimentAlert, SentimentRollupMinute
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, JSON, UniqueConstraint
 from sqlalchemy.sql import func
 from backend.database import Base
 
@@ -17,6 +17,9 @@ class SocialMediaPost(Base):
 
 class SentimentAnalysis(Base):
     __tablename__ = "sentiment_analysis"
+    __table_args__ = (
+        UniqueConstraint("post_id", "model_name", name="uq_sentiment_analysis_post_model"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     post_id = Column(String(255), ForeignKey("social_media_posts.post_id", ondelete="CASCADE"), nullable=False, index=True)
@@ -27,6 +30,18 @@ class SentimentAnalysis(Base):
     analyzed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
 
+class SentimentRollupMinute(Base):
+    __tablename__ = "sentiment_rollup_minute"
+
+    # Emotion is part of the key, so rows still waiting for the deferred
+    # emotion lane are counted under "" rather than NULL.
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    platform = Column(String(50), primary_key=True)
+    sentiment_label = Column(String(20), primary_key=True)
+    emotion = Column(String(50), primary_key=True, default="")
+    count = Column(Integer, nullable=False, default=0)
+
+
 class SentimentAlert(Base):
     __tablename__ = "sentiment_alerts"
 
@@ -1,2 +1,3 @@
 from backend.services.sentiment_analyzer import SentimentAnalyzer
 from backend.services.alerting import AlertService
+from backend.services.inference_cache import InferenceCache
@@ -2,11 +2,11 @@ import os
 import asyncio
 from datetime import datetime, timezone, timedelta
 from typing import Optional
-from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.database import AsyncSessionLocal
-from backend.models.models import SentimentAnalysis, SentimentAlert
+from backend.models.models import SentimentAlert
+from backend.services.rollup import sentiment_counts
 
 
 class AlertService:
@@ -23,20 +23,7 @@ class AlertService:
             window_end = datetime.now(timezone.utc)
             window_start = window_end - timedelta(minutes=self.window_minutes)
 
-            result = await session.execute(
-                select(
-                    SentimentAnalysis.sentiment_label,
-                    func.count().label("count")
-                )
-                .where(SentimentAnalysis.analyzed_at >= window_start)
-                .where(SentimentAnalysis.analyzed_at <= window_end)
-                .group_by(SentimentAnalysis.sentiment_label)
-            )
-
-            counts = {"positive": 0, "negative": 0, "neutral": 0}
-            for label, count in result.all():
-                if label in counts:
-                    counts[label] = count
+            counts = await sentiment_counts(session, window_start, window_end)
 
             total = sum(counts.values())
 
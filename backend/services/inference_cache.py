@@ -0,0 +1,105 @@
+import os
+import json
+from collections import OrderedDict
+from typing import List, Optional
+
+from common.text_hash import text_hash
+
+
+class InferenceCache:
+    def __init__(self, redis_client=None, max_entries: int = None, ttl_seconds: int = None, prefix: str = None):
+        self.redis_client = redis_client
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("INFERENCE_CACHE_SIZE", "10000"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv("INFERENCE_CACHE_TTL_SECONDS", "86400"))
+        self.prefix = prefix or os.getenv("REDIS_CACHE_PREFIX", "sentiment_cache")
+        self._local = OrderedDict()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.redis_round_trips = 0
+
+    def _redis_key(self, model_name: str, digest: str) -> str:
+        # The model name is part of every key, so switching HUGGINGFACE_MODEL
+        # or EMOTION_MODEL makes old entries unreachable; the TTL reclaims them.
+        return f"{self.prefix}:{model_name}:{digest}"
+
+    def _remember(self, key: tuple, value: dict):
+        if self.max_entries <= 0:
+            return
+        self._local[key] = value
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def get_many(self, model_name: str, texts: List[str]) -> List[Optional[dict]]:
+        digests = [text_hash(text) for text in texts]
+        results = [None] * len(texts)
+        missing = []
+
+        for i, digest in enumerate(digests):
+            value = self._local.get((digest, model_name))
+            if value is not None:
+                self._local.move_to_end((digest, model_name))
+                results[i] = dict(value)
+                self.local_hits += 1
+            else:
+                missing.append(i)
+
+        if missing and self.redis_client is not None:
+            try:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for i in missing:
+                        pipe.hgetall(self._redis_key(model_name, digests[i]))
+                    stored = await pipe.execute()
+                self.redis_round_trips += 1
+
+                still_missing = []
+                for i, fields in zip(missing, stored):
+                    if fields:
+                        value = {
+                            (k.decode() if isinstance(k, bytes) else k): json.loads(v)
+                            for k, v in fields.items()
+                        }
+                        self._remember((digests[i], model_name), value)
+                        results[i] = dict(value)
+                        self.redis_hits += 1
+                    else:
+                        still_missing.append(i)
+                missing = still_missing
+            except Exception:
+                pass
+
+        self.misses += len(missing)
+        return results
+
+    async def set_many(self, model_name: str, texts: List[str], values: List[dict]):
+        if not texts:
+            return
+
+        digests = [text_hash(text) for text in texts]
+        for digest, value in zip(digests, values):
+            self._remember((digest, model_name), dict(value))
+
+        if self.redis_client is None:
+            return
+
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for digest, value in zip(digests, values):
+                    key = self._redis_key(model_name, digest)
+                    pipe.hset(key, mapping={k: json.dumps(v) for k, v in value.items()})
+                    pipe.expire(key, self.ttl_seconds)
+                await pipe.execute()
+            self.redis_round_trips += 1
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.local_hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            "local_entries": len(self._local),
+        }
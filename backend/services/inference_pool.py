@@ -0,0 +1,76 @@
+import os
+import math
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+_analyzer = None
+
+
+def _init_process(model_type: str, model_name: str, threads: int):
+    global _analyzer
+    # Thread counts must be pinned before torch spins up its own pools.
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except Exception:
+        pass
+
+    from backend.services.sentiment_analyzer import SentimentAnalyzer
+    _analyzer = SentimentAnalyzer(model_type=model_type, model_name=model_name, executor='thread')
+    print(f"Inference process {os.getpid()} ready ({threads} threads)")
+
+
+def _classify_in_process(kind: str, texts: List[str]) -> List[dict]:
+    from backend.services.sentiment_analyzer import run_batched
+
+    pipe = _analyzer._pipeline(kind)
+    if pipe is None:
+        raise RuntimeError(f"{kind} model is not loaded in inference process {os.getpid()}")
+    return run_batched(pipe, texts, _analyzer.batch_size)
+
+
+class InferencePool:
+    def __init__(self, model_type: str, model_name: str, processes: int = None,
+                 threads_per_process: int = None, max_pending: int = None):
+        cpus = os.cpu_count() or 1
+        self.processes = processes or int(os.getenv("INFERENCE_PROCESSES", str(max(1, cpus // 2))))
+        self.threads_per_process = threads_per_process or int(
+            os.getenv("INFERENCE_THREADS_PER_PROCESS", str(max(1, cpus // self.processes)))
+        )
+        self.max_pending = max_pending or int(os.getenv("INFERENCE_MAX_PENDING", str(self.processes * 2)))
+        self.batch_size = max(1, int(os.getenv("INFERENCE_BATCH_SIZE", "32")))
+        self._slots = None
+
+        # Forked children would inherit the parent's torch thread pools, so
+        # each inference process is spawned fresh and loads its own models.
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process,
+            initargs=(model_type, model_name, self.threads_per_process)
+        )
+
+    async def _submit(self, kind: str, texts: List[str]) -> List[dict]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, _classify_in_process, kind, texts)
+
+    async def classify(self, kind: str, texts: List[str]) -> List[dict]:
+        if not texts:
+            return []
+
+        chunk_size = max(self.batch_size, math.ceil(len(texts) / self.processes))
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        outputs = await asyncio.gather(*(self._submit(kind, chunk) for chunk in chunks))
+        return [output for chunk_output in outputs for output in chunk_output]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
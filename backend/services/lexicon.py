@@ -0,0 +1,198 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|[.,;:!?]")
+CLAUSE_BREAKS = frozenset(".,;:!?")
+
+NEGATORS = frozenset({
+    "not", "no", "never", "nothing", "nor", "neither", "hardly", "without", "cannot",
+    "don't", "doesn't", "didn't", "isn't", "wasn't", "aren't", "weren't",
+    "won't", "wouldn't", "can't", "couldn't", "shouldn't", "haven't", "hasn't",
+})
+
+EMOTION_PRIORITY = ["joy", "anger", "sadness", "surprise", "fear"]
+
+DEFAULT_LEXICON: Dict[str, Tuple[float, Optional[str]]] = {
+    "love": (1.0, "joy"),
+    "great": (1.0, "joy"),
+    "good": (1.0, None),
+    "nice": (1.0, None),
+    "amazing": (1.0, "joy"),
+    "excellent": (1.0, None),
+    "fantastic": (1.0, None),
+    "happy": (1.0, "joy"),
+    "best": (1.0, None),
+    "wonderful": (1.0, None),
+    "awesome": (1.0, None),
+    "excited": (1.0, "joy"),
+    "joy": (1.0, "joy"),
+    "thrilled": (1.0, "joy"),
+    "outstanding": (1.0, None),
+    "perfectly": (1.0, None),
+    "recommend": (0.5, None),
+    "hate": (-1.0, "anger"),
+    "terrible": (-1.0, None),
+    "awful": (-1.0, None),
+    "worst": (-1.0, None),
+    "disappointed": (-1.0, "sadness"),
+    "horrible": (-1.0, None),
+    "bad": (-1.0, None),
+    "poor": (-1.0, None),
+    "broken": (-1.0, None),
+    "unhelpful": (-1.0, None),
+    "angry": (-1.0, "anger"),
+    "furious": (-1.0, "anger"),
+    "mad": (-1.0, "anger"),
+    "frustrated": (-1.0, "anger"),
+    "sad": (-1.0, "sadness"),
+    "depressed": (-1.0, "sadness"),
+    "unhappy": (-1.0, "sadness"),
+    "scared": (-1.0, "fear"),
+    "fear": (-1.0, "fear"),
+    "disaster": (-1.0, None),
+    "scam": (-1.0, None),
+    "garbage": (-1.0, None),
+    "overpriced": (-0.5, None),
+    "waste of money": (-1.0, None),
+    "wow": (0.0, "surprise"),
+    "surprise": (0.0, "surprise"),
+    "surprised": (0.0, "surprise"),
+}
+
+
+class LexiconScorer:
+    def __init__(self, entries: Dict[str, Tuple[float, Optional[str]]] = None,
+                 negation_window: int = 3, negation_scale: float = 0.5):
+        self.negation_window = negation_window
+        self.negation_scale = negation_scale
+        self._terms: Dict[Tuple[str, ...], Tuple[float, Optional[str]]] = {}
+        self._prefixes = set()
+        for term, value in (entries if entries is not None else DEFAULT_LEXICON).items():
+            key = tuple(TOKEN_PATTERN.findall(term.lower()))
+            if not key:
+                continue
+            self._terms[key] = value
+            for n in range(1, len(key)):
+                self._prefixes.add(key[:n])
+
+    @classmethod
+    def from_file(cls, path: str, extend_default: bool = True, **kwargs) -> "LexiconScorer":
+        entries = dict(DEFAULT_LEXICON) if extend_default else {}
+        entries.update(load_lexicon_file(path))
+        return cls(entries, **kwargs)
+
+    def _match(self, tokens: List[str], start: int) -> Tuple[int, Optional[Tuple[float, Optional[str]]]]:
+        # Walk the longest phrase starting at `start`, extending only while
+        # the token sequence is still a prefix of some lexicon entry.
+        best_len, best = 0, None
+        end = start + 1
+        while end <= len(tokens):
+            key = tuple(tokens[start:end])
+            if key in self._terms:
+                best_len, best = end - start, self._terms[key]
+            if key not in self._prefixes:
+                break
+            end += 1
+        return best_len, best
+
+    def score(self, text: str) -> dict:
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        positive = negative = 0.0
+        hits = 0
+        emotions: Dict[str, float] = {}
+        last_negator = -self.negation_window - 1
+
+        i = 0
+        while i < len(tokens):
+            if tokens[i] in NEGATORS:
+                last_negator = i
+                i += 1
+                continue
+            if tokens[i] in CLAUSE_BREAKS:
+                last_negator = -self.negation_window - 1
+                i += 1
+                continue
+
+            length, entry = self._match(tokens, i)
+            if entry is None:
+                i += 1
+                continue
+
+            weight, emotion = entry
+            if weight:
+                hits += 1
+            if i - last_negator <= self.negation_window:
+                weight = -weight * self.negation_scale
+            elif emotion:
+                emotions[emotion] = emotions.get(emotion, 0.0) + max(abs(weight), 1.0)
+
+            if weight > 0:
+                positive += weight
+            else:
+                negative -= weight
+            i += length
+
+        margin = positive - negative
+        if margin > 0:
+            label = "positive"
+        elif margin < 0:
+            label = "negative"
+        else:
+            label = "neutral"
+
+        if not hits:
+            confidence = 0.70
+        elif label == "neutral":
+            confidence = 0.5
+        else:
+            confidence = min(0.99, 0.5 + 0.5 * abs(margin) / (positive + negative + 1.0))
+
+        emotion = "neutral"
+        if emotions:
+            top = max(emotions.values())
+            emotion = next(
+                (e for e in EMOTION_PRIORITY if emotions.get(e) == top),
+                max(emotions, key=emotions.get)
+            )
+
+        return {
+            "sentiment_label": label,
+            "confidence_score": round(confidence, 4),
+            "emotion": emotion,
+            "positive": positive,
+            "negative": negative,
+        }
+
+    def score_many(self, texts: List[str]) -> List[dict]:
+        return [self.score(text) for text in texts]
+
+
+def load_lexicon_file(path: str) -> Dict[str, Tuple[float, Optional[str]]]:
+    entries = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split("\t")
+            if len(parts) < 2:
+                raise ValueError(f"Invalid lexicon line in {path}: {line!r}")
+            emotion = parts[2].strip().lower() if len(parts) > 2 and parts[2].strip() else None
+            if emotion is not None and emotion not in EMOTION_PRIORITY:
+                raise ValueError(
+                    f"Unknown emotion {emotion!r} in {path}: {line!r} (expected one of {', '.join(EMOTION_PRIORITY)})"
+                )
+            entries[parts[0].strip()] = (float(parts[1]), emotion)
+    return entries
+
+
+_default_scorer = None
+
+
+def get_lexicon() -> LexiconScorer:
+    global _default_scorer
+    if _default_scorer is None:
+        path = os.getenv("LEXICON_PATH")
+        _default_scorer = LexiconScorer.from_file(path) if path else LexiconScorer()
+    return _default_scorer
@@ -0,0 +1,66 @@
+import os
+import re
+import json
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+MARKER_FILE = "snapshot.json"
+
+
+def snapshot_dir() -> str:
+    return os.getenv("MODEL_SNAPSHOT_DIR", "")
+
+
+def snapshot_path(model_name: str) -> str:
+    return os.path.join(snapshot_dir(), re.sub(r"[^A-Za-z0-9_.-]", "__", model_name))
+
+
+def resolve_model_source(model_name: str) -> str:
+    if not snapshot_dir():
+        return model_name
+    path = snapshot_path(model_name)
+    # The marker is written last, so a half-written snapshot is never used.
+    if os.path.exists(os.path.join(path, MARKER_FILE)):
+        return path
+    return model_name
+
+
+def save_snapshot(pipe, model_name: str) -> bool:
+    if not snapshot_dir():
+        return False
+
+    path = snapshot_path(model_name)
+    tmp_path = None
+    try:
+        os.makedirs(snapshot_dir(), exist_ok=True)
+        # Several workers can start on an empty volume at once. Each writes a
+        # private directory and renames it into place, so a reader never
+        # sees a marker next to weights another writer is still rewriting.
+        tmp_path = tempfile.mkdtemp(prefix=f".{os.path.basename(path)}.", dir=snapshot_dir())
+        pipe.save_pretrained(tmp_path, safe_serialization=True)
+        with open(os.path.join(tmp_path, MARKER_FILE), "w") as f:
+            json.dump({
+                "model_name": model_name,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            }, f)
+
+        if os.path.isdir(path) and not os.path.exists(os.path.join(path, MARKER_FILE)):
+            # Left behind by an interrupted save that wrote in place.
+            shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            if not os.path.exists(os.path.join(path, MARKER_FILE)):
+                raise
+            print(f"Model snapshot for {model_name} was saved by another process")
+            return True
+        tmp_path = None
+        print(f"Saved model snapshot for {model_name} to {path}")
+        return True
+    except Exception as e:
+        print(f"Failed to save model snapshot for {model_name}: {e}")
+        return False
+    finally:
+        if tmp_path is not None:
+            shutil.rmtree(tmp_path, ignore_errors=True)
@@ -0,0 +1,74 @@
+import os
+import json
+from typing import List
+
+SOURCE_FILE = "source.json"
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+
+
+class OnnxClassifier:
+    def __init__(self, model_dir: str, quantized: bool = None, threads: int = None):
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        if quantized is None:
+            quantized = os.getenv("ONNX_QUANTIZED", "true").lower() == "true"
+        model_path = os.path.join(model_dir, MODEL_FILE)
+        quantized_path = os.path.join(model_dir, QUANTIZED_MODEL_FILE)
+        if quantized and os.path.exists(quantized_path):
+            model_path = quantized_path
+
+        config = AutoConfig.from_pretrained(model_dir)
+        self.id2label = {int(k): v for k, v in config.id2label.items()}
+        self.multi_label = config.problem_type == "multi_label_classification"
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.source_model = None
+        source_path = os.path.join(model_dir, SOURCE_FILE)
+        if os.path.exists(source_path):
+            with open(source_path) as f:
+                self.source_model = json.load(f).get("model_name")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads or int(os.getenv("ONNX_THREADS", "0"))
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.model_path = model_path
+
+    def preprocess(self, texts: List[str]) -> dict:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=512,
+            return_tensors="np"
+        )
+        return {name: encoded[name].astype("int64") for name in self.input_names if name in encoded}
+
+    def postprocess(self, logits) -> List[list]:
+        import numpy as np
+
+        if self.multi_label:
+            probs = 1.0 / (1.0 + np.exp(-logits))
+        else:
+            shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+            probs = shifted / shifted.sum(axis=-1, keepdims=True)
+
+        best = probs.argmax(axis=-1)
+        return [
+            [{"label": self.id2label[int(i)], "score": float(row[i])}]
+            for i, row in zip(best, probs)
+        ]
+
+    def __call__(self, texts, batch_size: int = None, truncation: bool = True) -> List[list]:
+        if isinstance(texts, str):
+            texts = [texts]
+        batch_size = batch_size or len(texts)
+
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            feeds = self.preprocess(texts[start:start + batch_size])
+            logits = self.session.run(None, feeds)[0]
+            outputs.extend(self.postprocess(logits))
+        return outputs
@@ -0,0 +1,63 @@
+import os
+import json
+import argparse
+
+from backend.services.onnx_backend import SOURCE_FILE, MODEL_FILE, QUANTIZED_MODEL_FILE
+
+
+def export_model(model_name: str, output_dir: str, quantize: bool = True, opset: int = 14) -> str:
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["export sample text"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+    print(f"Exported {model_name} -> {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        print(f"Quantized {model_name} -> {quantized_path}")
+
+    with open(os.path.join(output_dir, SOURCE_FILE), "w") as f:
+        json.dump({"model_name": model_name, "quantized": quantize, "opset": opset}, f)
+    return model_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the configured sentiment and emotion models to ONNX.")
+    parser.add_argument("--output-dir", default=os.getenv("ONNX_MODEL_DIR", "models/onnx"))
+    parser.add_argument("--sentiment-model", default=os.getenv("HUGGINGFACE_MODEL", "distilbert-base-uncased-finetuned-sst-2-english"))
+    parser.add_argument("--emotion-model", default=os.getenv("EMOTION_MODEL", "j-hartmann/emotion-english-distilroberta-base"))
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 dynamic-quantized copy")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+
+    export_model(args.sentiment_model, os.path.join(args.output_dir, "sentiment"), not args.no_quantize, args.opset)
+    export_model(args.emotion_model, os.path.join(args.output_dir, "emotion"), not args.no_quantize, args.opset)
+
+
+if __name__ == "__main__":
+    main()
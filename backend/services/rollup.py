@@ -0,0 +1,114 @@
+import sys
+import asyncio
+import argparse
+from collections import Counter
+from datetime import datetime, timezone, timedelta
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from backend.models.models import SocialMediaPost, SentimentAnalysis, SentimentRollupMinute
+
+ROLLUP_KEY = ("bucket", "platform", "sentiment_label", "emotion")
+
+
+def minute_bucket(moment: datetime) -> datetime:
+    return moment.replace(second=0, microsecond=0)
+
+
+def rollup_deltas(entries: Iterable[Tuple[datetime, str, str, Optional[str], int]]) -> Counter:
+    deltas = Counter()
+    for analyzed_at, platform, sentiment_label, emotion, delta in entries:
+        deltas[(minute_bucket(analyzed_at), platform, sentiment_label, emotion or "")] += delta
+    return deltas
+
+
+def upsert_statement(deltas: Counter):
+    # Sorted keys make concurrent workers lock the shared minute rows in the
+    # same order, so their upserts queue instead of deadlocking.
+    rows = [
+        dict(zip(ROLLUP_KEY, key), count=count)
+        for key, count in sorted(deltas.items())
+        if count
+    ]
+    if not rows:
+        return None
+    stmt = insert(SentimentRollupMinute).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEY),
+        set_={"count": SentimentRollupMinute.count + stmt.excluded.count}
+    )
+
+
+async def sentiment_counts(session, since: datetime, until: datetime = None, platform: str = None) -> dict:
+    query = (
+        select(SentimentRollupMinute.sentiment_label, func.sum(SentimentRollupMinute.count))
+        .where(SentimentRollupMinute.bucket >= minute_bucket(since))
+    )
+    if until is not None:
+        query = query.where(SentimentRollupMinute.bucket <= until)
+    if platform:
+        query = query.where(SentimentRollupMinute.platform == platform)
+    result = await session.execute(query.group_by(SentimentRollupMinute.sentiment_label))
+
+    counts = {"positive": 0, "negative": 0, "neutral": 0}
+    for label, count in result.all():
+        if label in counts:
+            counts[label] = int(count or 0)
+    return counts
+
+
+async def rebuild(db_session_maker, since: datetime = None) -> int:
+    bucket = func.date_trunc("minute", SentimentAnalysis.analyzed_at)
+    emotion = func.coalesce(SentimentAnalysis.emotion, "")
+    source = (
+        select(bucket, SocialMediaPost.platform, SentimentAnalysis.sentiment_label, emotion, func.count())
+        .join(SocialMediaPost, SocialMediaPost.post_id == SentimentAnalysis.post_id)
+        .group_by(bucket, SocialMediaPost.platform, SentimentAnalysis.sentiment_label, emotion)
+    )
+    clear = delete(SentimentRollupMinute)
+    if since is not None:
+        since = minute_bucket(since)
+        source = source.where(SentimentAnalysis.analyzed_at >= since)
+        clear = clear.where(SentimentRollupMinute.bucket >= since)
+
+    async with db_session_maker() as session:
+        try:
+            # Workers block on the lock until the rebuild commits. Their
+            # uncommitted rows are not in the snapshot below, so their own
+            # upserts still apply once the lock is released.
+            await session.execute(text("LOCK TABLE sentiment_rollup_minute IN EXCLUSIVE MODE"))
+            await session.execute(clear)
+            result = await session.execute(
+                insert(SentimentRollupMinute).from_select(list(ROLLUP_KEY) + ["count"], source)
+            )
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+    return result.rowcount
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild sentiment_rollup_minute from sentiment_analysis.")
+    parser.add_argument("--since-hours", type=float, default=None,
+                        help="only rebuild buckets from this many hours ago (default: everything)")
+    args = parser.parse_args(argv)
+
+    from backend.database import AsyncSessionLocal, engine, Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    since = None
+    if args.since_hours is not None:
+        since = datetime.now(timezone.utc) - timedelta(hours=args.since_hours)
+    print(f"Rebuilding sentiment_rollup_minute {'from ' + since.isoformat() if since else 'for all rows'}...")
+    rows = await rebuild(AsyncSessionLocal, since)
+    print(f"Rollup rebuilt: {rows} bucket rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,14 +1,75 @@
 import os
+import time
 import asyncio
-from typing import List
+import threading
+from typing import List, Optional
 from functools import partial
 
+from backend.services.lexicon import get_lexicon
+from backend.services.model_snapshot import resolve_model_source, save_snapshot
+
+NEUTRAL_THRESHOLD = 0.6
+LEXICON_MODEL_NAME = "lexicon-cascade"
+
+
+def run_batched(pipe, texts: List[str], batch_size: int) -> List[dict]:
+    # Sorting by length keeps each bucket's dynamic padding close to its
+    # longest member; results are scattered back into input order.
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    results = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        bucket = order[start:start + batch_size]
+        outputs = pipe(
+            [texts[i] for i in bucket],
+            batch_size=len(bucket),
+            truncation=True
+        )
+        for i, output in zip(bucket, outputs):
+            results[i] = output[0] if isinstance(output, list) else output
+    return results
+
+
+_tokenize_time = threading.local()
+
+
+def timed_preprocess(pipe):
+    if pipe is None or getattr(pipe, "preprocess_timed", False):
+        return pipe
+    preprocess = pipe.preprocess
+
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return preprocess(*args, **kwargs)
+        finally:
+            _tokenize_time.seconds = getattr(_tokenize_time, "seconds", 0.0) + time.perf_counter() - started
+
+    pipe.preprocess = timed
+    pipe.preprocess_timed = True
+    return pipe
+
+
+def run_timed(pipe, texts: List[str], batch_size: int):
+    # The pipeline tokenizes on the executor thread running it, so a
+    # thread-local total keeps concurrent batches from counting each other.
+    _tokenize_time.seconds = 0.0
+    outputs = run_batched(pipe, texts, batch_size)
+    return outputs, _tokenize_time.seconds
+
+
 class SentimentAnalyzer:
     _local_sentiment_pipeline = None
     _local_emotion_pipeline = None
 
-    def __init__(self, model_type: str = 'local', model_name: str = None):
+    def __init__(self, model_type: str = 'local', model_name: str = None, cache=None, executor: str = None,
+                 load_models: bool = True, strict: bool = False):
         self.model_type = model_type
+        # Strict analyzers raise instead of falling back to the lexicon, for
+        # callers that store results under the model's name.
+        self.strict = strict
+        self.cache = cache
+        self.executor = executor or os.getenv("INFERENCE_EXECUTOR", "thread")
+        self.pool = None
         self.model_name = model_name or os.getenv(
             "HUGGINGFACE_MODEL",
             "distilbert-base-uncased-finetuned-sst-2-english"
@@ -17,142 +78,306 @@ class SentimentAnalyzer:
             "EMOTION_MODEL",
             "j-hartmann/emotion-english-distilroberta-base"
         )
+        self.batch_size = max(1, int(os.getenv("INFERENCE_BATCH_SIZE", "32")))
+        self.acceleration = os.getenv("TORCH_ACCELERATION", "off")
+        self.lexicon = get_lexicon()
+        self.cascade = os.getenv("ANALYZER_CASCADE", "false").lower() == "true"
+        self.cascade_threshold = float(os.getenv("CASCADE_CONFIDENCE", "0.8"))
+        self.stage_counts = {"lexicon": 0, "model": 0}
+        self.observer = None
+
+        if load_models:
+            self.load_models()
 
-        if model_type == 'local':
+    def load_models(self):
+        if not self._uses_models():
+            return
+        if self.executor == 'process':
+            if self.pool is None:
+                from backend.services.inference_pool import InferencePool
+                self.pool = InferencePool(self.model_type, self.model_name)
+        elif self.model_type == 'onnx':
+            self._init_onnx_models()
+        else:
             self._init_local_models()
 
+    def _accelerate(self, pipe):
+        if self.acceleration == "off":
+            return pipe
+        try:
+            from backend.services.torch_acceleration import accelerate_pipeline
+            return accelerate_pipeline(pipe, self.acceleration)
+        except Exception as e:
+            print(f"Torch acceleration '{self.acceleration}' unavailable, using unmodified model: {e}")
+            return pipe
+
+    def _load_pipeline(self, task: str, model_name: str, **kwargs):
+        from transformers import pipeline
+
+        source = resolve_model_source(model_name)
+        pipe = pipeline(task, model=source, device=-1, **kwargs)
+        if source == model_name:
+            save_snapshot(pipe, model_name)
+        return pipe
+
     def _init_local_models(self):
         try:
-            from transformers import pipeline
+            if self.acceleration != "off":
+                from backend.services.torch_acceleration import configure_threads
+                configure_threads()
 
             if SentimentAnalyzer._local_sentiment_pipeline is None:
                 print("Loading sentiment model...")
-                SentimentAnalyzer._local_sentiment_pipeline = pipeline(
-                    "sentiment-analysis",
-                    model=self.model_name,
-                    device=-1
+                SentimentAnalyzer._local_sentiment_pipeline = self._accelerate(
+                    self._load_pipeline("sentiment-analysis", self.model_name)
                 )
 
             if SentimentAnalyzer._local_emotion_pipeline is None:
                 print("Loading emotion model...")
                 try:
-                    SentimentAnalyzer._local_emotion_pipeline = pipeline(
-                        "text-classification",
-                        model=self.emotion_model,
-                        top_k=1,
-                        device=-1
+                    SentimentAnalyzer._local_emotion_pipeline = self._accelerate(
+                        self._load_pipeline("text-classification", self.emotion_model, top_k=1)
                     )
                 except Exception:
                     SentimentAnalyzer._local_emotion_pipeline = None
         except Exception as e:
             print(f"Failed to load models: {e}")
 
-    async def analyze_sentiment(self, text: str) -> dict:
-        if not text or not text.strip():
-            return {
-                "sentiment_label": "neutral",
-                "confidence_score": 0.0,
-                "model_name": self.model_name
-            }
-
-        text = text[:512]
-        
-        if self.model_type == 'local' and SentimentAnalyzer._local_sentiment_pipeline:
-            loop = asyncio.get_running_loop()
-            try:
-                result = await loop.run_in_executor(
-                    None, 
-                    partial(SentimentAnalyzer._local_sentiment_pipeline, text)
-                )
-                sentiment_result = result[0]
-                label = sentiment_result["label"].lower()
-                confidence = float(sentiment_result["score"])
-
-                if confidence < 0.6:
-                    sentiment_label = "neutral"
-                elif label == "positive":
-                    sentiment_label = "positive"
-                elif label == "negative":
-                    sentiment_label = "negative"
-                else:
-                    sentiment_label = "neutral"
-                
-                return {
-                    "sentiment_label": sentiment_label,
-                    "confidence_score": min(max(confidence, 0.0), 1.0),
-                    "model_name": self.model_name
-                }
-            except Exception:
-                pass
-        
+    def _init_onnx_models(self):
+        try:
+            from backend.services.onnx_backend import OnnxClassifier
+
+            model_dir = os.getenv("ONNX_MODEL_DIR", "models/onnx")
+
+            if SentimentAnalyzer._local_sentiment_pipeline is None:
+                print("Loading ONNX sentiment model...")
+                classifier = OnnxClassifier(os.path.join(model_dir, "sentiment"))
+                if classifier.source_model and classifier.source_model != self.model_name:
+                    print(f"Warning: ONNX sentiment model was exported from {classifier.source_model}, not {self.model_name}")
+                SentimentAnalyzer._local_sentiment_pipeline = classifier
+
+            if SentimentAnalyzer._local_emotion_pipeline is None:
+                print("Loading ONNX emotion model...")
+                try:
+                    SentimentAnalyzer._local_emotion_pipeline = OnnxClassifier(os.path.join(model_dir, "emotion"))
+                except Exception:
+                    SentimentAnalyzer._local_emotion_pipeline = None
+        except Exception as e:
+            print(f"Failed to load ONNX models: {e}")
+
+    def _uses_models(self) -> bool:
+        return self.model_type in ('local', 'onnx')
+
+    def _pipeline(self, kind: str):
+        if kind == "sentiment":
+            return SentimentAnalyzer._local_sentiment_pipeline
+        return SentimentAnalyzer._local_emotion_pipeline
+
+    def _can_infer(self, kind: str) -> bool:
+        if not self._uses_models():
+            return False
+        return self.pool is not None or self._pipeline(kind) is not None
+
+    async def _infer(self, kind: str, texts: List[str]) -> List[dict]:
+        started = time.perf_counter()
+        if self.pool is not None:
+            outputs = await self.pool.classify(kind, texts)
+            if self.observer is not None:
+                self.observer(f"{kind}_inference", time.perf_counter() - started)
+            return outputs
+
+        pipe = self._pipeline(kind)
+        if self.observer is not None:
+            timed_preprocess(pipe)
+        loop = asyncio.get_running_loop()
+        outputs, tokenize = await loop.run_in_executor(
+            None,
+            partial(run_timed, pipe, texts, self.batch_size)
+        )
+        if self.observer is not None:
+            self.observer("tokenization", tokenize)
+            self.observer(f"{kind}_inference", time.perf_counter() - started - tokenize)
+        return outputs
+
+    def _sentiment_result(self, label: str, confidence: float) -> dict:
+        label = label.lower()
+        if confidence < NEUTRAL_THRESHOLD:
+            sentiment_label = "neutral"
+        elif label == "positive":
+            sentiment_label = "positive"
+        elif label == "negative":
+            sentiment_label = "negative"
+        else:
+            sentiment_label = "neutral"
 
-        label, score = self._fallback_sentiment(text)
         return {
-            "sentiment_label": label,
-            "confidence_score": score,
+            "sentiment_label": sentiment_label,
+            "confidence_score": min(max(confidence, 0.0), 1.0),
             "model_name": self.model_name
         }
 
+    def _emotion_result(self, label: str, confidence: float) -> dict:
+        return {
+            "emotion": self._map_emotion(label.lower()),
+            "confidence_score": min(max(confidence, 0.0), 1.0),
+            "model_name": self.emotion_model
+        }
+
+    async def analyze_sentiment(self, text: str) -> dict:
+        results = await self.analyze_sentiment_batch([text])
+        return results[0]
+
     async def analyze_emotion(self, text: str) -> dict:
-        if not text or not text.strip():
-            return {
-                "emotion": "neutral",
-                "confidence_score": 0.0,
-                "model_name": self.emotion_model
-            }
-            
-        text = text[:512]
-
-        if self.model_type == 'local' and SentimentAnalyzer._local_emotion_pipeline:
-            loop = asyncio.get_running_loop()
-            try:
-                result = await loop.run_in_executor(
-                    None,
-                    partial(SentimentAnalyzer._local_emotion_pipeline, text)
-                )
-                emotion_result = result[0][0]
-                emotion_label = emotion_result["label"].lower()
-                confidence = float(emotion_result["score"])
-                mapped_emotion = self._map_emotion(emotion_label)
-
-                return {
-                    "emotion": mapped_emotion,
-                    "confidence_score": min(max(confidence, 0.0), 1.0),
+        results = await self.analyze_emotion_batch([text])
+        return results[0]
+
+    async def _classify(self, kind: str, model_name: str, texts: List[str], make_result) -> List[Optional[dict]]:
+        results = [None] * len(texts)
+        if self.cache is not None:
+            results = await self.cache.get_many(model_name, texts)
+
+        misses = [i for i, result in enumerate(results) if result is None]
+        if not misses:
+            return results
+        if not self._can_infer(kind):
+            if self.strict:
+                raise RuntimeError(f"{kind} model {model_name} is not loaded")
+            return results
+
+        unique = list(dict.fromkeys(texts[i] for i in misses))
+        try:
+            outputs = await self._infer(kind, unique)
+        except Exception:
+            if self.strict:
+                raise
+            return results
+
+        computed = {
+            text: make_result(output["label"], float(output["score"]))
+            for text, output in zip(unique, outputs)
+        }
+        for i in misses:
+            results[i] = dict(computed[texts[i]])
+
+        if self.cache is not None:
+            await self.cache.set_many(model_name, unique, [computed[text] for text in unique])
+        return results
+
+    async def analyze_sentiment_batch(self, texts: List[str]) -> List[dict]:
+        results = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                results[i] = {
+                    "sentiment_label": "neutral",
+                    "confidence_score": 0.0,
+                    "model_name": self.model_name
+                }
+            else:
+                pending.append(i)
+
+        classified = await self._classify(
+            "sentiment",
+            self.model_name,
+            [texts[i][:512] for i in pending],
+            self._sentiment_result
+        )
+
+        fallback = [i for i, result in zip(pending, classified) if result is None]
+        scores = dict(zip(fallback, self.lexicon.score_many([texts[i][:512] for i in fallback])))
+        for i, result in zip(pending, classified):
+            if result is None:
+                result = {
+                    "sentiment_label": scores[i]["sentiment_label"],
+                    "confidence_score": scores[i]["confidence_score"],
+                    "model_name": self.model_name
+                }
+            results[i] = result
+        return results
+
+    async def analyze_emotion_batch(self, texts: List[str]) -> List[dict]:
+        results = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                results[i] = {
+                    "emotion": "neutral",
+                    "confidence_score": 0.0,
                     "model_name": self.emotion_model
                 }
-            except Exception:
-                pass
+            else:
+                pending.append(i)
 
+        classified = await self._classify(
+            "emotion",
+            self.emotion_model,
+            [texts[i][:512] for i in pending],
+            self._emotion_result
+        )
 
-        emotion = self._fallback_emotion(text)
-        return {
-            "emotion": emotion,
-            "confidence_score": 0.7,
-            "model_name": self.emotion_model
-        }
+        fallback = [i for i, result in zip(pending, classified) if result is None]
+        scores = dict(zip(fallback, self.lexicon.score_many([texts[i][:512] for i in fallback])))
+        for i, result in zip(pending, classified):
+            if result is None:
+                result = {
+                    "emotion": scores[i]["emotion"],
+                    "confidence_score": 0.7,
+                    "model_name": self.emotion_model
+                }
+            results[i] = result
+        return results
+
+    def stage_shares(self) -> dict:
+        total = sum(self.stage_counts.values())
+        return {stage: round(count / total, 4) if total else 0.0 for stage, count in self.stage_counts.items()}
 
-    async def batch_analyze(self, texts: List[str]) -> List[dict]:
+    def _cascade_stage(self, texts: List[str], results: List[Optional[dict]]) -> List[int]:
+        remaining = []
+        scores = self.lexicon.score_many([text[:512] if text else "" for text in texts])
+        for i, (text, score) in enumerate(zip(texts, scores)):
+            if (text and text.strip()
+                    and score["sentiment_label"] != "neutral"
+                    and score["confidence_score"] >= self.cascade_threshold):
+                results[i] = {
+                    "sentiment_label": score["sentiment_label"],
+                    "confidence_score": score["confidence_score"],
+                    "model_name": LEXICON_MODEL_NAME,
+                    "emotion": score["emotion"]
+                }
+            else:
+                remaining.append(i)
+        return remaining
+
+    async def batch_analyze(self, texts: List[str], with_emotion: bool = True) -> List[dict]:
         if not texts:
             return []
-        
-        tasks = []
-        for text in texts:
-            tasks.append(self._analyze_full(text))
-            
-        return await asyncio.gather(*tasks)
-
-    async def _analyze_full(self, text: str) -> dict:
-        sentiment_task = asyncio.create_task(self.analyze_sentiment(text))
-        emotion_task = asyncio.create_task(self.analyze_emotion(text))
-        
-        sentiment, emotion = await asyncio.gather(sentiment_task, emotion_task)
-        
-        return {
-            "sentiment_label": sentiment["sentiment_label"],
-            "confidence_score": sentiment["confidence_score"],
-            "model_name": sentiment["model_name"],
-            "emotion": emotion["emotion"]
-        }
+
+        results = [None] * len(texts)
+        remaining = list(range(len(texts)))
+        if self.cascade:
+            remaining = self._cascade_stage(texts, results)
+        self.stage_counts["lexicon"] += len(texts) - len(remaining)
+        self.stage_counts["model"] += len(remaining)
+
+        if remaining:
+            uncertain = [texts[i] for i in remaining]
+            if with_emotion:
+                sentiments, emotions = await asyncio.gather(
+                    self.analyze_sentiment_batch(uncertain),
+                    self.analyze_emotion_batch(uncertain)
+                )
+            else:
+                sentiments = await self.analyze_sentiment_batch(uncertain)
+                emotions = [{"emotion": None}] * len(uncertain)
+            for i, sentiment, emotion in zip(remaining, sentiments, emotions):
+                results[i] = {
+                    "sentiment_label": sentiment["sentiment_label"],
+                    "confidence_score": sentiment["confidence_score"],
+                    "model_name": sentiment["model_name"],
+                    "emotion": emotion["emotion"]
+                }
+
+        return results
 
     def _map_emotion(self, emotion: str) -> str:
         emotion_map = {
@@ -173,31 +398,8 @@ class SentimentAnalyzer:
         return emotion_map.get(emotion, "neutral")
 
     def _fallback_sentiment(self, text: str) -> tuple:
-        positive_words = ["love", "great", "amazing", "excellent", "fantastic", "happy", "best", "wonderful", "awesome"]
-        negative_words = ["hate", "terrible", "awful", "worst", "disappointed", "horrible", "bad", "angry", "sad"]
-
-        text_lower = text.lower()
-        pos_count = sum(1 for word in positive_words if word in text_lower)
-        neg_count = sum(1 for word in negative_words if word in text_lower)
-
-        if pos_count > neg_count:
-            return "positive", 0.85
-        elif neg_count > pos_count:
-            return "negative", 0.85
-        else:
-            return "neutral", 0.70
+        result = self.lexicon.score(text)
+        return result["sentiment_label"], result["confidence_score"]
 
     def _fallback_emotion(self, text: str) -> str:
-        text_lower = text.lower()
-        if any(w in text_lower for w in ["happy", "love", "great", "amazing", "excited", "joy"]):
-            return "joy"
-        elif any(w in text_lower for w in ["angry", "hate", "furious", "mad"]):
-            return "anger"
-        elif any(w in text_lower for w in ["sad", "disappointed", "depressed", "unhappy"]):
-            return "sadness"
-        elif "wow" in text_lower or "surprise" in text_lower:
-            return "surprise"
-        elif "scared" in text_lower or "fear" in text_lower:
-            return "fear"
-        else:
-            return "neutral"
+        return self.lexicon.score(text)["emotion"]
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import argparse
+from typing import List, Optional, Tuple
+
+ACCELERATION_MODES = ("off", "int8", "compile", "int8+compile")
+
+DEFAULT_SAMPLE = [
+    ("I absolutely love this phone, best purchase ever!", "positive"),
+    ("Amazing experience, highly recommend it to everyone.", "positive"),
+    ("Great quality and it works perfectly.", "positive"),
+    ("Customer service was excellent and fast.", "positive"),
+    ("Five stars, exceeded all my expectations!", "positive"),
+    ("Very disappointed, total waste of money.", "negative"),
+    ("Terrible experience, would not recommend.", "negative"),
+    ("It broke after one week, horrible quality!", "negative"),
+    ("Worst support ever, nobody answered my emails.", "negative"),
+    ("Overpriced garbage, returning it immediately.", "negative"),
+    ("Arrived on time, packaging was standard.", "neutral"),
+    ("Ordered it last week, waiting to see how it performs.", "neutral"),
+]
+
+
+def configure_threads(intra_op: Optional[int] = None, inter_op: Optional[int] = None):
+    import torch
+
+    intra_op = intra_op or int(os.getenv("TORCH_INTRA_OP_THREADS", "0"))
+    inter_op = inter_op or int(os.getenv("TORCH_INTER_OP_THREADS", "0"))
+    if intra_op > 0:
+        torch.set_num_threads(intra_op)
+    if inter_op > 0:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            # Only settable before the first parallel region has run.
+            print("TORCH_INTER_OP_THREADS ignored: inter-op pool already started")
+
+
+def accelerate_pipeline(pipe, mode: str):
+    import torch
+
+    if mode not in ACCELERATION_MODES:
+        raise ValueError(f"Unknown acceleration mode {mode!r}, expected one of {ACCELERATION_MODES}")
+    if mode == "off":
+        return pipe
+
+    model = pipe.model.eval()
+    if "int8" in mode:
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if "compile" in mode and hasattr(torch, "compile"):
+        model.forward = torch.compile(model.forward, dynamic=True)
+    pipe.model = model
+
+    forward = pipe._forward
+
+    def _forward(*args, **kwargs):
+        with torch.inference_mode():
+            return forward(*args, **kwargs)
+
+    pipe._forward = _forward
+    return pipe
+
+
+def to_sentiment_label(output: dict) -> str:
+    from backend.services.sentiment_analyzer import NEUTRAL_THRESHOLD
+
+    label = output["label"].lower()
+    if float(output["score"]) < NEUTRAL_THRESHOLD or label not in ("positive", "negative"):
+        return "neutral"
+    return label
+
+
+def compare_pipelines(baseline, candidate, samples: List[Tuple[str, Optional[str]]], batch_size: int = 32,
+                      to_label=to_sentiment_label) -> dict:
+    from backend.services.sentiment_analyzer import run_batched
+
+    texts = [text for text, _ in samples]
+    # One untimed pass each so lazy initialisation and compilation do not
+    # count against either side.
+    run_batched(baseline, texts[:batch_size], batch_size)
+    run_batched(candidate, texts[:batch_size], batch_size)
+
+    started = time.perf_counter()
+    baseline_out = [to_label(o) for o in run_batched(baseline, texts, batch_size)]
+    baseline_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    candidate_out = [to_label(o) for o in run_batched(candidate, texts, batch_size)]
+    candidate_seconds = time.perf_counter() - started
+
+    labeled = [(i, label) for i, (_, label) in enumerate(samples) if label]
+    report = {
+        "samples": len(texts),
+        "agreement": round(sum(a == b for a, b in zip(baseline_out, candidate_out)) / len(texts), 4),
+        "baseline_seconds": round(baseline_seconds, 4),
+        "candidate_seconds": round(candidate_seconds, 4),
+        "speedup": round(baseline_seconds / candidate_seconds, 2) if candidate_seconds else None,
+    }
+    if labeled:
+        report["baseline_accuracy"] = round(sum(baseline_out[i] == label for i, label in labeled) / len(labeled), 4)
+        report["candidate_accuracy"] = round(sum(candidate_out[i] == label for i, label in labeled) / len(labeled), 4)
+    return report
+
+
+def load_samples(path: str) -> List[Tuple[str, Optional[str]]]:
+    samples = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                samples.append((row.get("text") or row.get("content"), row.get("label")))
+    return samples
+
+
+def main():
+    from transformers import pipeline
+
+    parser = argparse.ArgumentParser(description="Measure speedup and agreement of an accelerated model against the unmodified one.")
+    parser.add_argument("--mode", default=os.getenv("TORCH_ACCELERATION", "int8"), choices=ACCELERATION_MODES)
+    parser.add_argument("--sample", help="JSONL file with text and optional label fields")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("INFERENCE_BATCH_SIZE", "32")))
+    args = parser.parse_args()
+
+    configure_threads()
+    samples = load_samples(args.sample) if args.sample else DEFAULT_SAMPLE
+    sentiment_model = os.getenv("HUGGINGFACE_MODEL", "distilbert-base-uncased-finetuned-sst-2-english")
+    emotion_model = os.getenv("EMOTION_MODEL", "j-hartmann/emotion-english-distilroberta-base")
+
+    baseline = pipeline("sentiment-analysis", model=sentiment_model, device=-1)
+    candidate = accelerate_pipeline(pipeline("sentiment-analysis", model=sentiment_model, device=-1), args.mode)
+    print(f"sentiment ({sentiment_model}, {args.mode}): {compare_pipelines(baseline, candidate, samples, args.batch_size)}")
+
+    baseline = pipeline("text-classification", model=emotion_model, top_k=1, device=-1)
+    candidate = accelerate_pipeline(pipeline("text-classification", model=emotion_model, top_k=1, device=-1), args.mode)
+    emotion_samples = [(text, None) for text, _ in samples]
+    report = compare_pipelines(baseline, candidate, emotion_samples, args.batch_size, to_label=lambda o: o["label"].lower())
+    print(f"emotion ({emotion_model}, {args.mode}): {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "ingester"))
+
+from pacing import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class XaddPipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.commands = []
+
+    def xadd(self, stream, fields, maxlen=None, approximate=True):
+        self.commands.append((stream, fields, maxlen, approximate))
+        return self
+
+    async def execute(self):
+        self.redis_client.batches.append(self.commands)
+        return [b"0-0"] * len(self.commands)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class PipelineOnlyRedis:
+    def __init__(self):
+        self.batches = []
+
+    def pipeline(self, transaction=True):
+        return XaddPipeline(self)
+
+
+def test_token_bucket_charges_debt_instead_of_fixed_sleeps():
+    clock = FakeClock()
+    bucket = TokenBucket(100, capacity=10, clock=clock)
+
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(10) == pytest.approx(0.1)
+
+    # Time spent publishing counts toward the wait the bucket asks for.
+    clock.now = 0.15
+    assert bucket.reserve(10) == pytest.approx(0.05)
+
+    clock.now = 10.0
+    assert bucket.reserve(5) == 0.0
+    assert bucket.tokens == pytest.approx(5)
+
+
+@pytest.mark.asyncio
+async def test_paced_mode_publishes_pipelined_batches_at_target_rate(monkeypatch):
+    from ingester import DataIngester
+
+    monkeypatch.setenv("INGESTER_STREAM_MAXLEN", "100000")
+    clock = FakeClock()
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr("asyncio.sleep", fake_sleep)
+    redis_client = PipelineOnlyRedis()
+    ingester = DataIngester(redis_client)
+    ingester.clock = clock
+
+    summary = await ingester.start_paced(20000, batch_size=500, duration_seconds=0.5)
+
+    published = sum(len(batch) for batch in redis_client.batches)
+    assert summary["published"] == published
+    assert all(len(batch) == 500 for batch in redis_client.batches)
+    # One free batch from the full bucket, then one every 500/20000 s.
+    assert sleeps == pytest.approx([0.025] * 20)
+    assert published == 21 * 500
+    assert summary["seconds"] == 0.5
+    stream, fields, maxlen, approximate = redis_client.batches[0][0]
+    assert (stream, maxlen, approximate) == ("social_posts_stream", 100000, True)
+    assert set(fields) == {"post_id", "platform", "content", "author", "created_at"}
+
+
+def test_replay_normalizes_jsonl_and_csv_records(tmp_path):
+    from replay import iter_posts
+
+    jsonl = tmp_path / "posts.jsonl"
+    jsonl.write_text(
+        '{"id": 7, "text": "great phone", "source": "reddit", "timestamp": 1700000000}\n'
+        "\n"
+        "not json\n"
+        '{"text": ""}\n'
+        '{"post_id": "x", "content": "meh", "created_at": "2024-01-01T00:00:00Z"}\n'
+    )
+    csv_file = tmp_path / "posts.csv"
+    csv_file.write_text('post_id,content,author\nc1,"line one\nline two",bob\n')
+
+    posts = list(iter_posts(str(jsonl)))
+    assert [(p["post_id"], p["platform"], p["content"]) for p in posts] == [
+        ("7", "reddit", "great phone"), ("x", "replay", "meh")
+    ]
+    assert posts[0]["created_at"] == "2023-11-14T22:13:20Z"
+
+    csv_post, = iter_posts(str(csv_file))
+    assert csv_post["content"] == "line one\nline two"
+    assert csv_post["author"] == "bob"
+
+
+@pytest.mark.asyncio
+async def test_replay_keeps_original_spacing_scaled_by_speed(tmp_path, monkeypatch):
+    from ingester import DataIngester
+
+    clock = FakeClock()
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr("asyncio.sleep", fake_sleep)
+
+    path = tmp_path / "burst.jsonl"
+    path.write_text("".join(
+        f'{{"post_id": "p{i}", "content": "post {i}", "timestamp": {ts}}}\n'
+        for i, ts in enumerate([100.0, 100.0, 100.0, 102.0, 104.0])
+    ))
+    redis_client = PipelineOnlyRedis()
+    ingester = DataIngester(redis_client)
+    ingester.clock = clock
+
+    summary = await ingester.start_replay(str(path), speed=20)
+
+    assert [len(batch) for batch in redis_client.batches] == [3, 1, 1]
+    assert [fields["post_id"] for batch in redis_client.batches for _, fields, _, _ in batch] == [
+        "p0", "p1", "p2", "p3", "p4"
+    ]
+    assert summary["published"] == 5
+    assert sleeps == pytest.approx([0.1, 0.1])
+
+
+@pytest.mark.asyncio
+async def test_ingester_publishes_single_msgpack_payload_when_enabled(monkeypatch):
+    msgpack = pytest.importorskip("msgpack")
+    from ingester import DataIngester
+
+    monkeypatch.setenv("STREAM_ENCODING", "msgpack")
+    redis_client = PipelineOnlyRedis()
+    ingester = DataIngester(redis_client)
+    post = ingester.generate_post()
+
+    assert await ingester.publish_batch([post]) == 1
+
+    (_, fields, _, _), = redis_client.batches[0]
+    assert list(fields) == ["p"]
+    assert msgpack.unpackb(fields["p"]) == [
+        1, post["post_id"], post["platform"], post["content"], post["author"], post["created_at"]
+    ]
+
+
+def test_scalable_bloom_filter_grows_and_keeps_false_positive_rate():
+    from dedup import ScalableBloomFilter
+
+    bloom = ScalableBloomFilter(1000, 0.01)
+    added = [bloom.add(f"post_{i}") for i in range(5000)]
+    assert added.count(False) < 50
+    assert not bloom.add("post_42")
+    assert len(bloom.filters) == 3
+
+    false_positives = sum(f"other_{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.01
+
+
+class BloomRedis(PipelineOnlyRedis):
+    def __init__(self, module_loaded=True):
+        super().__init__()
+        self.module_loaded = module_loaded
+        self.sets = {}
+
+    async def execute_command(self, *args):
+        if not self.module_loaded:
+            raise Exception(f"unknown command '{args[0]}'")
+        if args[0] == "BF.RESERVE":
+            return "OK"
+        seen = self.sets.setdefault(args[1], set())
+        added = [int(key not in seen) for key in args[2:]]
+        seen.update(args[2:])
+        return added
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend,module_loaded", [("local", False), ("redis", True), ("redis", False)])
+async def test_publish_drops_repeated_post_ids_and_tags_repeated_content(monkeypatch, capsys, backend, module_loaded):
+    from ingester import DataIngester
+    from pacing import RateReporter
+    from common.text_hash import text_hash
+
+    monkeypatch.setenv("INGESTER_DEDUP_BACKEND", backend)
+    redis_client = BloomRedis(module_loaded)
+    ingester = DataIngester(redis_client)
+    post = {"post_id": "a", "platform": "reddit", "content": "Great  phone", "author": "x",
+            "created_at": "2024-01-01T00:00:00Z"}
+
+    published = await ingester.publish_batch([post, dict(post, post_id="b", content="great phone".title())])
+    published += await ingester.publish_batch([post, dict(post, post_id="c", content=" Great phone ")])
+
+    assert published == 3
+    fields = [fields for batch in redis_client.batches for _, fields, _, _ in batch]
+    assert [f["post_id"] for f in fields] == ["a", "b", "c"]
+    assert "content_hash" not in fields[0] and "content_hash" not in fields[1]
+    assert fields[2]["content_hash"] == text_hash("Great phone")
+    assert ingester.dedup.stats() == {
+        "backend": "redis" if module_loaded and backend == "redis" else "local",
+        "dropped_post_ids": 1,
+        "tagged_content_repeats": 1,
+    }
+
+    clock = FakeClock()
+    reporter = RateReporter(0, 1.0, clock=clock, extra=ingester.filter_stats)
+    clock.now = 2.0
+    reporter.add(published)
+    assert "dropped_post_ids=1, tagged_content_repeats=1, shed=0" in capsys.readouterr().out
+    assert reporter.summary()["tagged_content_repeats"] == 1
+
+
+class BacklogRedis(BloomRedis):
+    def __init__(self, backlogs, stream_len=0):
+        super().__init__(module_loaded=False)
+        self.backlogs = list(backlogs)
+        self.stream_len = stream_len
+        self.status = {}
+
+    async def xinfo_groups(self, stream):
+        lag = self.backlogs.pop(0) if len(self.backlogs) > 1 else self.backlogs[0]
+        return [{"name": "other", "lag": 0, "pending": 0}, {"name": "sentiment_workers", "lag": lag, "pending": 0}]
+
+    async def xlen(self, stream):
+        return self.stream_len
+
+    async def hset(self, key, mapping):
+        self.status[key] = dict(mapping)
+
+
+def make_backpressure(redis_client, **kwargs):
+    from backpressure import BackpressureController
+
+    options = dict(slow_lag=5000, shed_lag=20000, pause_lag=50000, resume_ratio=0.5, slow_factor=0.5,
+                   interval_seconds=1, low_priority_platforms="tiktok, Instagram", clock=FakeClock())
+    options.update(kwargs)
+    return BackpressureController(redis_client, "social_posts_stream", "sentiment_workers", **options)
+
+
+@pytest.mark.asyncio
+async def test_backpressure_steps_through_watermarks_with_hysteresis():
+    backlogs = [1000, 6000, 25000, 60000, 30000, 20000, 5000, 3000, 1000]
+    controller = make_backpressure(BacklogRedis(backlogs))
+
+    states = []
+    for _ in backlogs:
+        states.append(await controller.update(force=True))
+
+    assert states == ["normal", "slow", "shed", "paused", "paused", "shed", "slow", "slow", "normal"]
+    status = controller.redis_client.status["social_posts_stream:ingest_throttle"]
+    assert status["state"] == "normal" and status["backlog"] == 1000
+    assert controller.transitions == 6
+
+    capped = make_backpressure(BacklogRedis([0], stream_len=90000), max_stream_len=100000)
+    capped.state = "paused"
+    assert await capped.update() == "paused"
+    assert capped.rate_factor == 0.0
+
+
+@pytest.mark.asyncio
+async def test_shed_state_drops_low_priority_platforms_before_dedup(monkeypatch):
+    from ingester import DataIngester
+
+    monkeypatch.setenv("LOW_PRIORITY_PLATFORMS", "tiktok")
+    redis_client = BacklogRedis([25000])
+    ingester = DataIngester(redis_client)
+
+    assert await ingester._throttle() == 0.5
+    post = {"post_id": "t1", "platform": "TikTok", "content": "hi", "author": "x", "created_at": "now"}
+    assert await ingester.publish_batch([post, dict(post, post_id="r1", platform="reddit")]) == 1
+    assert ingester.backpressure.stats()["shed"] == 1
+
+    redis_client.backlogs = [0]
+    ingester.backpressure.state = "slow"
+    await ingester.backpressure.update(force=True)
+    assert await ingester.publish_batch([post]) == 1
+
+
+@pytest.mark.asyncio
+async def test_paused_ingester_waits_until_backlog_drains(monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr("asyncio.sleep", fake_sleep)
+    controller = make_backpressure(BacklogRedis([60000, 60000, 20000, 1000]))
+
+    await controller.update(force=True)
+    assert controller.state == "paused"
+    await controller.wait_while_paused()
+
+    assert controller.state == "shed"
+    assert sleeps == [1, 1]
@@ -194,6 +194,47 @@ async def test_alerting_service_has_save_alert():
     assert callable(alert_service.save_alert)
 
 
+@pytest.mark.asyncio
+async def test_alert_thresholds_read_minute_rollup():
+    pytest.importorskip("aiosqlite")
+    from datetime import datetime, timezone, timedelta
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from backend.database import Base
+    from backend.models.models import SentimentRollupMinute
+    from backend.services.rollup import minute_bucket, sentiment_counts
+    from services.alerting import AlertService
+
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    now = minute_bucket(datetime.now(timezone.utc))
+    async with session_maker() as session:
+        session.add_all([
+            SentimentRollupMinute(bucket=now, platform="reddit", sentiment_label="negative", emotion="anger", count=9),
+            SentimentRollupMinute(bucket=now, platform="twitter", sentiment_label="negative", emotion="", count=3),
+            SentimentRollupMinute(bucket=now, platform="reddit", sentiment_label="positive", emotion="joy", count=2),
+            SentimentRollupMinute(bucket=now - timedelta(hours=2), platform="reddit",
+                                  sentiment_label="positive", emotion="joy", count=50),
+        ])
+        await session.commit()
+
+        assert await sentiment_counts(session, now - timedelta(hours=1)) == {
+            "positive": 2, "negative": 12, "neutral": 0
+        }
+        assert await sentiment_counts(session, now - timedelta(hours=3), platform="reddit") == {
+            "positive": 52, "negative": 9, "neutral": 0
+        }
+
+    alert = await AlertService(session_maker).check_thresholds()
+    await engine.dispose()
+
+    assert alert["actual_ratio"] == 6.0
+    assert alert["metrics"]["total_count"] == 14
+
+
 def test_sentiment_analyzer_analyze_method():
     from services.sentiment_analyzer import SentimentAnalyzer
     analyzer = SentimentAnalyzer(model_type='external')
@@ -255,3 +296,44 @@ def test_end_to_end_analysis():
     assert result["sentiment_label"] == "positive"
     assert 0.0 <= result["confidence_score"] <= 1.0
     assert result["emotion"] in ["happy", "angry", "sad", "neutral"]
+
+
+@pytest.mark.asyncio
+async def test_worker_update_relay_closes_pubsub_before_resubscribing(monkeypatch):
+    import asyncio
+    import backend.main as api
+
+    class FailingPubSub:
+        def __init__(self):
+            self.closed = False
+
+        async def subscribe(self, channel):
+            raise ConnectionError("redis went away")
+
+        async def aclose(self):
+            self.closed = True
+
+    class RelayRedis:
+        def __init__(self):
+            self.pubsubs = []
+
+        def pubsub(self):
+            self.pubsubs.append(FailingPubSub())
+            return self.pubsubs[-1]
+
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 2:
+            raise asyncio.CancelledError
+
+    redis_client = RelayRedis()
+    monkeypatch.setattr(api, "redis_client", redis_client)
+    monkeypatch.setattr("asyncio.sleep", fake_sleep)
+
+    with pytest.raises(asyncio.CancelledError):
+        await api.relay_worker_updates()
+
+    assert len(redis_client.pubsubs) == 2
+    assert all(pubsub.closed for pubsub in redis_client.pubsubs)
@@ -1,4 +1,6 @@
 import pytest
+import time
+import asyncio
 import sys
 import os
 
@@ -65,3 +67,373 @@ class TestSentimentAnalyzer:
     async def test_fallback_logic(self, analyzer):
         result = await analyzer.analyze_sentiment("amazing wonderful love")
         assert result["sentiment_label"] == "positive"
+
+
+class FakePipeline:
+    def __init__(self, scores):
+        self.scores = scores
+        self.calls = []
+
+    def __call__(self, texts, batch_size=None, truncation=False):
+        self.calls.append(list(texts))
+        return [[{"label": "POSITIVE", "score": self.scores[t]}] for t in texts]
+
+
+class TestBatchedInference:
+    @pytest.mark.asyncio
+    async def test_strict_analyzer_raises_instead_of_falling_back(self, monkeypatch):
+        monkeypatch.setattr(SentimentAnalyzer, "_local_sentiment_pipeline", FakePipeline({}))
+
+        lenient = SentimentAnalyzer(model_type='local')
+        assert (await lenient.analyze_sentiment_batch(["love it"]))[0]["sentiment_label"] == "positive"
+
+        strict = SentimentAnalyzer(model_type='local', strict=True)
+        with pytest.raises(KeyError):
+            await strict.analyze_sentiment_batch(["love it"])
+
+    @pytest.mark.asyncio
+    async def test_batches_sorted_by_length_and_returned_in_order(self, monkeypatch):
+        monkeypatch.setenv("INFERENCE_BATCH_SIZE", "2")
+        texts = ["a much longer text here", "short", "mid length", "tiny"]
+        pipe = FakePipeline({t: 0.9 for t in texts})
+        monkeypatch.setattr(SentimentAnalyzer, "_local_sentiment_pipeline", pipe)
+        analyzer = SentimentAnalyzer(model_type='local')
+
+        results = await analyzer.analyze_sentiment_batch(texts)
+
+        assert pipe.calls == [["tiny", "short"], ["mid length", "a much longer text here"]]
+        assert len(results) == 4
+        assert all(r["sentiment_label"] == "positive" for r in results)
+
+    @pytest.mark.asyncio
+    async def test_batch_keeps_neutral_threshold_and_empty_texts(self, monkeypatch):
+        pipe = FakePipeline({"confident": 0.95, "unsure": 0.55})
+        monkeypatch.setattr(SentimentAnalyzer, "_local_sentiment_pipeline", pipe)
+        analyzer = SentimentAnalyzer(model_type='local')
+
+        results = await analyzer.analyze_sentiment_batch(["confident", "", "unsure"])
+
+        assert pipe.calls == [["unsure", "confident"]]
+        assert results[0]["sentiment_label"] == "positive"
+        assert results[1] == {"sentiment_label": "neutral", "confidence_score": 0.0, "model_name": analyzer.model_name}
+        assert results[2]["sentiment_label"] == "neutral"
+
+    @pytest.mark.asyncio
+    async def test_observer_receives_tokenization_and_inference_time(self, monkeypatch):
+        class TokenizingPipeline(FakePipeline):
+            def preprocess(self, text):
+                time.sleep(0.01)
+                return text
+
+            def __call__(self, texts, batch_size=None, truncation=False):
+                return super().__call__([self.preprocess(t) for t in texts], batch_size, truncation)
+
+        pipe = TokenizingPipeline({"a": 0.9, "b": 0.9})
+        monkeypatch.setattr(SentimentAnalyzer, "_local_sentiment_pipeline", pipe)
+        analyzer = SentimentAnalyzer(model_type='local')
+        observed = []
+        analyzer.observer = lambda stage, seconds: observed.append((stage, seconds))
+
+        await analyzer.analyze_sentiment_batch(["a", "b"])
+
+        assert [stage for stage, _ in observed] == ["tokenization", "sentiment_inference"]
+        assert observed[0][1] >= 0.02
+        assert observed[1][1] < observed[0][1]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_batches_observe_their_own_tokenization(self, monkeypatch):
+        class TokenizingPipeline(FakePipeline):
+            def preprocess(self, text):
+                time.sleep(0.05 if text == "slow" else 0.0)
+                return text
+
+            def __call__(self, texts, batch_size=None, truncation=False):
+                if texts == ["fast"]:
+                    time.sleep(0.1)
+                return super().__call__([self.preprocess(t) for t in texts], batch_size, truncation)
+
+        pipe = TokenizingPipeline({"slow": 0.9, "fast": 0.9})
+        monkeypatch.setattr(SentimentAnalyzer, "_local_sentiment_pipeline", pipe)
+        analyzer = SentimentAnalyzer(model_type='local')
+        observed = []
+        analyzer.observer = lambda stage, seconds: observed.append((stage, seconds))
+
+        await asyncio.gather(analyzer.analyze_sentiment_batch(["fast"]), analyzer.analyze_sentiment_batch(["slow"]))
+
+        tokenization = sorted(seconds for stage, seconds in observed if stage == "tokenization")
+        assert tokenization[0] < 0.01
+        assert tokenization[1] >= 0.05
+
+    @pytest.mark.asyncio
+    async def test_batch_analyze_can_defer_emotion(self, monkeypatch):
+        sentiment = FakePipeline({"a": 0.9})
+        emotion = FakePipeline({"a": 0.9})
+        monkeypatch.setattr(SentimentAnalyzer, "_local_sentiment_pipeline", sentiment)
+        monkeypatch.setattr(SentimentAnalyzer, "_local_emotion_pipeline", emotion)
+        analyzer = SentimentAnalyzer(model_type='local')
+
+        results = await analyzer.batch_analyze(["a"], with_emotion=False)
+
+        assert sentiment.calls == [["a"]]
+        assert emotion.calls == []
+        assert results[0]["sentiment_label"] == "positive"
+        assert results[0]["emotion"] is None
+
+
+class FakeCacheRedis:
+    def __init__(self):
+        self.hashes = {}
+        self.ttls = {}
+
+    def pipeline(self, transaction=True):
+        return FakeCachePipeline(self)
+
+
+class FakeCachePipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.commands = []
+
+    def hgetall(self, key):
+        self.commands.append(lambda: dict(self.redis_client.hashes.get(key, {})))
+
+    def hset(self, key, mapping):
+        self.commands.append(lambda: self.redis_client.hashes.setdefault(key, {}).update(mapping))
+
+    def expire(self, key, seconds):
+        self.commands.append(lambda: self.redis_client.ttls.__setitem__(key, seconds))
+
+    async def execute(self):
+        return [command() for command in self.commands]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class TestInferenceCache:
+    @pytest.mark.asyncio
+    async def test_repeated_texts_skip_the_model(self, monkeypatch):
+        from services.inference_cache import InferenceCache
+
+        pipe = FakePipeline({"great phone": 0.9, "ok phone": 0.8})
+        monkeypatch.setattr(SentimentAnalyzer, "_local_sentiment_pipeline", pipe)
+        cache = InferenceCache(max_entries=100)
+        analyzer = SentimentAnalyzer(model_type='local', cache=cache)
+
+        first = await analyzer.analyze_sentiment_batch(["great phone", "great phone", "ok phone"])
+        second = await analyzer.analyze_sentiment_batch(["great  phone ", "ok phone"])
+
+        assert pipe.calls == [["ok phone", "great phone"]]
+        assert second == [first[0], first[2]]
+        assert cache.stats()["local_hits"] == 2
+        assert cache.stats()["misses"] == 3
+
+    @pytest.mark.asyncio
+    async def test_redis_tier_is_shared_and_keyed_by_model(self):
+        from services.inference_cache import InferenceCache
+
+        redis_client = FakeCacheRedis()
+        writer = InferenceCache(redis_client, max_entries=0, ttl_seconds=60)
+        reader = InferenceCache(redis_client, max_entries=10)
+        value = {"sentiment_label": "positive", "confidence_score": 0.9, "model_name": "model-a"}
+
+        await writer.set_many("model-a", ["hello"], [value])
+
+        assert await reader.get_many("model-a", ["hello"]) == [value]
+        assert await reader.get_many("model-b", ["hello"]) == [None]
+        assert set(redis_client.ttls.values()) == {60}
+        assert reader.stats()["redis_hits"] == 1
+        assert reader.stats()["misses"] == 1
+
+    def test_local_tier_evicts_least_recently_used(self):
+        from services.inference_cache import InferenceCache
+
+        cache = InferenceCache(max_entries=2)
+        cache._remember(("a", "m"), {})
+        cache._remember(("b", "m"), {})
+        cache._local.move_to_end(("a", "m"))
+        cache._remember(("c", "m"), {})
+
+        assert list(cache._local) == [("a", "m"), ("c", "m")]
+
+
+class TestInferencePool:
+    @pytest.mark.asyncio
+    async def test_pool_splits_batches_across_processes_in_order(self, monkeypatch):
+        from services.inference_pool import InferencePool
+
+        pool = InferencePool('local', 'model', processes=2, threads_per_process=1, max_pending=1)
+        submitted = []
+
+        async def fake_submit(kind, texts):
+            submitted.append(texts)
+            return [{"label": "POSITIVE", "score": 0.9, "text": t} for t in texts]
+
+        monkeypatch.setattr(pool, "_submit", fake_submit)
+        pool.batch_size = 2
+        texts = [f"text {i}" for i in range(6)]
+
+        outputs = await pool.classify("sentiment", texts)
+
+        assert submitted == [texts[:3], texts[3:]]
+        assert [o["text"] for o in outputs] == texts
+        pool.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_analyzer_routes_inference_through_pool(self):
+        class FakePool:
+            def __init__(self):
+                self.calls = []
+
+            async def classify(self, kind, texts):
+                self.calls.append(kind)
+                return [{"label": "NEGATIVE", "score": 0.99} for _ in texts]
+
+        analyzer = SentimentAnalyzer(model_type='external')
+        analyzer.model_type = 'local'
+        analyzer.pool = FakePool()
+
+        results = await analyzer.batch_analyze(["bad", "worse"])
+
+        assert sorted(analyzer.pool.calls) == ["emotion", "sentiment"]
+        assert [r["sentiment_label"] for r in results] == ["negative", "negative"]
+
+
+class TestOnnxClassifier:
+    def make_classifier(self, logits_by_text):
+        np = pytest.importorskip("numpy")
+        from services.onnx_backend import OnnxClassifier
+
+        class FakeSession:
+            def run(self, output_names, feeds):
+                return [np.array([logits_by_text[int(i)] for i in feeds["input_ids"][:, 0]])]
+
+        classifier = OnnxClassifier.__new__(OnnxClassifier)
+        classifier.id2label = {0: "NEGATIVE", 1: "POSITIVE"}
+        classifier.multi_label = False
+        classifier.input_names = ["input_ids", "attention_mask"]
+        classifier.session = FakeSession()
+        classifier.preprocess = lambda texts: {
+            "input_ids": np.array([[len(t)] for t in texts]),
+            "attention_mask": np.ones((len(texts), 1), dtype="int64"),
+        }
+        return classifier
+
+    @pytest.mark.asyncio
+    async def test_onnx_outputs_follow_pipeline_contract(self, monkeypatch):
+        classifier = self.make_classifier({4: [0.0, 3.0], 5: [3.0, 0.0]})
+        monkeypatch.setattr(SentimentAnalyzer, "_local_sentiment_pipeline", classifier)
+        analyzer = SentimentAnalyzer(model_type='external')
+        analyzer.model_type = 'onnx'
+
+        results = await analyzer.analyze_sentiment_batch(["good", "awful"])
+
+        assert [r["sentiment_label"] for r in results] == ["positive", "negative"]
+        assert results[0]["confidence_score"] == pytest.approx(0.9526, abs=1e-4)
+        assert results[0]["model_name"] == analyzer.model_name
+
+
+class TestTorchAcceleration:
+    def test_compare_pipelines_reports_agreement_and_accuracy(self):
+        from services.torch_acceleration import compare_pipelines
+
+        samples = [("good", "positive"), ("bad", "negative"), ("meh", "neutral"), ("fine", "positive")]
+        baseline = FakePipeline({"good": 0.9, "bad": 0.2, "meh": 0.55, "fine": 0.8})
+        candidate = FakePipeline({"good": 0.9, "bad": 0.2, "meh": 0.55, "fine": 0.58})
+
+        report = compare_pipelines(baseline, candidate, samples, batch_size=2)
+
+        assert report["samples"] == 4
+        assert report["agreement"] == 0.75
+        assert report["baseline_accuracy"] == 0.75
+        assert report["candidate_accuracy"] == 0.5
+        assert "speedup" in report
+
+    def test_unknown_mode_is_rejected(self):
+        pytest.importorskip("torch")
+        from services.torch_acceleration import accelerate_pipeline
+
+        with pytest.raises(ValueError):
+            accelerate_pipeline(object(), "fp4")
+
+
+class TestLexiconScorer:
+    @pytest.fixture
+    def scorer(self):
+        from services.lexicon import LexiconScorer
+        return LexiconScorer()
+
+    def test_matches_whole_words_only(self, scorer):
+        assert scorer.score("Bought a new saddle and a badge")["sentiment_label"] == "neutral"
+        assert scorer.score("This is bad")["sentiment_label"] == "negative"
+
+    def test_negation_flips_polarity_within_clause(self, scorer):
+        assert scorer.score("This is not good at all")["sentiment_label"] == "negative"
+        assert scorer.score("Not bad, I love it!")["sentiment_label"] == "positive"
+        assert scorer.score("I don't hate it")["emotion"] == "neutral"
+
+    def test_phrases_and_batch_scoring(self, scorer):
+        results = scorer.score_many(["Total waste of money.", "Wow!", ""])
+        assert results[0]["sentiment_label"] == "negative"
+        assert results[1]["emotion"] == "surprise"
+        assert results[1]["confidence_score"] == 0.70
+        assert results[2]["sentiment_label"] == "neutral"
+
+    def test_custom_lexicon_file_extends_defaults(self, tmp_path):
+        from services.lexicon import LexiconScorer
+
+        path = tmp_path / "lexicon.tsv"
+        path.write_text("# term\tweight\temotion\nmeh\t-0.5\nover the moon\t2\tjoy\n")
+        scorer = LexiconScorer.from_file(str(path))
+
+        assert scorer.score("meh")["sentiment_label"] == "negative"
+        result = scorer.score("I am over the moon")
+        assert result["sentiment_label"] == "positive"
+        assert result["emotion"] == "joy"
+        assert scorer.score("great")["sentiment_label"] == "positive"
+
+    def test_unknown_emotions_are_rejected_or_still_scored(self, tmp_path):
+        from services.lexicon import LexiconScorer
+
+        path = tmp_path / "lexicon.tsv"
+        path.write_text("serene\t1\tcalm\n")
+        with pytest.raises(ValueError, match="calm"):
+            LexiconScorer.from_file(str(path))
+
+        scorer = LexiconScorer({"serene": (1.0, "calm")})
+        assert scorer.score("so serene")["emotion"] == "calm"
+
+
+class TestCascade:
+    @pytest.mark.asyncio
+    async def test_confident_texts_skip_the_transformer(self, monkeypatch):
+        from services.sentiment_analyzer import LEXICON_MODEL_NAME
+
+        monkeypatch.setenv("ANALYZER_CASCADE", "true")
+        texts = ["I absolutely love it! Best purchase ever!", "It arrived today."]
+        pipe = FakePipeline({t: 0.9 for t in texts})
+        monkeypatch.setattr(SentimentAnalyzer, "_local_sentiment_pipeline", pipe)
+        analyzer = SentimentAnalyzer(model_type='local')
+
+        results = await analyzer.batch_analyze(texts)
+
+        assert pipe.calls == [["It arrived today."]]
+        assert results[0]["model_name"] == LEXICON_MODEL_NAME
+        assert results[0]["sentiment_label"] == "positive"
+        assert results[0]["emotion"] == "joy"
+        assert results[1]["model_name"] == analyzer.model_name
+        assert analyzer.stage_shares() == {"lexicon": 0.5, "model": 0.5}
+
+    @pytest.mark.asyncio
+    async def test_cascade_disabled_by_default(self, monkeypatch):
+        pipe = FakePipeline({"I love it, best ever": 0.9})
+        monkeypatch.setattr(SentimentAnalyzer, "_local_sentiment_pipeline", pipe)
+        analyzer = SentimentAnalyzer(model_type='local')
+
+        await analyzer.batch_analyze(["I love it, best ever"])
+
+        assert pipe.calls == [["I love it, best ever"]]
+        assert analyzer.stage_counts == {"lexicon": 0, "model": 1}
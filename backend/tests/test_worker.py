@@ -0,0 +1,1105 @@
+import pytest
+import sys
+import os
+import json
+import time
+import importlib.util
+
+WORKER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "worker")
+sys.path.insert(0, WORKER_DIR)
+
+from batch_scheduler import MicroBatchScheduler
+
+
+class ScriptedReader:
+    def __init__(self, reads):
+        self.reads = list(reads)
+        self.calls = []
+
+    async def __call__(self, count, block_ms):
+        self.calls.append((count, block_ms))
+        if self.reads:
+            return self.reads.pop(0)
+        return []
+
+
+def make_entries(start, n, content="hello world"):
+    return [(f"{start + i}-0", {"post_id": f"p{start + i}", "content": content}) for i in range(n)]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_gathers_across_reads_until_max_batch_size():
+    reader = ScriptedReader([make_entries(0, 3), make_entries(3, 3), make_entries(6, 3)])
+    scheduler = MicroBatchScheduler(reader, max_batch_size=8, max_wait_ms=1000)
+
+    batch = await scheduler.next_batch()
+
+    assert [message_id for message_id, _ in batch] == [f"{i}-0" for i in range(8)]
+    assert reader.calls[0] == (8, scheduler.block_ms)
+    assert reader.calls[1][0] == 5
+
+    carried = await scheduler.next_batch()
+    assert [message_id for message_id, _ in carried] == ["8-0"]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_stops_at_token_budget():
+    reader = ScriptedReader([make_entries(0, 4, content="x" * 400)])
+    scheduler = MicroBatchScheduler(reader, max_batch_size=10, max_tokens=250, max_wait_ms=1000)
+
+    batch = await scheduler.next_batch()
+
+    assert len(batch) == 2
+
+
+@pytest.mark.asyncio
+async def test_scheduler_flushes_partial_batch_at_deadline():
+    reader = ScriptedReader([make_entries(0, 2)])
+    scheduler = MicroBatchScheduler(reader, max_batch_size=64, max_wait_ms=20)
+
+    batch = await scheduler.next_batch()
+
+    assert len(batch) == 2
+    assert all(block <= 20 for _, block in reader.calls[1:])
+
+
+@pytest.mark.asyncio
+async def test_scheduler_returns_empty_batch_when_stream_idle():
+    scheduler = MicroBatchScheduler(ScriptedReader([]), block_ms=10)
+    assert await scheduler.next_batch() == []
+
+
+class RecordingResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class RecordingSession:
+    def __init__(self, log, results=None):
+        self.log = log
+        self.results = list(results or [])
+
+    async def execute(self, statement, params=None):
+        self.log.append(statement)
+        return RecordingResult(self.results.pop(0) if self.results else [])
+
+    async def commit(self):
+        self.log.append("commit")
+
+    async def rollback(self):
+        self.log.append("rollback")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+def compile_pg(statement):
+    from sqlalchemy.dialects import postgresql
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def make_post(post_id):
+    return {"post_id": post_id, "platform": "reddit", "content": "text", "author": "a", "created_at": None}
+
+
+def make_result(label="positive", model="m"):
+    return {"sentiment_label": label, "confidence_score": 0.9, "model_name": model, "emotion": "joy"}
+
+
+@pytest.mark.asyncio
+async def test_batch_writer_upserts_batch_in_one_transaction():
+    from batch_writer import BatchWriter
+
+    log = []
+    writer = BatchWriter(lambda: RecordingSession(log))
+    await writer.write([(make_post("p1"), make_result()), (make_post("p2"), make_result())])
+
+    assert len(log) == 4 and log[-1] == "commit"
+    assert "ON CONFLICT (post_id) DO NOTHING" in compile_pg(log[0])
+    assert "FOR UPDATE OF sentiment_analysis" in compile_pg(log[1])
+    assert "ON CONFLICT ON CONSTRAINT uq_sentiment_analysis_post_model DO UPDATE" in compile_pg(log[2])
+    assert "emotion = coalesce(excluded.emotion, sentiment_analysis.emotion)" in compile_pg(log[2])
+
+
+@pytest.mark.asyncio
+async def test_batch_writer_moves_rollup_counts_in_the_same_transaction():
+    from collections import namedtuple
+    from datetime import datetime, timezone
+    from batch_writer import BatchWriter
+
+    Row = namedtuple("Row", "post_id model_name sentiment_label emotion analyzed_at platform")
+    earlier = datetime(2024, 5, 1, 12, 0, 30, tzinfo=timezone.utc)
+    now = datetime(2024, 5, 1, 12, 5, 10, tzinfo=timezone.utc)
+    previous = [Row("p1", "m", "negative", None, earlier, "reddit")]
+    written = [
+        Row("p1", "m", "positive", "joy", now, None),
+        Row("p2", "m", "positive", "joy", now, None),
+    ]
+
+    log = []
+    writer = BatchWriter(lambda: RecordingSession(log, [[], previous, written]))
+    await writer.write([(make_post("p1"), make_result()), (make_post("p2"), make_result())])
+
+    assert len(log) == 5 and log[-1] == "commit"
+    sql = compile_pg(log[3])
+    assert (
+        "ON CONFLICT (bucket, platform, sentiment_label, emotion) DO UPDATE SET "
+        "count = (sentiment_rollup_minute.count + excluded.count)"
+    ) in sql
+    params = log[3].compile().params
+    rows = sorted(
+        (params[f"bucket_m{i}"].minute, params[f"sentiment_label_m{i}"], params[f"emotion_m{i}"], params[f"count_m{i}"])
+        for i in range(2)
+    )
+    assert rows == [(0, "negative", "", -1), (5, "positive", "joy", 2)]
+
+
+@pytest.mark.asyncio
+async def test_batch_writer_moves_deferred_emotions_between_rollup_keys():
+    from collections import namedtuple
+    from datetime import datetime, timezone
+    from batch_writer import BatchWriter
+
+    Row = namedtuple("Row", "post_id model_name sentiment_label emotion analyzed_at platform")
+    at = datetime(2024, 5, 1, 12, 0, 30, tzinfo=timezone.utc)
+    log = []
+    writer = BatchWriter(lambda: RecordingSession(log, [[Row("p1", "m", "positive", None, at, "reddit")]]))
+    await writer.update_emotions([("p1", "m", "joy")])
+
+    params = log[2].compile().params
+    changes = {params[f"emotion_m{i}"]: params[f"count_m{i}"] for i in range(2)}
+    assert changes == {"": -1, "joy": 1}
+    assert log[-1] == "commit"
+
+
+def test_batch_writer_collapses_redelivered_rows():
+    from batch_writer import BatchWriter
+
+    writer = BatchWriter(None)
+    post_stmt, analysis_stmt = writer.build_statements([
+        (make_post("p1"), make_result("negative")),
+        (make_post("p1"), make_result("positive")),
+    ])
+
+    post_params = post_stmt.compile().params
+    analysis_params = analysis_stmt.compile().params
+    assert "post_id_m1" not in post_params
+    assert analysis_params["sentiment_label_m0"] == "positive"
+    assert "sentiment_label_m1" not in analysis_params
+
+
+class PipelineRedis:
+    def __init__(self, events):
+        self.events = events
+        self.executed = []
+
+    def pipeline(self, transaction=True):
+        return RecordingPipeline(self)
+
+
+class RecordingPipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.commands = []
+
+    def xack(self, stream, group, *ids):
+        self.commands.append(("xack", stream, group) + ids)
+        return self
+
+    def xadd(self, stream, fields):
+        self.commands.append(("xadd", stream, dict(fields)))
+        return self
+
+    def publish(self, channel, message):
+        self.commands.append(("publish", channel, json.loads(message)))
+        return self
+
+    async def execute(self):
+        self.redis_client.executed.append(self.commands)
+        self.redis_client.events.append("redis")
+        return [1] * len(self.commands)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class FakeAnalyzer:
+    def __init__(self):
+        self.calls = []
+        self.cache = None
+        self.cascade = False
+        self.stage_counts = {"lexicon": 0, "model": 0}
+
+    async def batch_analyze(self, texts, with_emotion=True):
+        self.calls.append(list(texts))
+        return [dict(make_result(), emotion="joy" if with_emotion else None) for _ in texts]
+
+    async def analyze_emotion_batch(self, texts):
+        self.calls.append(list(texts))
+        return [{"emotion": "anger"} for _ in texts]
+
+
+class FakeWriter:
+    def __init__(self, events, fail=False):
+        self.events = events
+        self.fail = fail
+        self.rows = []
+
+    async def write(self, rows):
+        if self.fail:
+            raise RuntimeError("db down")
+        self.rows.extend(rows)
+        self.events.append("commit")
+
+    async def update_emotions(self, updates):
+        if self.fail:
+            raise RuntimeError("db down")
+        self.events.append(("emotions", list(updates)))
+
+
+def load_worker_module():
+    # The repo root is also on sys.path, so a plain "import worker" can pick up
+    # the worker/ package instead of worker/worker.py depending on test order.
+    module = sys.modules.get("worker")
+    if not hasattr(module, "SentimentWorker"):
+        sys.path.insert(0, WORKER_DIR)
+        spec = importlib.util.spec_from_file_location("worker", os.path.join(WORKER_DIR, "worker.py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["worker"] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+def make_worker(events, writer_fails=False):
+    SentimentWorker = load_worker_module().SentimentWorker
+
+    worker = SentimentWorker(
+        redis_client=PipelineRedis(events),
+        db_session_maker=None,
+        stream_name="test_stream",
+        consumer_group="test_group"
+    )
+    worker.analyzer = FakeAnalyzer()
+    worker.writer = FakeWriter(events, fail=writer_fails)
+    return worker
+
+
+@pytest.mark.asyncio
+async def test_process_batch_acks_all_ids_in_one_pipeline_after_commit():
+    events = []
+    worker = make_worker(events)
+    entries = make_entries(0, 3) + [("3-0", {"post_id": "p3"})]
+
+    processed = await worker.process_batch(entries)
+
+    assert processed == 3
+    assert worker.analyzer.calls == [["hello world"] * 3]
+    assert events == ["commit", "redis"]
+    (ack, publish), = worker.redis_client.executed
+    assert ack == ("xack", "test_stream", "test_group", "3-0", "0-0", "1-0", "2-0")
+    assert publish[:2] == ("publish", "sentiment_updates")
+    assert [post["post_id"] for post in publish[2]["posts"]] == ["p0", "p1", "p2"]
+    assert worker.round_trips_per_message == pytest.approx(1 / 3)
+
+
+
+def test_stream_codec_round_trips_msgpack_and_passes_legacy_fields():
+    pytest.importorskip("msgpack")
+    from common.stream_codec import decode_entry, encode_post
+
+    post = {"post_id": "p1", "platform": "reddit", "content": "caf\u00e9 \U0001f600", "author": "a",
+            "created_at": "2024-01-01T00:00:00Z"}
+    encoded = encode_post(post, "msgpack")
+    assert list(encoded) == ["p"]
+
+    # A decode_responses=True client hands the payload over as a
+    # surrogate-escaped str; retry metadata rides alongside it.
+    as_read = {"p": encoded["p"].decode("utf-8", "surrogateescape"), "_attempts": "2"}
+    assert decode_entry(as_read) == dict(post, _attempts="2")
+    assert decode_entry(encode_post(post, "fields")) == post
+
+
+@pytest.mark.asyncio
+async def test_scheduler_decodes_msgpack_once_and_costs_both_encodings_alike(monkeypatch):
+    pytest.importorskip("msgpack")
+    import common.stream_codec as codec
+    from batch_scheduler import estimate_tokens
+
+    post = {"post_id": "p1", "platform": "reddit", "content": "x" * 400, "author": "a", "created_at": "t"}
+    packed = codec.encode_post(post, "msgpack")
+    packed["p"] = packed["p"].decode("utf-8", "surrogateescape")
+    reader = ScriptedReader([[("1-0", packed), ("2-0", codec.encode_post(post, "fields")), ("3-0", {"p": "junk"})]])
+    scheduler = MicroBatchScheduler(reader, max_batch_size=3, max_wait_ms=1000)
+
+    unpacked = []
+    unpackb = codec.msgpack.unpackb
+    monkeypatch.setattr(codec.msgpack, "unpackb", lambda payload: unpacked.append(payload) or unpackb(payload))
+
+    batch = await scheduler.next_batch()
+    assert batch[0] == ("1-0", post) and batch[1] == ("2-0", post)
+    assert batch[2] == ("3-0", {"p": "junk"})
+    assert estimate_tokens(batch[0][1]) == estimate_tokens(batch[1][1]) == 102
+    assert len(unpacked) == 2
+
+    # The worker's own decode_entry passes the decoded dict straight through.
+    assert codec.decode_entry(batch[0][1]) is batch[0][1]
+    assert len(unpacked) == 2
+
+
+@pytest.mark.asyncio
+async def test_worker_accepts_both_stream_encodings_during_migration():
+    pytest.importorskip("msgpack")
+    from common.stream_codec import encode_post
+
+    events = []
+    worker = make_worker(events)
+    packed = encode_post({"post_id": "m1", "platform": "twitter", "content": "hello world", "author": "a",
+                          "created_at": "2024-01-01T00:00:00Z"}, "msgpack")
+    entries = [
+        ("1-0", {"p": packed["p"].decode("utf-8", "surrogateescape")}),
+        ("2-0", {"post_id": "f1", "platform": "twitter", "content": "hello world", "content_hash": "abc"}),
+        ("3-0", {"p": "not msgpack"}),
+    ]
+
+    assert await worker.process_batch(entries) == 2
+    assert worker.content_repeats == 1
+
+    written = [post["post_id"] for post, _ in worker.writer.rows]
+    assert written == ["m1", "f1"]
+    (ack, _), = worker.redis_client.executed
+    assert ack[3:] == ("3-0", "1-0", "2-0")
+
+
+@pytest.mark.asyncio
+async def test_tagged_repeats_skip_inference_with_cache_disabled(monkeypatch):
+    from common.text_hash import text_hash
+
+    monkeypatch.setenv("INFERENCE_CACHE_ENABLED", "false")
+    events = []
+    worker = make_worker(events)
+    digest = text_hash("hello world")
+
+    await worker.process_batch([("1-0", {"post_id": "a", "content": "hello world"})])
+    await worker.process_batch([
+        ("2-0", {"post_id": "b", "content": "hello world", "content_hash": digest}),
+        ("3-0", {"post_id": "c", "content": "something else"}),
+    ])
+
+    assert worker.analyzer.calls == [["hello world"], ["something else"]]
+    assert worker.repeats_served == 1
+    assert [post["post_id"] for post, _ in worker.writer.rows] == ["a", "b", "c"]
+    assert worker.writer.rows[1][1]["sentiment_label"] == "positive"
+
+
+@pytest.mark.asyncio
+async def test_failed_messages_move_to_retry_lane_then_dead_letter_without_sleeping(monkeypatch):
+    events = []
+    worker = make_worker(events, writer_fails=True)
+
+    async def no_sleep(seconds):
+        raise AssertionError("failed messages must not block the batch")
+
+    monkeypatch.setattr("asyncio.sleep", no_sleep)
+
+    processed = await worker.process_batch(make_entries(0, 2))
+
+    assert processed == 0
+    retry_pipes = [cmds for cmds in worker.redis_client.executed if cmds[0][0] == "xadd"]
+    assert len(retry_pipes) == 2
+    for cmds in retry_pipes:
+        (_, stream, fields), ack = cmds
+        assert stream == "test_stream:retry"
+        assert fields["_attempts"] == 1
+        assert fields["_error"] == "RuntimeError: db down"
+        assert ack[:3] == ("xack", "test_stream", "test_group")
+    assert worker.retry_lane.retried == 2
+
+    worker.redis_client.executed.clear()
+    _, retried = retry_pipes[0][0][1:]
+    retried = {k: str(v) for k, v in retried.items()}
+    for attempt in (2, 3):
+        await worker.process_batch([(f"{attempt}-1", retried)], stream_name="test_stream:retry")
+        (_, stream, fields), ack = worker.redis_client.executed[-1]
+        assert ack == ("xack", "test_stream:retry", "test_group", f"{attempt}-1")
+        retried = {k: str(v) for k, v in fields.items()}
+
+    assert stream == "test_stream:dead"
+    assert fields["_attempts"] == 3
+    assert fields["_origin_id"] in ("0-0", "1-0")
+    assert "_retry_at" not in fields
+    assert worker.retry_lane.dead_lettered == 1
+
+
+def test_retry_lane_backs_off_exponentially():
+    from retry_lane import RetryLane
+
+    lane = RetryLane(None, "s", "g", "c", max_attempts=5, base_delay_ms=100)
+    pipe = RecordingPipeline(PipelineRedis([]))
+    data = {"post_id": "p"}
+    delays = []
+    for attempt in range(4):
+        before = int(time.time() * 1000)
+        lane.enqueue(pipe, "1-0", data, ValueError("x"))
+        data = pipe.commands[-1][2]
+        delays.append(data["_retry_at"] - before)
+
+    assert [round(d, -2) for d in delays] == [100, 200, 400, 800]
+
+
+@pytest.mark.asyncio
+async def test_retry_lane_processes_due_entries_without_waiting_for_later_ones():
+    import asyncio
+    from retry_lane import RetryLane
+
+    now_ms = int(time.time() * 1000)
+    reads = [[("s:retry", [("1-0", {"post_id": "due", "_retry_at": now_ms - 10}),
+                           ("2-0", {"post_id": "later", "_retry_at": now_ms + 2000})])]]
+
+    class RetryRedis:
+        def __init__(self):
+            self.calls = []
+
+        async def xgroup_create(self, *args, **kwargs):
+            pass
+
+        async def xreadgroup(self, group, consumer, streams, count, block):
+            self.calls.append((count, block))
+            if reads:
+                return reads.pop(0)
+            raise asyncio.CancelledError
+
+    processed = []
+
+    async def process_batch(entries, stream_name=None):
+        processed.append([message_id for message_id, _ in entries])
+
+    redis_client = RetryRedis()
+    lane = RetryLane(redis_client, "s", "g", "c")
+    with pytest.raises(asyncio.CancelledError):
+        await lane.drain(process_batch)
+
+    assert processed == [["1-0"]]
+    (_, first_block), (count, next_block) = redis_client.calls
+    assert first_block == 5000
+    # The later entry is held back, and the next read only blocks until it is due.
+    assert count == lane.batch_size - 1
+    assert 1000 < next_block <= 2000
+
+
+class ReclaimRedis:
+    def __init__(self, pages, consumers):
+        self.pages = pages
+        self.consumers = consumers
+        self.claims = []
+        self.deleted_consumers = []
+
+    async def xautoclaim(self, stream, group, consumer, min_idle_time, start_id="0-0", count=None):
+        self.claims.append((stream, consumer, min_idle_time, start_id))
+        return self.pages.pop(0)
+
+    async def xinfo_consumers(self, stream, group):
+        return self.consumers
+
+    async def xgroup_delconsumer(self, stream, group, name):
+        self.deleted_consumers.append(name)
+        return 0
+
+
+@pytest.mark.asyncio
+async def test_reclaimer_claims_idle_entries_and_removes_stale_consumers():
+    from reclaim import PendingReclaimer
+
+    redis_client = ReclaimRedis(
+        pages=[
+            ["5-0", [("1-0", {"post_id": "a", "content": "x"}), ("2-0", {"post_id": "b", "content": "y"})], []],
+            ["0-0", [("5-0", {"post_id": "c", "content": "z"})], ["3-0"]],
+        ],
+        consumers=[
+            {"name": "worker-1", "pending": 0, "idle": 900000},
+            {"name": "worker-2", "pending": 2, "idle": 900000},
+            {"name": "worker-3", "pending": 0, "idle": 1000},
+            {"name": "worker-me", "pending": 0, "idle": 900000},
+        ]
+    )
+    reclaimer = PendingReclaimer(redis_client, ["s"], "g", "worker-me", min_idle_ms=60000, stale_consumer_ms=300000)
+    batches = []
+
+    async def process_batch(entries, stream_name=None):
+        batches.append(([message_id for message_id, _ in entries], stream_name))
+        return len(entries)
+
+    claimed = await reclaimer.run_once(process_batch)
+
+    assert claimed == 3
+    assert batches == [(["1-0", "2-0"], "s"), (["5-0"], "s")]
+    assert [claim[3] for claim in redis_client.claims] == ["0-0", "5-0"]
+    assert all(claim[1:3] == ("worker-me", 60000) for claim in redis_client.claims)
+    assert redis_client.deleted_consumers == ["worker-1"]
+    assert reclaimer.stats() == {"runs": 1, "reclaimed": 3, "deleted": 1, "consumers_removed": 1}
+
+
+class LagRedis:
+    def __init__(self, groups):
+        self.groups = groups
+
+    async def xinfo_groups(self, stream):
+        return self.groups
+
+
+def make_controller(groups=None, **kwargs):
+    from adaptive import AdaptiveController
+
+    scheduler = MicroBatchScheduler(ScriptedReader([]), max_batch_size=32, max_wait_ms=50, block_ms=5000)
+    options = dict(target_latency_ms=500, min_batch_size=4, max_batch_size=256,
+                   min_block_ms=100, max_block_ms=5000, max_wait_ms=200, smoothing=1.0)
+    options.update(kwargs)
+    return AdaptiveController(LagRedis(groups or []), "s", "g", scheduler, **options)
+
+
+@pytest.mark.asyncio
+async def test_adaptive_controller_grows_batches_and_stops_blocking_under_lag():
+    controller = make_controller([{"name": "other", "lag": 0, "pending": 0}, {"name": "g", "lag": 5000, "pending": 40}])
+    controller.record(32, 0.064, 0.016)
+
+    lag, pending = await controller.read_lag()
+    assert controller.apply(lag, pending)
+
+    assert (lag, pending) == (5000, 40)
+    assert controller.scheduler.max_batch_size == 64
+    assert controller.scheduler.block_ms == 100
+    assert controller.scheduler.max_wait_ms == 0
+
+    controller.record(64, 0.9, 0.1)
+    controller.apply(lag, pending)
+    assert controller.scheduler.max_batch_size == 32
+
+
+def test_adaptive_controller_spends_idle_headroom_on_gathering_window():
+    controller = make_controller()
+    assert not controller.apply(None, 0)
+
+    controller.record(8, 0.08, 0.02)
+    assert controller.apply(0, 0)
+
+    assert controller.scheduler.max_batch_size == 32
+    assert controller.scheduler.block_ms == 5000
+    assert controller.scheduler.max_wait_ms == 200
+    assert controller.decisions == 1
+
+
+def test_supervisor_scales_on_lag_within_bounds_and_cpu(monkeypatch):
+    from supervisor import WorkerSupervisor
+
+    monkeypatch.setenv("SUPERVISOR_SCALE_UP_LAG", "100")
+    monkeypatch.setenv("SUPERVISOR_SCALE_DOWN_LAG", "10")
+    monkeypatch.setenv("SUPERVISOR_MAX_CPU", "0.8")
+    monkeypatch.setenv("SUPERVISOR_COOLDOWN_SECONDS", "0")
+    supervisor = WorkerSupervisor(None, "s", "g", min_workers=1, max_workers=3)
+
+    assert supervisor.decide(250, 0, 0.2, 2)[0] == 3
+    assert supervisor.decide(150, 0, 0.2, 2)[0] == 2
+    assert supervisor.decide(5000, 0, 0.2, 3)[0] == 3
+    assert supervisor.decide(5000, 0, 0.95, 2) == (2, "backlog 5000 but CPU at 95%")
+    assert supervisor.decide(None, 400, 0.2, 1)[0] == 2
+    assert supervisor.decide(0, 0, 0.2, 2)[0] == 1
+    assert supervisor.decide(0, 0, 0.2, 1)[0] == 1
+    assert supervisor.decide(0, 0, 0.2, 0)[0] == 1
+
+
+def test_supervisor_reports_per_child_throughput():
+    from supervisor import ChildWorker, WorkerSupervisor
+
+    class Progress:
+        value = 0
+
+    class Process:
+        pid = 42
+        exitcode = None
+
+        def is_alive(self):
+            return True
+
+    supervisor = WorkerSupervisor(None, "s", "g", min_workers=1, max_workers=2)
+    child = ChildWorker(0, "worker-host-0", Process(), Progress())
+    supervisor.children[0] = child
+    child.last_sampled -= 2.0
+    child.progress.value = 100
+    child.sample()
+
+    status = supervisor.status()
+    assert status["workers"] == 1
+    assert status["processed"] == 100
+    assert status["children"][0]["consumer"] == "worker-host-0"
+    assert status["children"][0]["messages_per_second"] == pytest.approx(50, rel=0.05)
+
+
+@pytest.mark.asyncio
+async def test_status_server_serves_registered_routes():
+    import asyncio
+    from status_server import StatusServer
+
+    server = StatusServer(host="127.0.0.1", port=0)
+    server.route("/status", lambda: {"workers": 2})
+    await server.start()
+    port = server.server.sockets[0].getsockname()[1]
+
+    async def get(path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+        response = await reader.read()
+        writer.close()
+        return response.decode()
+
+    try:
+        ok = await get("/status?verbose=1")
+        missing = await get("/nope")
+    finally:
+        await server.stop()
+
+    assert ok.startswith("HTTP/1.1 200 OK")
+    assert ok.endswith('{"workers": 2}')
+    assert missing.startswith("HTTP/1.1 404")
+
+
+def test_metrics_registry_renders_prometheus_text():
+    from metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    stages = registry.histogram("stage_seconds", "Stage time.", "stage", buckets=(0.01, 0.1, 1))
+    registry.counter("processed_total", "Processed posts.", lambda: 7)
+    registry.counter("cascade_total", "Posts per stage.", lambda: {"model": 2, "lexicon": 5}, label="stage")
+    stages.observe("ack", 0.005)
+    stages.observe("ack", 0.1)
+    stages.observe("ack", 3.0)
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE processed_total counter" in lines
+    assert "processed_total 7" in lines
+    assert "# TYPE cascade_total counter" in lines
+    assert 'cascade_total{stage="lexicon"} 5' in lines and 'cascade_total{stage="model"} 2' in lines
+    assert "# TYPE stage_seconds histogram" in lines
+    assert 'stage_seconds_bucket{stage="ack",le="0.01"} 1' in lines
+    assert 'stage_seconds_bucket{stage="ack",le="0.1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="ack",le="1"} 2' in lines
+    assert 'stage_seconds_bucket{stage="ack",le="+Inf"} 3' in lines
+    assert 'stage_seconds_count{stage="ack"} 3' in lines
+
+
+
+class RetentionRedis:
+    def __init__(self, groups, pending_min=None, length=0, owner=None):
+        self.groups = groups
+        self.pending_min = pending_min
+        self.length = length
+        self.owner = owner
+        self.trims = []
+
+    async def set(self, key, value, nx=False, px=None):
+        if self.owner is not None:
+            return None
+        self.owner = value
+        return True
+
+    async def get(self, key):
+        return self.owner
+
+    async def pexpire(self, key, ttl):
+        return True
+
+    async def xinfo_groups(self, stream):
+        return self.groups
+
+    async def xpending(self, stream, group):
+        return {"pending": 1, "min": self.pending_min[group], "max": self.pending_min[group], "consumers": []}
+
+    async def xtrim(self, stream, maxlen=None, approximate=True, minid=None):
+        self.trims.append((stream, minid, maxlen, approximate))
+        removed = 10 if minid else self.length - maxlen
+        self.length -= removed
+        return removed
+
+    async def xlen(self, stream):
+        return self.length
+
+    async def memory_usage(self, key):
+        return self.length * 100
+
+
+@pytest.mark.asyncio
+async def test_retention_trims_to_oldest_unacknowledged_entry_across_groups():
+    from retention import StreamRetention
+
+    redis_client = RetentionRedis(
+        groups=[
+            {"name": "sentiment_workers", "pending": 3, "last-delivered-id": "1700000009000-0"},
+            {"name": "audit", "pending": 0, "last-delivered-id": "1700000000500-4"},
+            {"name": "archive", "pending": 0, "last-delivered-id": "1700000020000-0"},
+        ],
+        pending_min={"sentiment_workers": "1700000001000-0"},
+        length=50
+    )
+    retention = StreamRetention(redis_client, ["s"], "worker-1", max_len=1000, interval_seconds=1)
+
+    assert await retention.run_once() == 10
+
+    assert redis_client.trims == [("s", "1700000000500-5", None, True)]
+    assert retention.lengths == {"s": 40}
+    assert retention.memory_bytes == {"s": 4000}
+    assert retention.stats()["leader"] is True
+
+
+@pytest.mark.asyncio
+async def test_retention_enforces_hard_ceiling_and_only_leader_trims():
+    from retention import StreamRetention
+    from metrics import MetricsRegistry
+
+    redis_client = RetentionRedis(groups=[{"name": "g", "pending": 0, "last-delivered-id": "0-0"}], length=5000)
+    retention = StreamRetention(redis_client, ["s"], "worker-1", max_len=1000, interval_seconds=1)
+
+    await retention.run_once()
+
+    assert redis_client.trims == [("s", "0-1", None, True), ("s", None, 1000, True)]
+    assert retention.forced_trimmed == 3990
+    assert retention.lengths == {"s": 1000}
+
+    follower = StreamRetention(redis_client, ["s"], "worker-2", max_len=1000, interval_seconds=1)
+    await follower.run_once()
+    assert len(redis_client.trims) == 2
+    assert follower.lengths == {"s": 1000}
+
+    registry = MetricsRegistry()
+    registry.gauge("stream_length", "Stream entries.", lambda: follower.lengths, label="stream")
+    assert 'stream_length{stream="s"} 1000' in registry.render().splitlines()
+
+
+@pytest.mark.asyncio
+async def test_worker_records_stage_latencies_and_samples_logs(capsys):
+    events = []
+    worker = make_worker(events)
+    now_ms = int(time.time() * 1000)
+    entries = [(f"{now_ms - 2000}-{i}", {"post_id": f"p{i}", "content": "hello"}) for i in range(3)]
+
+    await worker.process_batch(entries)
+
+    stages = worker.stage_seconds
+    assert stages.count("queue_wait") == 3
+    assert stages.count("db_write") == 1
+    assert stages.count("ack") == 1
+    assert 'sentiment_worker_stage_seconds_bucket{stage="queue_wait",le="2.5"} 3' in worker.metrics.render()
+    assert "sentiment_worker_processed_total 3" in worker.metrics.render()
+    worker.analyzer.stage_counts["lexicon"] = 4
+    assert 'sentiment_worker_cascade_posts_total{stage="lexicon"} 4' in worker.metrics.render()
+    assert "Processed:" not in capsys.readouterr().out
+
+    worker.log_sample_rate = 1.0
+    await worker.process_batch([(f"{now_ms}-9", {"post_id": "p9", "content": "hello"})])
+    assert "Processed: p9" in capsys.readouterr().out
+
+
+@pytest.mark.asyncio
+async def test_deferred_emotion_persists_sentiment_first_then_backfills(monkeypatch):
+    monkeypatch.setenv("WORKER_DEFERRED_EMOTION", "true")
+    events = []
+    worker = make_worker(events)
+    worker.emotion_lane.analyzer = worker.analyzer
+    worker.emotion_lane.writer = worker.writer
+
+    await worker.process_batch(make_entries(0, 2))
+
+    commands, = worker.redis_client.executed
+    queued = [cmd for cmd in commands if cmd[0] == "xadd"]
+    assert [(stream, fields["post_id"], fields["model_name"]) for _, stream, fields in queued] == [
+        ("test_stream:emotion", "p0", "m"), ("test_stream:emotion", "p1", "m")
+    ]
+    assert commands[2][0] == "xack"
+    assert [post["emotion"] for post in commands[3][2]["posts"]] == [None, None]
+
+    backfilled = await worker.emotion_lane.backfill([("5-0", queued[0][2]), ("6-0", queued[1][2])])
+
+    assert backfilled == 2
+    assert events[-2] == ("emotions", [("p0", "m", "anger"), ("p1", "m", "anger")])
+    ack, publish = worker.redis_client.executed[-1]
+    assert ack == ("xack", "test_stream:emotion", "test_group", "5-0", "6-0")
+    assert publish[2] == {"type": "emotion_updates", "updates": [
+        {"post_id": "p0", "emotion": "anger"}, {"post_id": "p1", "emotion": "anger"}
+    ]}
+
+
+@pytest.mark.asyncio
+async def test_reclaimed_emotion_entries_are_backfilled_and_failures_dead_lettered(monkeypatch):
+    monkeypatch.setenv("WORKER_DEFERRED_EMOTION", "true")
+    events = []
+    worker = make_worker(events)
+    lane = worker.emotion_lane
+    lane.analyzer = worker.analyzer
+    lane.writer = worker.writer
+    entry = ("5-0", {"post_id": "p0", "model_name": "m", "content": "hello"})
+
+    assert "test_stream:emotion" in worker.reclaimer.streams
+    assert await worker.process_reclaimed([entry], stream_name="test_stream:emotion") == 1
+    assert events[-2] == ("emotions", [("p0", "m", "anger")])
+
+    worker.writer.fail = True
+    worker.redis_client.executed.clear()
+    for _ in range(lane.max_attempts - 1):
+        assert await lane.process([entry]) == 0
+    assert worker.redis_client.executed == [] and lane._read_id == "0"
+
+    await lane.process([entry])
+    (dead, ack), = worker.redis_client.executed
+    assert dead[1] == "test_stream:emotion:dead"
+    assert dead[2]["_origin_id"] == "5-0" and dead[2]["_attempts"] == lane.max_attempts
+    assert ack == ("xack", "test_stream:emotion", "test_group", "5-0")
+    assert lane.dead_lettered == 1 and lane.failures == {}
+
+
+def test_emotion_lane_yields_to_busy_sentiment_lane_but_not_forever(monkeypatch):
+    from emotion_lane import EmotionBackfillLane
+
+    busy = {"value": True}
+    lane = EmotionBackfillLane(None, "s", "g", "c", None, None, is_busy=lambda: busy["value"])
+    lane.max_cpu = 10.0
+    lane.max_delay_seconds = 0.05
+
+    assert lane._should_yield()
+    time.sleep(0.06)
+    assert not lane._should_yield()
+    assert lane._should_yield()
+    busy["value"] = False
+    assert not lane._should_yield()
+
+
+class RescoreAnalyzer:
+    def __init__(self):
+        self.calls = []
+
+    async def batch_analyze(self, texts, with_emotion=True):
+        self.calls.append(list(texts))
+        return [make_result(model="new-model") for _ in texts]
+
+
+class RescoreWriter:
+    def __init__(self):
+        self.rows = []
+
+    async def write(self, rows, include_posts=True):
+        assert not include_posts
+        self.rows.extend(post["post_id"] for post, _ in rows)
+
+
+@pytest.mark.asyncio
+async def test_rescore_job_streams_keyset_chunks_and_resumes_from_checkpoint(tmp_path):
+    pytest.importorskip("aiosqlite")
+    from datetime import datetime, timezone
+    from sqlalchemy import insert
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from backend.database import Base
+    from backend.models.models import SocialMediaPost
+    from rescore import RescoreJob
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'posts.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async def add_posts(start, n):
+        async with engine.begin() as conn:
+            await conn.execute(insert(SocialMediaPost), [
+                {"post_id": f"p{i}", "platform": "web", "content": f"post {i}", "author": "a",
+                 "created_at": datetime.now(timezone.utc)}
+                for i in range(start, start + n)
+            ])
+
+    await add_posts(0, 7)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    checkpoint = str(tmp_path / "checkpoint.json")
+
+    writer = RescoreWriter()
+    job = RescoreJob(session_maker, RescoreAnalyzer(), writer, "new-model", checkpoint_path=checkpoint,
+                     chunk_size=2, pass_rows=3, concurrency=2)
+    summary = await job.run()
+
+    assert writer.rows == [f"p{i}" for i in range(7)]
+    assert [len(call) for call in job.analyzer.calls] == [2, 1, 2, 1, 1]
+    assert summary["rows"] == 7 and summary["last_id"] == 7
+
+    await add_posts(7, 2)
+    writer = RescoreWriter()
+    resumed = RescoreJob(session_maker, RescoreAnalyzer(), writer, "new-model", checkpoint_path=checkpoint,
+                         chunk_size=2, pass_rows=3)
+    await resumed.run()
+
+    assert writer.rows == ["p7", "p8"]
+    with open(checkpoint) as f:
+        assert json.load(f)["rows"] == 9
+
+    other = RescoreJob(session_maker, RescoreAnalyzer(), RescoreWriter(), "other-model", checkpoint_path=checkpoint)
+    assert other.checkpoint["last_id"] == 0
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_rescore_aborts_on_failed_chunk_without_advancing_checkpoint(tmp_path):
+    from rescore import RescoreJob
+
+    class FailingAnalyzer(RescoreAnalyzer):
+        async def batch_analyze(self, texts, with_emotion=True):
+            if "post 2" in texts:
+                raise RuntimeError("model unavailable")
+            return await super().batch_analyze(texts, with_emotion)
+
+    async def chunks():
+        for start in (0, 2, 4):
+            yield [{"id": i + 1, "post_id": f"p{i}", "content": f"post {i}"} for i in range(start, start + 2)]
+
+    checkpoint = str(tmp_path / "checkpoint.json")
+    writer = RescoreWriter()
+    job = RescoreJob(None, FailingAnalyzer(), writer, "new-model", checkpoint_path=checkpoint, concurrency=1)
+    job.fetch_chunks = chunks
+
+    with pytest.raises(RuntimeError):
+        await job.run()
+
+    assert writer.rows == ["p0", "p1"]
+    with open(checkpoint) as f:
+        assert json.load(f)["last_id"] == 2
+
+
+@pytest.mark.asyncio
+async def test_rescore_throttle_paces_rows_per_second():
+    from rescore import RescoreJob
+
+    job = RescoreJob(None, None, None, "m", max_rows_per_second=100)
+    job.started = time.perf_counter()
+    job.rows = 5
+
+    started = time.perf_counter()
+    await job._throttle()
+
+    assert time.perf_counter() - started >= 0.04
+
+
+class StatusRedis:
+    def __init__(self):
+        self.hashes = {}
+        self.expiries = {}
+
+    def pipeline(self, transaction=True):
+        return StatusPipeline(self)
+
+    async def expire(self, key, seconds):
+        self.expiries[key] = seconds
+
+    async def delete(self, key):
+        self.hashes.pop(key, None)
+
+
+class StatusPipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    def hset(self, key, mapping):
+        self.redis_client.hashes.setdefault(key, {}).update(mapping)
+
+    def expire(self, key, seconds):
+        self.redis_client.expiries[key] = seconds
+
+    async def execute(self):
+        return []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class WarmupAnalyzer:
+    model_type = "external"
+
+    def __init__(self):
+        self.cache = "shared-cache"
+        self.loaded = False
+        self.cache_during_warmup = []
+
+    def load_models(self):
+        self.loaded = True
+
+    async def analyze_sentiment_batch(self, texts):
+        self.cache_during_warmup.append(self.cache)
+        return []
+
+    async def analyze_emotion_batch(self, texts):
+        return []
+
+
+@pytest.mark.asyncio
+async def test_startup_loads_warms_up_and_publishes_readiness():
+    from startup import WorkerStartup
+
+    redis_client = StatusRedis()
+    analyzer = WarmupAnalyzer()
+    startup = WorkerStartup(redis_client, analyzer, "worker-1", ttl_seconds=30)
+
+    timings = await startup.start()
+
+    assert analyzer.loaded
+    assert analyzer.cache_during_warmup == [None]
+    assert analyzer.cache == "shared-cache"
+    status = redis_client.hashes["worker_status:worker-1"]
+    assert status["ready"] == 1
+    assert set(timings) <= set(status)
+    assert redis_client.expiries["worker_status:worker-1"] == 30
+
+    await startup.stop()
+    assert "worker_status:worker-1" not in redis_client.hashes
+
+
+def test_model_snapshot_used_only_when_complete(tmp_path, monkeypatch):
+    from backend.services.model_snapshot import resolve_model_source, snapshot_path, MARKER_FILE
+
+    monkeypatch.setenv("MODEL_SNAPSHOT_DIR", str(tmp_path))
+    path = snapshot_path("org/model")
+    os.makedirs(path)
+    assert resolve_model_source("org/model") == "org/model"
+
+    open(os.path.join(path, MARKER_FILE), "w").close()
+    assert resolve_model_source("org/model") == path
+
+
+def test_model_snapshot_is_renamed_into_place_and_first_writer_wins(tmp_path, monkeypatch):
+    from backend.services.model_snapshot import resolve_model_source, save_snapshot, snapshot_path
+
+    class SavingPipeline:
+        def __init__(self, weights):
+            self.weights = weights
+            self.saved_to = None
+
+        def save_pretrained(self, path, safe_serialization=True):
+            self.saved_to = path
+            with open(os.path.join(path, "model.safetensors"), "w") as f:
+                f.write(self.weights)
+
+    monkeypatch.setenv("MODEL_SNAPSHOT_DIR", str(tmp_path))
+    path = snapshot_path("org/model")
+    os.makedirs(path)
+    first, second = SavingPipeline("first"), SavingPipeline("second")
+
+    assert save_snapshot(first, "org/model")
+    assert first.saved_to != path
+    assert save_snapshot(second, "org/model")
+
+    assert resolve_model_source("org/model") == path
+    with open(os.path.join(path, "model.safetensors")) as f:
+        assert f.read() == "first"
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(path)]
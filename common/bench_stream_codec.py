@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import redis.asyncio as redis
+
+from common.stream_codec import decode_entry, encode_post
+
+SAMPLE_POST = {
+    "post_id": "post_3f2b9c0e4d5a",
+    "platform": "twitter",
+    "content": "Amazing experience with Galaxy S24, highly recommend! #tech #review",
+    "author": "user_4821",
+    "created_at": "2024-05-01T12:34:56.789012Z",
+}
+
+
+def payload_bytes(fields: dict) -> int:
+    return sum(len(k) + len(v if isinstance(v, bytes) else str(v).encode()) for k, v in fields.items())
+
+
+async def fill_stream(client, key: str, encoding: str, entries: int):
+    await client.delete(key)
+    async with client.pipeline(transaction=False) as pipe:
+        for i in range(entries):
+            pipe.xadd(key, encode_post(dict(SAMPLE_POST, post_id=f"post_{i:012d}"), encoding))
+        await pipe.execute()
+
+
+async def time_read(client, key: str, batch: int, iterations: int) -> float:
+    # Replies come back through the public client with the worker's decoding
+    # settings, so RESP parsing is part of the measurement, as in the worker.
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for _, fields in await client.xrange(key, count=batch):
+            decode_entry(fields)
+    return (time.perf_counter() - started) / (iterations * batch) * 1e6
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the field and msgpack stream encodings against Redis.")
+    parser.add_argument("--batch", type=int, default=64, help="entries per XRANGE reply")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--entries", type=int, default=10000,
+                        help="entries written per encoding for the MEMORY USAGE figure")
+    args = parser.parse_args(argv)
+
+    client = redis.Redis(
+        host=os.getenv("REDIS_HOST", "localhost"),
+        port=int(os.getenv("REDIS_PORT", 6379)),
+        decode_responses=True,
+        encoding_errors="surrogateescape"
+    )
+    try:
+        for encoding in ("fields", "msgpack"):
+            key = f"bench_stream_codec:{encoding}"
+            await fill_stream(client, key, encoding, max(args.entries, args.batch))
+            try:
+                read_us = await time_read(client, key, args.batch, args.iterations)
+                memory = await client.memory_usage(key, samples=0) / max(args.entries, args.batch)
+            finally:
+                await client.delete(key)
+            print(
+                f"{encoding:>8}: {payload_bytes(encode_post(SAMPLE_POST, encoding))} payload bytes/entry, "
+                f"{read_us:.1f} us/entry to fetch and decode, {memory:.1f} Redis bytes/entry"
+            )
+    finally:
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+import os
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SCHEMA_VERSION = 1
+PAYLOAD_FIELD = "p"
+POST_FIELDS = ("post_id", "platform", "content", "author", "created_at")
+# Set only on some entries, so they stay separate fields in both encodings.
+OPTIONAL_FIELDS = ("content_hash",)
+
+
+def stream_encoding() -> str:
+    return os.getenv("STREAM_ENCODING", "fields").lower()
+
+
+def _optional(post: dict) -> dict:
+    return {field: post[field] for field in OPTIONAL_FIELDS if post.get(field)}
+
+
+def encode_fields(post: dict) -> dict:
+    fields = {field: post[field] for field in POST_FIELDS}
+    fields.update(_optional(post))
+    return fields
+
+
+def encode_msgpack(post: dict) -> dict:
+    if msgpack is None:
+        raise RuntimeError("STREAM_ENCODING=msgpack requires the msgpack package")
+    # A positional array under one field: replies carry one field name
+    # instead of five and the consumer unpacks a single value.
+    fields = {PAYLOAD_FIELD: msgpack.packb([SCHEMA_VERSION] + [post[field] for field in POST_FIELDS])}
+    fields.update(_optional(post))
+    return fields
+
+
+def encode_post(post: dict, encoding: str = None) -> dict:
+    if (encoding or stream_encoding()) == "msgpack":
+        return encode_msgpack(post)
+    return encode_fields(post)
+
+
+def decode_entry(data: dict) -> dict:
+    payload = data.get(PAYLOAD_FIELD)
+    if payload is None:
+        # Pre-migration entry written as separate string fields.
+        return data
+    if msgpack is None:
+        raise RuntimeError("Received a msgpack stream entry but the msgpack package is not installed")
+
+    if isinstance(payload, str):
+        # Clients with decode_responses=True must use
+        # encoding_errors="surrogateescape" so the raw bytes survive.
+        payload = payload.encode("utf-8", "surrogateescape")
+    values = msgpack.unpackb(payload)
+    if values[0] != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported stream schema version {values[0]}")
+
+    decoded = dict(zip(POST_FIELDS, values[1:]))
+    if len(data) > 1:
+        # Optional fields and retry metadata ride alongside the payload.
+        decoded.update((k, v) for k, v in data.items() if k != PAYLOAD_FIELD)
+    return decoded
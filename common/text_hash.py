@@ -0,0 +1,9 @@
+import hashlib
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text[:512].split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode("utf-8"), usedforsecurity=False).hexdigest()
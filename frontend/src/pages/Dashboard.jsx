@@ -43,7 +43,16 @@ export default function Dashboard() {
 
         if (message.type === "new_post") {
           setPosts((prev) => [message.data, ...prev.slice(0, 49)]);
-          loadInitialData();
+        } else if (message.type === "emotion_update") {
+          const emotions = {};
+          message.data.updates.forEach((u) => {
+            emotions[u.post_id] = u.emotion;
+          });
+          setPosts((prev) =>
+            prev.map((p) =>
+              p.post_id in emotions ? { ...p, emotion: emotions[p.post_id] } : p
+            )
+          );
         } else if (message.type === "metrics_update") {
           loadInitialData();
         } else if (message.type === "connected") {
@@ -0,0 +1,143 @@
+import os
+import time
+import asyncio
+
+STATES = ("normal", "slow", "shed", "paused")
+
+
+def _platforms(value: str) -> set:
+    return {platform.strip().lower() for platform in value.split(",") if platform.strip()}
+
+
+class BackpressureController:
+    def __init__(self, redis_client, stream_name: str, consumer_group: str, slow_lag: int = None,
+                 shed_lag: int = None, pause_lag: int = None, max_stream_len: int = None,
+                 resume_ratio: float = None, slow_factor: float = None, interval_seconds: float = None,
+                 low_priority_platforms: str = None, clock=time.monotonic):
+        self.redis_client = redis_client
+        self.stream_name = stream_name
+        self.consumer_group = consumer_group
+        self.slow_lag = slow_lag or int(os.getenv("BACKPRESSURE_SLOW_LAG", "5000"))
+        self.shed_lag = shed_lag or int(os.getenv("BACKPRESSURE_SHED_LAG", "20000"))
+        self.pause_lag = pause_lag or int(os.getenv("BACKPRESSURE_PAUSE_LAG", "50000"))
+        self.max_stream_len = max_stream_len or int(os.getenv("BACKPRESSURE_MAX_STREAM_LEN", "0"))
+        self.resume_ratio = resume_ratio or float(os.getenv("BACKPRESSURE_RESUME_RATIO", "0.5"))
+        self.slow_factor = slow_factor or float(os.getenv("BACKPRESSURE_SLOW_FACTOR", "0.5"))
+        self.interval_seconds = interval_seconds or float(os.getenv("BACKPRESSURE_INTERVAL_SECONDS", "1"))
+        self.low_priority = _platforms(
+            low_priority_platforms if low_priority_platforms is not None
+            else os.getenv("LOW_PRIORITY_PLATFORMS", "tiktok,instagram")
+        )
+        self.clock = clock
+        self.status_key = f"{stream_name}:ingest_throttle"
+        self.state = "normal"
+        self.since = clock()
+        self.lag = 0
+        self.stream_len = 0
+        self.shed = 0
+        self.transitions = 0
+        self._checked = None
+
+    async def read_backlog(self):
+        lag = None
+        pending = 0
+        for group in await self.redis_client.xinfo_groups(self.stream_name):
+            if group["name"] == self.consumer_group:
+                pending = int(group.get("pending") or 0)
+                lag = group.get("lag")
+                break
+        stream_len = await self.redis_client.xlen(self.stream_name)
+        # Lag is nil when Redis cannot compute it; undelivered plus pending
+        # entries are then bounded by the stream length.
+        backlog = int(lag) + pending if lag is not None else stream_len
+        return backlog, stream_len
+
+    def decide(self, backlog: int, stream_len: int) -> str:
+        thresholds = (self.slow_lag, self.shed_lag, self.pause_lag)
+        level = sum(1 for threshold in thresholds if backlog >= threshold)
+        # Stream length only matters as a cap: without retention it also
+        # counts acknowledged entries, so it is off unless configured.
+        length_high = bool(self.max_stream_len) and stream_len >= self.max_stream_len
+        length_draining = bool(self.max_stream_len) and stream_len >= self.max_stream_len * self.resume_ratio
+        if length_high:
+            level = 3
+
+        current = STATES.index(self.state)
+        if level < current:
+            # Step down only once the backlog has drained well below the
+            # watermark that raised the level, so the state does not flap.
+            resume_at = thresholds[current - 1] * self.resume_ratio
+            if backlog > resume_at or length_draining:
+                level = current
+            else:
+                level = current - 1
+        return STATES[level]
+
+    async def update(self, force: bool = False) -> str:
+        now = self.clock()
+        if not force and self._checked is not None and now - self._checked < self.interval_seconds:
+            return self.state
+        self._checked = now
+
+        try:
+            backlog, stream_len = await self.read_backlog()
+        except Exception as e:
+            print(f"Backpressure check failed, keeping state {self.state}: {e}")
+            return self.state
+
+        self.lag = backlog
+        self.stream_len = stream_len
+        state = self.decide(backlog, stream_len)
+        if state != self.state:
+            print(
+                f"Ingest throttle {self.state} -> {state} (backlog {backlog}, stream length {stream_len}, "
+                f"shed so far {self.shed})"
+            )
+            self.state = state
+            self.since = now
+            self.transitions += 1
+        await self._report()
+        return self.state
+
+    async def _report(self):
+        try:
+            await self.redis_client.hset(self.status_key, mapping={
+                "state": self.state,
+                "rate_factor": self.rate_factor,
+                "backlog": self.lag,
+                "stream_length": self.stream_len,
+                "shed": self.shed,
+                "state_seconds": round(self.clock() - self.since, 1),
+                "updated_at": int(time.time()),
+            })
+        except Exception as e:
+            print(f"Failed to report ingest throttle state: {e}")
+
+    @property
+    def rate_factor(self) -> float:
+        if self.state == "paused":
+            return 0.0
+        if self.state == "normal":
+            return 1.0
+        return self.slow_factor
+
+    def admit(self, posts: list) -> list:
+        if self.state not in ("shed", "paused") or not self.low_priority:
+            return posts
+        kept = [post for post in posts if str(post.get("platform", "")).lower() not in self.low_priority]
+        self.shed += len(posts) - len(kept)
+        return kept
+
+    async def wait_while_paused(self):
+        while self.state == "paused":
+            await asyncio.sleep(self.interval_seconds)
+            await self.update(force=True)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "backlog": self.lag,
+            "stream_length": self.stream_len,
+            "shed": self.shed,
+            "transitions": self.transitions,
+        }
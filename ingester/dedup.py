@@ -0,0 +1,160 @@
+import os
+import math
+import hashlib
+from typing import List
+
+from common.text_hash import text_hash
+
+
+def _hashes(key: str):
+    # Double hashing: every filter slice derives its k positions from the
+    # two 64-bit halves of a single digest.
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def contains(self, h1: int, h2: int) -> bool:
+        bits, size = self.bits, self.size
+        # Reducing both hashes first keeps the loop on small ints.
+        p, step = h1 % size, h2 % size or 1
+        for _ in range(self.hash_count):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+            p = (p + step) % size
+        return True
+
+    def add(self, h1: int, h2: int) -> bool:
+        bits, size = self.bits, self.size
+        p, step = h1 % size, h2 % size or 1
+        added = False
+        for _ in range(self.hash_count):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                added = True
+            p = (p + step) % size
+        if added:
+            self.count += 1
+        return added
+
+
+class ScalableBloomFilter:
+    def __init__(self, initial_capacity: int, error_rate: float, growth: int = 2, tightening: float = 0.5):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        # Slice error rates form a geometric series that sums to error_rate.
+        self.filters = [BloomFilter(initial_capacity, error_rate * (1 - tightening))]
+
+    def add(self, key: str) -> bool:
+        h1, h2 = _hashes(key)
+        for f in self.filters[:-1]:
+            if f.contains(h1, h2):
+                return False
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            if current.contains(h1, h2):
+                return False
+            error_rate = self.error_rate * (1 - self.tightening) * self.tightening ** len(self.filters)
+            current = BloomFilter(current.capacity * self.growth, error_rate)
+            self.filters.append(current)
+        # add() reports whether any bit was unset, i.e. the key was not
+        # (probably) present in the newest slice.
+        return current.add(h1, h2)
+
+    def __contains__(self, key: str) -> bool:
+        h1, h2 = _hashes(key)
+        return any(f.contains(h1, h2) for f in self.filters)
+
+    async def add_many(self, keys: List[str]) -> List[bool]:
+        return [self.add(key) for key in keys]
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(len(f.bits) for f in self.filters)
+
+
+class RedisBloomFilter:
+    def __init__(self, redis_client, key: str, capacity: int, error_rate: float):
+        self.redis_client = redis_client
+        self.key = key
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+    async def reserve(self):
+        try:
+            await self.redis_client.execute_command(
+                "BF.RESERVE", self.key, self.error_rate, self.capacity, "EXPANSION", 2
+            )
+        except Exception as e:
+            if "exists" not in str(e).lower():
+                raise
+
+    async def add_many(self, keys: List[str]) -> List[bool]:
+        if not keys:
+            return []
+        return [bool(added) for added in await self.redis_client.execute_command("BF.MADD", self.key, *keys)]
+
+
+class PostDeduplicator:
+    def __init__(self, redis_client=None, stream_name: str = "social_posts_stream", backend: str = None,
+                 error_rate: float = None, capacity: int = None):
+        self.redis_client = redis_client
+        self.stream_name = stream_name
+        self.backend = (backend or os.getenv("INGESTER_DEDUP_BACKEND", "local")).lower()
+        self.error_rate = error_rate or float(os.getenv("INGESTER_DEDUP_ERROR_RATE", "0.001"))
+        self.capacity = capacity or int(os.getenv("INGESTER_DEDUP_CAPACITY", "1000000"))
+        self.post_ids = ScalableBloomFilter(self.capacity, self.error_rate)
+        self.contents = ScalableBloomFilter(self.capacity, self.error_rate)
+        self._ready = self.backend != "redis"
+        self.dropped = 0
+        self.tagged = 0
+
+    async def _use_redis(self):
+        # RedisBloom is optional (the stock redis:7 image lacks it); without
+        # the module the local filters stay in place.
+        self._ready = True
+        post_ids = RedisBloomFilter(self.redis_client, f"{self.stream_name}:bloom:post_ids",
+                                    self.capacity, self.error_rate)
+        contents = RedisBloomFilter(self.redis_client, f"{self.stream_name}:bloom:content",
+                                    self.capacity, self.error_rate)
+        try:
+            await post_ids.reserve()
+            await contents.reserve()
+        except Exception as e:
+            print(f"RedisBloom unavailable ({e}); deduplicating with a local scalable Bloom filter")
+            self.backend = "local"
+            return
+        self.post_ids = post_ids
+        self.contents = contents
+
+    async def filter(self, posts: list) -> list:
+        if not self._ready:
+            await self._use_redis()
+
+        is_new = await self.post_ids.add_many([post["post_id"] for post in posts])
+        kept = [post for post, new in zip(posts, is_new) if new]
+        self.dropped += len(posts) - len(kept)
+
+        hashes = [text_hash(post["content"]) for post in kept]
+        tagged = []
+        for post, digest, new in zip(kept, hashes, await self.contents.add_many(hashes)):
+            if not new:
+                # Same hash the inference cache uses, so the worker can reuse
+                # an earlier result instead of running the models again.
+                post = dict(post, content_hash=digest)
+                self.tagged += 1
+            tagged.append(post)
+        return tagged
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "dropped_post_ids": self.dropped, "tagged_content_repeats": self.tagged}
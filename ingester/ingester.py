@@ -1,3 +1,5 @@
+import sys
+import time
 import asyncio
 import os
 import random
@@ -5,6 +7,14 @@ import uuid
 from datetime import datetime, timezone
 import redis.asyncio as redis
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.stream_codec import encode_post, stream_encoding
+from dedup import PostDeduplicator
+from backpressure import BackpressureController
+from pacing import TokenBucket, RateReporter
+from replay import iter_posts
+
 POSITIVE_TEMPLATES = [
     "I absolutely love {product}! Best purchase ever!",
     "Amazing experience with {product}, highly recommend!",
@@ -65,6 +75,19 @@ class DataIngester:
         self.redis_client = redis_client
         self.posts_per_minute = posts_per_minute
         self.stream_name = os.getenv("REDIS_STREAM_NAME", "social_posts_stream")
+        self.maxlen = int(os.getenv("INGESTER_STREAM_MAXLEN", "0")) or None
+        self.encoding = stream_encoding()
+        self.dedup = None
+        if os.getenv("INGESTER_DEDUP_BACKEND", "local").lower() != "off":
+            self.dedup = PostDeduplicator(redis_client, self.stream_name)
+        self.backpressure = None
+        if os.getenv("BACKPRESSURE_ENABLED", "true").lower() == "true":
+            self.backpressure = BackpressureController(
+                redis_client,
+                self.stream_name,
+                os.getenv("REDIS_CONSUMER_GROUP", "sentiment_workers")
+            )
+        self.clock = time.monotonic
         self._running = False
 
     def generate_post(self) -> dict:
@@ -95,23 +118,156 @@ class DataIngester:
             "created_at": created_at,
         }
 
+    def _fields(self, post: dict) -> dict:
+        return encode_post(post, self.encoding)
+
+    async def _throttle(self) -> float:
+        if self.backpressure is None:
+            return 1.0
+        await self.backpressure.update()
+        await self.backpressure.wait_while_paused()
+        return self.backpressure.rate_factor
+
+    def filter_stats(self) -> dict:
+        stats = {}
+        if self.dedup is not None:
+            stats.update(
+                dropped_post_ids=self.dedup.dropped,
+                tagged_content_repeats=self.dedup.tagged,
+            )
+        if self.backpressure is not None:
+            stats["shed"] = self.backpressure.shed
+        return stats
+
+    def _admit(self, posts: list) -> list:
+        # Shedding runs before dedup so a shed post is not remembered as seen.
+        return posts if self.backpressure is None else self.backpressure.admit(posts)
+
     async def publish_post(self, post: dict) -> bool:
         try:
-            await self.redis_client.xadd(
-                self.stream_name,
-                {
-                    "post_id": post["post_id"],
-                    "platform": post["platform"],
-                    "content": post["content"],
-                    "author": post["author"],
-                    "created_at": post["created_at"],
-                }
-            )
+            if not self._admit([post]):
+                return False
+            if self.dedup is not None:
+                kept = await self.dedup.filter([post])
+                if not kept:
+                    return False
+                post = kept[0]
+            await self.redis_client.xadd(self.stream_name, self._fields(post))
             return True
         except Exception as e:
             print(f"Error publishing post: {e}")
             return False
 
+    async def publish_batch(self, posts: list) -> int:
+        try:
+            posts = self._admit(posts)
+            if self.dedup is not None:
+                posts = await self.dedup.filter(posts)
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for post in posts:
+                    # "~" trimming lets Redis drop whole macro-nodes, which is
+                    # far cheaper than an exact MAXLEN on every XADD.
+                    pipe.xadd(self.stream_name, self._fields(post), maxlen=self.maxlen, approximate=True)
+                await pipe.execute()
+            return len(posts)
+        except Exception as e:
+            print(f"Error publishing batch of {len(posts)} posts: {e}")
+            return 0
+
+    async def start_paced(self, posts_per_second: float, batch_size: int = None, duration_seconds: int = None,
+                          max_in_flight: int = None, report_interval: float = 5.0) -> dict:
+        batch_size = batch_size or int(os.getenv("INGESTER_BATCH_SIZE", "500"))
+        batch_size = max(1, min(batch_size, int(posts_per_second) or 1))
+        max_in_flight = max_in_flight or int(os.getenv("INGESTER_MAX_IN_FLIGHT", "4"))
+        bucket = TokenBucket(posts_per_second, capacity=batch_size, clock=self.clock)
+        reporter = RateReporter(posts_per_second, report_interval, clock=self.clock, extra=self.filter_stats)
+        in_flight = set()
+        start_time = self.clock()
+        self._running = True
+
+        async def send(posts):
+            reporter.add(await self.publish_batch(posts))
+
+        print(
+            f"DataIngester started in paced mode: {posts_per_second:.0f} posts/s in pipelined batches of "
+            f"{batch_size} to stream: {self.stream_name}"
+        )
+
+        try:
+            while self._running:
+                if duration_seconds and self.clock() - start_time >= duration_seconds:
+                    break
+                bucket.rate = posts_per_second * await self._throttle()
+                await bucket.acquire(batch_size)
+                # Several pipelines stay in flight so a batch's round trip
+                # overlaps with generating the next one.
+                task = asyncio.ensure_future(send([self.generate_post() for _ in range(batch_size)]))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                if len(in_flight) >= max_in_flight:
+                    await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            if in_flight:
+                await asyncio.wait(in_flight)
+        finally:
+            self._running = False
+
+        summary = reporter.summary()
+        print(f"Paced ingest finished: {summary}")
+        return summary
+
+    async def start_replay(self, path: str, speed: float = None, posts_per_second: float = None,
+                           batch_size: int = None, report_interval: float = 5.0) -> dict:
+        batch_size = batch_size or int(os.getenv("INGESTER_BATCH_SIZE", "500"))
+        bucket = TokenBucket(posts_per_second, capacity=batch_size, clock=self.clock) if posts_per_second else None
+        reporter = RateReporter(posts_per_second or 0, report_interval, clock=self.clock, extra=self.filter_stats)
+        replay_start = self.clock()
+        first_timestamp = None
+        batch = []
+        self._running = True
+
+        async def flush():
+            nonlocal replay_start
+            paused_at = self.clock()
+            factor = await self._throttle()
+            # Time spent paused shifts the schedule so spacing is kept.
+            replay_start += self.clock() - paused_at
+            if bucket is not None:
+                bucket.rate = posts_per_second * factor
+                await bucket.acquire(len(batch))
+            reporter.add(await self.publish_batch(batch))
+            batch.clear()
+
+        mode = f"{speed}x original spacing" if speed else (f"{posts_per_second:.0f} posts/s" if posts_per_second else "max rate")
+        print(f"DataIngester replaying {path} at {mode} to stream: {self.stream_name}")
+
+        try:
+            for post in iter_posts(path):
+                if not self._running:
+                    break
+                timestamp = post["_timestamp"]
+                if speed and timestamp is not None:
+                    if first_timestamp is None:
+                        first_timestamp = timestamp
+                    due = replay_start + (timestamp - first_timestamp).total_seconds() / speed
+                    delay = due - self.clock()
+                    if delay > 0:
+                        # Everything already due goes out before sleeping, so
+                        # bursts in the source stay bursts in the replay.
+                        if batch:
+                            await flush()
+                        await asyncio.sleep(delay)
+                batch.append(post)
+                if len(batch) >= batch_size:
+                    await flush()
+            if batch:
+                await flush()
+        finally:
+            self._running = False
+
+        summary = dict(reporter.summary(), source=path)
+        print(f"Replay finished: {summary}")
+        return summary
+
     async def start(self, duration_seconds: int = None):
         self._running = True
         delay = 60.0 / self.posts_per_minute
@@ -126,6 +282,7 @@ class DataIngester:
                     print(f"Ingester reached duration limit of {duration_seconds}s.")
                     break
 
+                factor = await self._throttle()
                 post = self.generate_post()
                 success = await self.publish_post(post)
 
@@ -133,7 +290,7 @@ class DataIngester:
                     posts_published += 1
                     print(f"Published: {post['post_id']} | {post['platform']} | {post['content'][:50]}...")
 
-                await asyncio.sleep(delay)
+                await asyncio.sleep(delay / factor)
 
         except KeyboardInterrupt:
             print(f"\nIngester stopped. Published {posts_published} posts.")
@@ -141,7 +298,7 @@ class DataIngester:
             print(f"Ingester error: {e}")
         finally:
             self._running = False
-            print(f"Total posts published: {posts_published}")
+            print(f"Total posts published: {posts_published} {self.filter_stats()}")
 
     def stop(self):
         self._running = False
@@ -151,6 +308,9 @@ async def main():
     redis_host = os.getenv("REDIS_HOST", "redis")
     redis_port = int(os.getenv("REDIS_PORT", 6379))
     posts_per_minute = int(os.getenv("POSTS_PER_MINUTE", 60))
+    posts_per_second = float(os.getenv("POSTS_PER_SECOND", "0"))
+    replay_file = os.getenv("REPLAY_FILE")
+    replay_speed = float(os.getenv("REPLAY_SPEED", "0"))
 
     print(f"Connecting to Redis at {redis_host}:{redis_port}...")
 
@@ -174,7 +334,12 @@ async def main():
         posts_per_minute=posts_per_minute
     )
 
-    await ingester.start()
+    if replay_file:
+        await ingester.start_replay(replay_file, speed=replay_speed or None, posts_per_second=posts_per_second or None)
+    elif posts_per_second > 0:
+        await ingester.start_paced(posts_per_second)
+    else:
+        await ingester.start()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,69 @@
+import time
+import asyncio
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic):
+        self.rate = float(rate)
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate / 10)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, n: int = 1) -> float:
+        # Tokens may go negative: the caller is told how long to wait for
+        # the debt, so time spent publishing is never slept on top of.
+        self._refill()
+        self.tokens -= n
+        return max(0.0, -self.tokens / self.rate)
+
+    async def acquire(self, n: int = 1):
+        wait = self.reserve(n)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class RateReporter:
+    def __init__(self, target_rate: float, interval_seconds: float = 5.0, clock=time.monotonic, extra=None):
+        self.target_rate = target_rate
+        self.extra = extra
+        self.interval_seconds = interval_seconds
+        self.clock = clock
+        self.started = clock()
+        self.last_report = self.started
+        self.last_count = 0
+        self.count = 0
+
+    def add(self, n: int):
+        self.count += n
+        now = self.clock()
+        if now - self.last_report >= self.interval_seconds:
+            window_rate = (self.count - self.last_count) / (now - self.last_report)
+            line = f"Ingest rate: {window_rate:.0f}/s (overall {self.achieved_rate():.0f}/s)"
+            if self.target_rate:
+                line += f" vs target {self.target_rate:.0f}/s ({self.achieved_rate() / self.target_rate:.0%})"
+            if self.extra is not None:
+                line += "".join(f", {key}={value}" for key, value in self.extra().items())
+            print(line)
+            self.last_report = now
+            self.last_count = self.count
+
+    def achieved_rate(self) -> float:
+        elapsed = self.clock() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> dict:
+        summary = {
+            "published": self.count,
+            "seconds": round(self.clock() - self.started, 2),
+            "target_rate": self.target_rate,
+            "achieved_rate": round(self.achieved_rate(), 1),
+        }
+        if self.extra is not None:
+            summary.update(self.extra())
+        return summary
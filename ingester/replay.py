@@ -0,0 +1,75 @@
+import os
+import csv
+import json
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+CONTENT_FIELDS = ("content", "text", "body", "message")
+PLATFORM_FIELDS = ("platform", "source", "network")
+AUTHOR_FIELDS = ("author", "user", "username")
+TIMESTAMP_FIELDS = ("created_at", "timestamp", "date", "time")
+ID_FIELDS = ("post_id", "id")
+
+
+def _first(record: dict, fields) -> Optional[str]:
+    for field in fields:
+        value = record.get(field)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    try:
+        if isinstance(value, (int, float)) or str(value).replace(".", "", 1).isdigit():
+            seconds = float(value)
+            # Millisecond epochs are common in exported datasets.
+            if seconds > 1e11:
+                seconds /= 1000
+            return datetime.fromtimestamp(seconds, tz=timezone.utc)
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def iter_records(path: str) -> Iterator[dict]:
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline="", encoding="utf-8") as f:
+        if extension == ".csv":
+            yield from csv.DictReader(f)
+            return
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping malformed line {line_number} in {path}: {e}")
+
+
+def to_post(record: dict, index: int) -> Optional[dict]:
+    content = _first(record, CONTENT_FIELDS)
+    if not content:
+        return None
+
+    timestamp = parse_timestamp(_first(record, TIMESTAMP_FIELDS))
+    created_at = (timestamp or datetime.now(timezone.utc)).isoformat().replace("+00:00", "Z")
+    return {
+        "post_id": str(_first(record, ID_FIELDS) or f"replay_{index}"),
+        "platform": str(_first(record, PLATFORM_FIELDS) or "replay"),
+        "content": str(content),
+        "author": str(_first(record, AUTHOR_FIELDS) or "anonymous"),
+        "created_at": created_at,
+        "_timestamp": timestamp,
+    }
+
+
+def iter_posts(path: str) -> Iterator[dict]:
+    for index, record in enumerate(iter_records(path)):
+        post = to_post(record, index)
+        if post is not None:
+            yield post
@@ -0,0 +1,123 @@
+import os
+import asyncio
+
+
+def cpu_utilization() -> float:
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return 0.0
+
+
+async def read_group_lag(redis_client, stream_name: str, consumer_group: str):
+    for group in await redis_client.xinfo_groups(stream_name):
+        if group["name"] != consumer_group:
+            continue
+        pending = int(group.get("pending") or 0)
+        # Redis reports lag as nil when it cannot be computed (e.g. after
+        # XDEL); treat that as "unknown" and fall back to pending alone.
+        lag = group.get("lag")
+        return (int(lag) if lag is not None else None), pending
+    return None, 0
+
+
+class AdaptiveController:
+    def __init__(self, redis_client, stream_name: str, consumer_group: str, scheduler,
+                 target_latency_ms: float = None, min_batch_size: int = None, max_batch_size: int = None,
+                 min_block_ms: int = None, max_block_ms: int = None, max_wait_ms: int = None,
+                 interval_seconds: float = None, smoothing: float = 0.3):
+        self.redis_client = redis_client
+        self.stream_name = stream_name
+        self.consumer_group = consumer_group
+        self.scheduler = scheduler
+        self.target_latency_ms = target_latency_ms or float(os.getenv("ADAPTIVE_TARGET_LATENCY_MS", "500"))
+        self.min_batch_size = min_batch_size or int(os.getenv("ADAPTIVE_MIN_BATCH_SIZE", "4"))
+        self.max_batch_size = max_batch_size or int(os.getenv("ADAPTIVE_MAX_BATCH_SIZE", "256"))
+        self.min_block_ms = min_block_ms or int(os.getenv("ADAPTIVE_MIN_BLOCK_MS", "100"))
+        self.max_block_ms = max_block_ms or int(os.getenv("ADAPTIVE_MAX_BLOCK_MS", "5000"))
+        self.max_wait_ms = max_wait_ms or int(os.getenv("ADAPTIVE_MAX_WAIT_MS", "200"))
+        self.interval_seconds = interval_seconds or float(os.getenv("ADAPTIVE_INTERVAL_SECONDS", "5"))
+        self.smoothing = smoothing
+        self.batch_latency_ms = None
+        self.per_message_ms = None
+        self.inference_ms = None
+        self.write_ms = None
+        self.decisions = 0
+
+    def _smooth(self, current, sample: float) -> float:
+        if current is None:
+            return sample
+        return current + self.smoothing * (sample - current)
+
+    def record(self, batch_size: int, inference_seconds: float, write_seconds: float):
+        if batch_size <= 0:
+            return
+        inference_ms = inference_seconds * 1000
+        write_ms = write_seconds * 1000
+        self.inference_ms = self._smooth(self.inference_ms, inference_ms)
+        self.write_ms = self._smooth(self.write_ms, write_ms)
+        self.batch_latency_ms = self._smooth(self.batch_latency_ms, inference_ms + write_ms)
+        self.per_message_ms = self._smooth(self.per_message_ms, (inference_ms + write_ms) / batch_size)
+
+    async def read_lag(self):
+        return await read_group_lag(self.redis_client, self.stream_name, self.consumer_group)
+
+    def _clamp_batch(self, size: int) -> int:
+        return max(self.min_batch_size, min(self.max_batch_size, size))
+
+    def decide(self, lag, pending: int):
+        size = self.scheduler.max_batch_size
+        backlog = lag if lag is not None else pending
+        if self.batch_latency_ms is None:
+            return size, self.scheduler.block_ms, self.scheduler.max_wait_ms, "no latency samples yet"
+
+        # Largest batch whose processing time alone still fits the target.
+        fit = int(self.target_latency_ms / self.per_message_ms) if self.per_message_ms else self.max_batch_size
+
+        if self.batch_latency_ms > self.target_latency_ms:
+            new_size = self._clamp_batch(min(fit, size - 1))
+            reason = f"batch latency {self.batch_latency_ms:.0f}ms over target {self.target_latency_ms:.0f}ms"
+        elif backlog > size:
+            new_size = self._clamp_batch(min(size * 2, fit))
+            reason = f"backlog of {backlog} entries exceeds batch size {size}"
+        else:
+            new_size = size
+            reason = "keeping up"
+
+        if backlog:
+            # Entries are already waiting, so a full batch is returned at once;
+            # a long block or gathering window would only add latency.
+            block_ms = self.min_block_ms
+            wait_ms = 0
+        else:
+            block_ms = self.max_block_ms
+            headroom = self.target_latency_ms - self.batch_latency_ms
+            wait_ms = int(max(0, min(self.max_wait_ms, headroom / 2)))
+
+        return new_size, block_ms, wait_ms, reason
+
+    def apply(self, lag, pending: int) -> bool:
+        old = (self.scheduler.max_batch_size, self.scheduler.block_ms, self.scheduler.max_wait_ms)
+        size, block_ms, wait_ms, reason = self.decide(lag, pending)
+        if (size, block_ms, wait_ms) == old:
+            return False
+
+        self.scheduler.max_batch_size = size
+        self.scheduler.block_ms = block_ms
+        self.scheduler.max_wait_ms = wait_ms
+        self.decisions += 1
+        print(
+            f"Adaptive batching: batch_size {old[0]}->{size}, block_ms {old[1]}->{block_ms}, "
+            f"max_wait_ms {old[2]}->{wait_ms} ({reason}; lag={lag}, pending={pending}, "
+            f"batch_latency={self.batch_latency_ms:.0f}ms, inference={self.inference_ms:.0f}ms, db={self.write_ms:.0f}ms)"
+        )
+        return True
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                lag, pending = await self.read_lag()
+                self.apply(lag, pending)
+            except Exception as e:
+                print(f"Adaptive batching error: {e}")
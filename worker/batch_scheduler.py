@@ -0,0 +1,80 @@
+import asyncio
+from typing import Awaitable, Callable, List, Tuple
+
+from common.stream_codec import PAYLOAD_FIELD, decode_entry
+
+Entry = Tuple[str, dict]
+ReadFn = Callable[[int, int], Awaitable[List[Entry]]]
+
+
+def decode_entries(entries: List[Entry]) -> List[Entry]:
+    # Decoded once here; the worker's decode_entry call then passes the
+    # plain dict through instead of unpacking the payload again.
+    decoded = []
+    for message_id, message_data in entries:
+        if PAYLOAD_FIELD in message_data:
+            try:
+                message_data = decode_entry(message_data)
+            except Exception:
+                # Left as read so the worker logs, skips and acks it.
+                pass
+        decoded.append((message_id, message_data))
+    return decoded
+
+
+def estimate_tokens(message_data: dict) -> int:
+    content = message_data.get("content") or message_data.get("text") or ""
+    # ~4 characters per subword token plus the [CLS]/[SEP] pair, capped at
+    # the 512-character slice the analyzer actually feeds the model.
+    return min(len(content), 512) // 4 + 2
+
+
+class MicroBatchScheduler:
+    def __init__(
+        self,
+        read_fn: ReadFn,
+        max_batch_size: int = 64,
+        max_tokens: int = 8192,
+        max_wait_ms: int = 50,
+        block_ms: int = 5000
+    ):
+        self.read_fn = read_fn
+        self.max_batch_size = max_batch_size
+        self.max_tokens = max_tokens
+        self.max_wait_ms = max_wait_ms
+        self.block_ms = block_ms
+        self._carry: List[Entry] = []
+
+    async def next_batch(self) -> List[Entry]:
+        loop = asyncio.get_running_loop()
+        batch: List[Entry] = []
+        tokens = 0
+        deadline = None
+
+        while len(batch) < self.max_batch_size:
+            if not self._carry:
+                if deadline is None:
+                    block = self.block_ms
+                else:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    block = max(1, int(remaining * 1000))
+
+                entries = await self.read_fn(self.max_batch_size - len(batch), block)
+                if not entries:
+                    if deadline is None:
+                        return batch
+                    continue
+                self._carry.extend(decode_entries(entries))
+
+            cost = estimate_tokens(self._carry[0][1])
+            if batch and tokens + cost > self.max_tokens:
+                break
+
+            batch.append(self._carry.pop(0))
+            tokens += cost
+            if deadline is None:
+                deadline = loop.time() + self.max_wait_ms / 1000.0
+
+        return batch
@@ -0,0 +1,149 @@
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+from sqlalchemy import and_, bindparam, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+
+from backend.models.models import SocialMediaPost, SentimentAnalysis
+from backend.services.rollup import rollup_deltas, upsert_statement
+
+
+class BatchWriter:
+    def __init__(self, db_session_maker):
+        self.db_session_maker = db_session_maker
+
+    def build_statements(self, rows: List[Tuple[dict, dict]]):
+        now = datetime.now(timezone.utc)
+        posts = {}
+        analyses = {}
+        for post, result in rows:
+            posts.setdefault(post["post_id"], {
+                "post_id": post["post_id"],
+                "platform": post["platform"],
+                "content": post["content"],
+                "author": post["author"],
+                "created_at": post["created_at"],
+                "ingested_at": now,
+            })
+            # A multi-row ON CONFLICT DO UPDATE may not touch the same row
+            # twice, so the last result per (post_id, model_name) wins.
+            analyses[(post["post_id"], result["model_name"])] = {
+                "post_id": post["post_id"],
+                "model_name": result["model_name"],
+                "sentiment_label": result["sentiment_label"],
+                "confidence_score": result["confidence_score"],
+                "emotion": result["emotion"],
+                "analyzed_at": now,
+            }
+
+        post_stmt = (
+            insert(SocialMediaPost)
+            .values(list(posts.values()))
+            .on_conflict_do_nothing(index_elements=[SocialMediaPost.post_id])
+        )
+
+        analysis_stmt = insert(SentimentAnalysis).values(list(analyses.values()))
+        analysis_stmt = analysis_stmt.on_conflict_do_update(
+            constraint="uq_sentiment_analysis_post_model",
+            set_={
+                "sentiment_label": analysis_stmt.excluded.sentiment_label,
+                "confidence_score": analysis_stmt.excluded.confidence_score,
+                # Deferred-emotion rows arrive with NULL emotion; keep any
+                # value the backfill lane already wrote for a redelivery.
+                "emotion": func.coalesce(analysis_stmt.excluded.emotion, SentimentAnalysis.emotion),
+                "analyzed_at": analysis_stmt.excluded.analyzed_at,
+            }
+        ).returning(
+            SentimentAnalysis.post_id,
+            SentimentAnalysis.model_name,
+            SentimentAnalysis.sentiment_label,
+            SentimentAnalysis.emotion,
+            SentimentAnalysis.analyzed_at,
+        )
+        return post_stmt, analysis_stmt
+
+    def previous_statement(self, keys: List[Tuple[str, str]]):
+        # Locks the rows about to change so their old rollup keys can be
+        # decremented in the same transaction.
+        return (
+            select(
+                SentimentAnalysis.post_id,
+                SentimentAnalysis.model_name,
+                SentimentAnalysis.sentiment_label,
+                SentimentAnalysis.emotion,
+                SentimentAnalysis.analyzed_at,
+                SocialMediaPost.platform,
+            )
+            .join(SocialMediaPost, SocialMediaPost.post_id == SentimentAnalysis.post_id)
+            .where(tuple_(SentimentAnalysis.post_id, SentimentAnalysis.model_name).in_(keys))
+            .with_for_update(of=SentimentAnalysis)
+        )
+
+    def rollup_changes(self, previous, written, platforms: dict):
+        before = {(row.post_id, row.model_name): row for row in previous}
+        entries = []
+        for row in written:
+            old = before.get((row.post_id, row.model_name))
+            if old is not None:
+                entries.append((old.analyzed_at, old.platform, old.sentiment_label, old.emotion, -1))
+            entries.append((row.analyzed_at, platforms[row.post_id], row.sentiment_label, row.emotion, 1))
+        return rollup_deltas(entries)
+
+    async def write(self, rows: List[Tuple[dict, dict]], include_posts: bool = True):
+        if not rows:
+            return
+
+        post_stmt, analysis_stmt = self.build_statements(rows)
+        keys = list({(post["post_id"], result["model_name"]) for post, result in rows})
+        platforms = {post["post_id"]: post["platform"] for post, _ in rows}
+        async with self.db_session_maker() as session:
+            try:
+                if include_posts:
+                    await session.execute(post_stmt)
+                previous = (await session.execute(self.previous_statement(keys))).all()
+                written = (await session.execute(analysis_stmt)).all()
+                rollup_stmt = upsert_statement(self.rollup_changes(previous, written, platforms))
+                if rollup_stmt is not None:
+                    await session.execute(rollup_stmt)
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    async def update_emotions(self, updates: List[Tuple[str, str, str]]):
+        if not updates:
+            return
+
+        table = SentimentAnalysis.__table__
+        stmt = (
+            update(table)
+            .where(and_(table.c.post_id == bindparam("b_post_id"), table.c.model_name == bindparam("b_model_name")))
+            .values(emotion=bindparam("b_emotion"))
+        )
+        params = [
+            {"b_post_id": post_id, "b_model_name": model_name, "b_emotion": emotion}
+            for post_id, model_name, emotion in updates
+        ]
+        emotions = {(post_id, model_name): emotion for post_id, model_name, emotion in updates}
+        async with self.db_session_maker() as session:
+            try:
+                previous = (await session.execute(self.previous_statement(list(emotions)))).all()
+                await session.execute(stmt, params)
+                # Only the emotion changes, so each row moves between two
+                # keys of the same minute bucket.
+                deltas = rollup_deltas(
+                    entry
+                    for row in previous
+                    for entry in (
+                        (row.analyzed_at, row.platform, row.sentiment_label, row.emotion, -1),
+                        (row.analyzed_at, row.platform, row.sentiment_label,
+                         emotions[(row.post_id, row.model_name)], 1),
+                    )
+                )
+                rollup_stmt = upsert_statement(deltas)
+                if rollup_stmt is not None:
+                    await session.execute(rollup_stmt)
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
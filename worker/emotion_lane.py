@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import asyncio
+from datetime import datetime, timezone
+
+from adaptive import cpu_utilization
+
+
+class EmotionBackfillLane:
+    def __init__(self, redis_client, stream_name: str, consumer_group: str, consumer_name: str,
+                 analyzer, writer, is_busy=None, broadcast_channel: str = None):
+        self.redis_client = redis_client
+        self.emotion_stream = f"{stream_name}:emotion"
+        self.dead_stream = f"{self.emotion_stream}:dead"
+        self.consumer_group = consumer_group
+        self.consumer_name = consumer_name
+        self.analyzer = analyzer
+        self.writer = writer
+        self.is_busy = is_busy or (lambda: False)
+        self.broadcast_channel = broadcast_channel
+        self.batch_size = int(os.getenv("EMOTION_LANE_BATCH_SIZE", "64"))
+        self.max_cpu = float(os.getenv("EMOTION_LANE_MAX_CPU", "0.75"))
+        self.max_delay_seconds = float(os.getenv("EMOTION_LANE_MAX_DELAY_SECONDS", "30"))
+        self.idle_poll_seconds = float(os.getenv("EMOTION_LANE_POLL_SECONDS", "0.5"))
+        self.max_attempts = int(os.getenv("EMOTION_LANE_MAX_ATTEMPTS", "3"))
+        self.backfilled = 0
+        self.deferred = 0
+        self.dead_lettered = 0
+        self.failures = {}
+        self._read_id = "0"
+        self._busy_since = None
+
+    def enqueue(self, pipe, post: dict, result: dict):
+        pipe.xadd(self.emotion_stream, {
+            "post_id": post["post_id"],
+            "model_name": result["model_name"],
+            "content": post["content"][:512],
+        })
+        self.deferred += 1
+
+    async def _ensure_consumer_group(self):
+        try:
+            await self.redis_client.xgroup_create(self.emotion_stream, self.consumer_group, id="0", mkstream=True)
+        except Exception:
+            pass
+
+    def _should_yield(self) -> bool:
+        # The lane only runs when the sentiment lane has no backlog and the
+        # host has spare CPU, but never starves for longer than max_delay.
+        if not self.is_busy() and cpu_utilization() < self.max_cpu:
+            self._busy_since = None
+            return False
+        now = time.monotonic()
+        if self._busy_since is None:
+            self._busy_since = now
+        if now - self._busy_since >= self.max_delay_seconds:
+            self._busy_since = now
+            return False
+        return True
+
+    async def _read(self, block_ms: int) -> list:
+        messages = await self.redis_client.xreadgroup(
+            self.consumer_group,
+            self.consumer_name,
+            streams={self.emotion_stream: self._read_id},
+            count=self.batch_size,
+            block=None if self._read_id == "0" else block_ms
+        )
+        entries = [entry for _, stream_entries in messages or [] for entry in stream_entries]
+        if self._read_id == "0" and not entries:
+            # Own pending entries (from a previous run or a failed batch) are
+            # done; switch to new deliveries.
+            self._read_id = ">"
+        return entries
+
+    async def backfill(self, entries: list) -> int:
+        emotions = await self.analyzer.analyze_emotion_batch([data["content"] for _, data in entries])
+        updates = [
+            (data["post_id"], data["model_name"], emotion["emotion"])
+            for (_, data), emotion in zip(entries, emotions)
+        ]
+        await self.writer.update_emotions(updates)
+
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.xack(self.emotion_stream, self.consumer_group, *[message_id for message_id, _ in entries])
+            if self.broadcast_channel:
+                pipe.publish(self.broadcast_channel, json.dumps({
+                    "type": "emotion_updates",
+                    "updates": [{"post_id": post_id, "emotion": emotion} for post_id, _, emotion in updates],
+                }))
+            await pipe.execute()
+
+        for message_id, _ in entries:
+            self.failures.pop(message_id, None)
+        self.backfilled += len(updates)
+        return len(updates)
+
+    async def process(self, entries: list, stream_name: str = None) -> int:
+        try:
+            return await self.backfill(entries)
+        except Exception as e:
+            print(f"Emotion backfill of {len(entries)} entries failed: {e}")
+            await self._record_failure(entries, e)
+            return 0
+
+    async def _record_failure(self, entries: list, error: Exception):
+        # Failed entries stay pending and are re-read from "0"; after
+        # max_attempts they are dead-lettered so one bad batch cannot be
+        # retried forever or hold back retention on the stream.
+        exhausted = []
+        for message_id, data in entries:
+            attempts = self.failures.get(message_id, 0) + 1
+            if attempts >= self.max_attempts:
+                self.failures.pop(message_id, None)
+                exhausted.append((message_id, data, attempts))
+            else:
+                self.failures[message_id] = attempts
+        self._read_id = "0"
+        if not exhausted:
+            return
+
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            failed_at = datetime.now(timezone.utc).isoformat()
+            for message_id, data, attempts in exhausted:
+                pipe.xadd(self.dead_stream, dict(
+                    data,
+                    _attempts=attempts,
+                    _error=f"{type(error).__name__}: {error}"[:500],
+                    _origin_id=message_id,
+                    _failed_at=failed_at,
+                ))
+            pipe.xack(self.emotion_stream, self.consumer_group, *[message_id for message_id, _, _ in exhausted])
+            await pipe.execute()
+        self.dead_lettered += len(exhausted)
+        print(f"Dead-lettered {len(exhausted)} emotion backfill entries to {self.dead_stream}")
+
+    async def run(self, block_ms: int = 1000):
+        await self._ensure_consumer_group()
+        print(f"Emotion backfill lane draining {self.emotion_stream}")
+
+        while True:
+            try:
+                if self._should_yield():
+                    await asyncio.sleep(self.idle_poll_seconds)
+                    continue
+
+                entries = await self._read(block_ms)
+                if entries:
+                    await self.process(entries)
+            except Exception as e:
+                print(f"Emotion backfill error: {e}")
+                self._read_id = "0"
+                await asyncio.sleep(1)
@@ -0,0 +1,76 @@
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else f"{bound:g}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[str, List[float]] = {}
+
+    def observe(self, label_value: str, value: float):
+        series = self._series.get(label_value)
+        if series is None:
+            # Per-bucket counts, then +Inf, sum and count in the last slots.
+            series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, label_value: str) -> int:
+        series = self._series.get(label_value)
+        return series[-1] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_value in sorted(self._series):
+            series = self._series[label_value]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{self.label}="{label_value}",le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{self.label}="{label_value}"}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{self.label}="{label_value}"}} {series[-1]}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms: List[Histogram] = []
+        self.samples: List[Tuple[str, str, str, Optional[str], Callable]] = []
+
+    def histogram(self, name: str, help_text: str, label: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        histogram = Histogram(name, help_text, label, buckets)
+        self.histograms.append(histogram)
+        return histogram
+
+    def counter(self, name: str, help_text: str, read: Callable, label: str = None):
+        # Counters read values the worker already keeps, so nothing extra
+        # happens on the hot path; they are only evaluated on scrape.
+        self.samples.append((name, "counter", help_text, label, read))
+
+    def gauge(self, name: str, help_text: str, read: Callable, label: str = None):
+        # With a label, read() returns {label_value: value} and each entry
+        # becomes its own series.
+        self.samples.append((name, "gauge", help_text, label, read))
+
+    def render(self) -> str:
+        lines = []
+        for name, kind, help_text, label, read in self.samples:
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"])
+            if label is None:
+                lines.append(f"{name} {read()}")
+            else:
+                lines.extend(f'{name}{{{label}="{key}"}} {value}' for key, value in sorted(read().items()))
+        for histogram in self.histograms:
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,90 @@
+import os
+import asyncio
+
+
+class PendingReclaimer:
+    def __init__(self, redis_client, streams: list, consumer_group: str, consumer_name: str,
+                 min_idle_ms: int = None, interval_seconds: float = None, batch_size: int = None,
+                 stale_consumer_ms: int = None):
+        self.redis_client = redis_client
+        self.streams = streams
+        self.consumer_group = consumer_group
+        self.consumer_name = consumer_name
+        self.min_idle_ms = min_idle_ms or int(os.getenv("RECLAIM_MIN_IDLE_MS", "60000"))
+        self.interval_seconds = interval_seconds or float(os.getenv("RECLAIM_INTERVAL_SECONDS", "30"))
+        self.batch_size = batch_size or int(os.getenv("RECLAIM_BATCH_SIZE", "64"))
+        self.stale_consumer_ms = stale_consumer_ms or int(
+            os.getenv("RECLAIM_STALE_CONSUMER_MS", str(self.min_idle_ms * 5))
+        )
+        self.reclaimed = 0
+        self.deleted = 0
+        self.consumers_removed = 0
+        self.runs = 0
+
+    async def reclaim_stream(self, stream_name: str, process_batch) -> int:
+        claimed_total = 0
+        start_id = "0-0"
+        while True:
+            response = await self.redis_client.xautoclaim(
+                stream_name,
+                self.consumer_group,
+                self.consumer_name,
+                min_idle_time=self.min_idle_ms,
+                start_id=start_id,
+                count=self.batch_size
+            )
+            start_id = response[0]
+            entries = [(message_id, data) for message_id, data in response[1] if message_id is not None]
+            if len(response) > 2:
+                # Entries trimmed from the stream are dropped from the PEL by
+                # Redis itself; there is nothing left to process for them.
+                self.deleted += len(response[2])
+
+            if entries:
+                claimed_total += len(entries)
+                self.reclaimed += len(entries)
+                print(f"Reclaimed {len(entries)} idle pending entries from {stream_name}")
+                await process_batch(entries, stream_name=stream_name)
+
+            if start_id in ("0-0", "0"):
+                return claimed_total
+
+    async def remove_stale_consumers(self, stream_name: str) -> list:
+        removed = []
+        for consumer in await self.redis_client.xinfo_consumers(stream_name, self.consumer_group):
+            name = consumer["name"]
+            # Only drop consumers whose pending list is already empty, so the
+            # group never loses track of an unacknowledged entry.
+            if name == self.consumer_name or consumer["pending"] or consumer["idle"] < self.stale_consumer_ms:
+                continue
+            await self.redis_client.xgroup_delconsumer(stream_name, self.consumer_group, name)
+            removed.append(name)
+
+        if removed:
+            self.consumers_removed += len(removed)
+            print(f"Removed stale consumers from {stream_name}: {', '.join(removed)}")
+        return removed
+
+    async def run_once(self, process_batch) -> int:
+        claimed = 0
+        for stream_name in self.streams:
+            try:
+                claimed += await self.reclaim_stream(stream_name, process_batch)
+                await self.remove_stale_consumers(stream_name)
+            except Exception as e:
+                print(f"Reclaim of {stream_name} failed: {e}")
+        self.runs += 1
+        return claimed
+
+    async def run(self, process_batch):
+        while True:
+            await self.run_once(process_batch)
+            await asyncio.sleep(self.interval_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "reclaimed": self.reclaimed,
+            "deleted": self.deleted,
+            "consumers_removed": self.consumers_removed,
+        }
@@ -0,0 +1,224 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+from collections import deque
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select
+
+from backend.models.models import SocialMediaPost
+from batch_writer import BatchWriter
+
+
+def load_checkpoint(path: str, model_name: str) -> dict:
+    if not path or not os.path.exists(path):
+        return {"model_name": model_name, "last_id": 0, "rows": 0}
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("model_name") != model_name:
+        print(f"Checkpoint {path} is for {checkpoint.get('model_name')}, starting {model_name} from the beginning")
+        return {"model_name": model_name, "last_id": 0, "rows": 0}
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    if not path:
+        return
+    checkpoint = dict(checkpoint, updated_at=datetime.now(timezone.utc).isoformat())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    # Atomic rename so an interrupted run never leaves a torn checkpoint.
+    os.replace(tmp_path, path)
+
+
+class RescoreJob:
+    def __init__(self, db_session_maker, analyzer, writer, model_name: str, checkpoint_path: str = None,
+                 chunk_size: int = 256, pass_rows: int = 50000, concurrency: int = 2,
+                 max_rows_per_second: float = 0, with_emotion: bool = True, limit: int = None):
+        self.db_session_maker = db_session_maker
+        self.analyzer = analyzer
+        self.writer = writer
+        self.model_name = model_name
+        self.checkpoint_path = checkpoint_path
+        self.chunk_size = chunk_size
+        self.pass_rows = max(pass_rows, chunk_size)
+        self.concurrency = max(1, concurrency)
+        self.max_rows_per_second = max_rows_per_second
+        self.with_emotion = with_emotion
+        self.limit = limit
+        self.checkpoint = load_checkpoint(checkpoint_path, model_name)
+        self.rows = 0
+        self.started = None
+
+    async def fetch_chunks(self):
+        last_id = self.checkpoint["last_id"]
+        fetched = 0
+        while True:
+            # Each pass is one server-side cursor over a bounded keyset range,
+            # so no read transaction stays open for the whole backfill.
+            pass_limit = self.pass_rows
+            if self.limit is not None:
+                pass_limit = min(pass_limit, self.limit - fetched)
+                if pass_limit <= 0:
+                    return
+
+            query = (
+                select(
+                    SocialMediaPost.id,
+                    SocialMediaPost.post_id,
+                    SocialMediaPost.platform,
+                    SocialMediaPost.content,
+                    SocialMediaPost.author,
+                    SocialMediaPost.created_at,
+                )
+                .where(SocialMediaPost.id > last_id)
+                .order_by(SocialMediaPost.id)
+                .limit(pass_limit)
+                .execution_options(yield_per=self.chunk_size)
+            )
+
+            pass_count = 0
+            async with self.db_session_maker() as session:
+                result = await session.stream(query)
+                async for partition in result.partitions(self.chunk_size):
+                    chunk = [dict(row._mapping) for row in partition]
+                    pass_count += len(chunk)
+                    last_id = chunk[-1]["id"]
+                    yield chunk
+
+            fetched += pass_count
+            if pass_count < pass_limit:
+                return
+
+    async def score_chunk(self, chunk: list) -> int:
+        results = await self.analyzer.batch_analyze(
+            [post["content"] for post in chunk],
+            with_emotion=self.with_emotion
+        )
+        await self.writer.write(list(zip(chunk, results)), include_posts=False)
+        return len(chunk)
+
+    async def _throttle(self):
+        if not self.max_rows_per_second:
+            return
+        ahead = self.rows / self.max_rows_per_second - (time.perf_counter() - self.started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+    async def _complete(self, task, last_id: int):
+        count = await task
+        self.rows += count
+        self.checkpoint = dict(self.checkpoint, last_id=last_id, rows=self.checkpoint.get("rows", 0) + count)
+        save_checkpoint(self.checkpoint_path, self.checkpoint)
+
+        elapsed = time.perf_counter() - self.started
+        print(f"Rescored {self.rows} rows (last id {last_id}) | {self.rows / elapsed if elapsed else 0:.1f} rows/s")
+        await self._throttle()
+
+    async def run(self) -> dict:
+        self.started = time.perf_counter()
+        print(f"Rescoring posts with {self.model_name} from id > {self.checkpoint['last_id']}")
+
+        # Chunks are scored concurrently but completed in order, so the
+        # checkpoint only ever advances past fully written ranges.
+        in_flight = deque()
+        try:
+            async for chunk in self.fetch_chunks():
+                in_flight.append((asyncio.ensure_future(self.score_chunk(chunk)), chunk[-1]["id"]))
+                if len(in_flight) >= self.concurrency:
+                    await self._complete(*in_flight.popleft())
+
+            while in_flight:
+                await self._complete(*in_flight.popleft())
+        except Exception as e:
+            # The failed chunk never reached _complete, so the checkpoint
+            # still ends at the last fully written range.
+            for task, _ in in_flight:
+                task.cancel()
+            print(f"Rescore aborted at id > {self.checkpoint['last_id']}: {e}")
+            raise
+
+        elapsed = time.perf_counter() - self.started
+        summary = {
+            "model_name": self.model_name,
+            "rows": self.rows,
+            "last_id": self.checkpoint["last_id"],
+            "seconds": round(elapsed, 2),
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed else 0.0,
+        }
+        print(f"Rescore finished: {summary}")
+        return summary
+
+
+async def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-analyze stored posts with a different model.")
+    parser.add_argument("--model", default=os.getenv("HUGGINGFACE_MODEL", "distilbert-base-uncased-finetuned-sst-2-english"))
+    parser.add_argument("--model-type", default=os.getenv("ANALYZER_MODEL_TYPE", "local"))
+    parser.add_argument("--checkpoint", default="rescore_checkpoint.json")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--pass-rows", type=int, default=50000)
+    parser.add_argument("--processes", type=int, default=int(os.getenv("INFERENCE_PROCESSES", "2")))
+    parser.add_argument("--max-rows-per-second", type=float, default=0, help="0 means unthrottled")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--no-emotion", action="store_true")
+    parser.add_argument("--reset", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args(argv)
+
+    os.environ["INFERENCE_PROCESSES"] = str(args.processes)
+    from backend.database import AsyncSessionLocal
+    from backend.services.sentiment_analyzer import SentimentAnalyzer
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    analyzer = SentimentAnalyzer(
+        model_type=args.model_type,
+        model_name=args.model,
+        executor="process" if args.processes > 1 else "thread",
+        strict=True
+    )
+    # Lexicon fallbacks or cascade rows would be stored under the new model
+    # name, so rescoring refuses to run unless the real model answers, and
+    # the strict analyzer fails a chunk instead of falling back later on.
+    analyzer.cascade = False
+    try:
+        if not analyzer._can_infer("sentiment"):
+            raise RuntimeError("model is not loaded")
+        await analyzer._infer("sentiment", ["warm up"])
+    except Exception as e:
+        print(f"Model {args.model} is unavailable ({e}); refusing to write fallback scores under its name")
+        if analyzer.pool is not None:
+            analyzer.pool.shutdown()
+        return 1
+
+    job = RescoreJob(
+        AsyncSessionLocal,
+        analyzer,
+        BatchWriter(AsyncSessionLocal),
+        args.model,
+        checkpoint_path=args.checkpoint,
+        chunk_size=args.chunk_size,
+        pass_rows=args.pass_rows,
+        concurrency=args.processes,
+        max_rows_per_second=args.max_rows_per_second,
+        with_emotion=not args.no_emotion,
+        limit=args.limit
+    )
+    try:
+        await job.run()
+    except Exception:
+        return 1
+    finally:
+        if analyzer.pool is not None:
+            analyzer.pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
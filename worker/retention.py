@@ -0,0 +1,111 @@
+import os
+import asyncio
+
+
+def parse_stream_id(stream_id: str):
+    ms, _, seq = str(stream_id).partition("-")
+    return int(ms), int(seq or 0)
+
+
+def next_stream_id(stream_id: str) -> str:
+    ms, seq = parse_stream_id(stream_id)
+    return f"{ms}-{seq + 1}"
+
+
+class StreamRetention:
+    def __init__(self, redis_client, streams: list, owner: str, max_len: int = None,
+                 interval_seconds: float = None, lock_key: str = None, lock_ttl_ms: int = None):
+        self.redis_client = redis_client
+        self.streams = streams
+        self.owner = owner
+        self.max_len = int(os.getenv("STREAM_MAX_LEN", "1000000")) if max_len is None else max_len
+        self.interval_seconds = interval_seconds or float(os.getenv("STREAM_RETENTION_INTERVAL_SECONDS", "30"))
+        self.lock_key = lock_key or f"{streams[0]}:retention_leader"
+        self.lock_ttl_ms = lock_ttl_ms or int(
+            os.getenv("STREAM_RETENTION_LOCK_TTL_MS", str(int(self.interval_seconds * 3000)))
+        )
+        self.lengths = {}
+        self.memory_bytes = {}
+        self.trimmed = 0
+        self.forced_trimmed = 0
+        self.is_leader = False
+
+    async def acquire_leadership(self) -> bool:
+        # One worker trims per interval; the rest only refresh their gauges.
+        acquired = await self.redis_client.set(self.lock_key, self.owner, nx=True, px=self.lock_ttl_ms)
+        if not acquired and await self.redis_client.get(self.lock_key) == self.owner:
+            await self.redis_client.pexpire(self.lock_key, self.lock_ttl_ms)
+            acquired = True
+        self.is_leader = bool(acquired)
+        return self.is_leader
+
+    async def safe_min_id(self, stream_name: str):
+        groups = await self.redis_client.xinfo_groups(stream_name)
+        if not groups:
+            return None
+
+        candidates = []
+        for group in groups:
+            if group.get("pending"):
+                # The oldest unacknowledged entry must survive the trim.
+                summary = await self.redis_client.xpending(stream_name, group["name"])
+                candidates.append(summary["min"])
+            else:
+                # Everything up to last-delivered-id has been acknowledged.
+                candidates.append(next_stream_id(group["last-delivered-id"]))
+        return min(candidates, key=parse_stream_id)
+
+    async def trim_stream(self, stream_name: str) -> int:
+        trimmed = 0
+        min_id = await self.safe_min_id(stream_name)
+        if min_id is not None:
+            trimmed += await self.redis_client.xtrim(stream_name, minid=min_id, approximate=True)
+
+        if self.max_len and await self.redis_client.xlen(stream_name) > self.max_len:
+            # Consumers have stalled; cap memory even if unread entries go.
+            forced = await self.redis_client.xtrim(stream_name, maxlen=self.max_len, approximate=True)
+            if forced:
+                self.forced_trimmed += forced
+                trimmed += forced
+                print(f"Stream {stream_name} exceeded {self.max_len} entries; force-trimmed {forced} unacknowledged entries")
+
+        self.trimmed += trimmed
+        return trimmed
+
+    async def refresh_stats(self, stream_name: str):
+        self.lengths[stream_name] = await self.redis_client.xlen(stream_name)
+        self.memory_bytes[stream_name] = await self.redis_client.memory_usage(stream_name) or 0
+
+    async def run_once(self) -> int:
+        trimmed = 0
+        try:
+            leader = await self.acquire_leadership()
+        except Exception as e:
+            print(f"Retention lock failed: {e}")
+            leader = False
+
+        for stream_name in self.streams:
+            try:
+                if leader:
+                    trimmed += await self.trim_stream(stream_name)
+                await self.refresh_stats(stream_name)
+            except Exception as e:
+                print(f"Retention of {stream_name} failed: {e}")
+
+        if trimmed:
+            print(f"Retention trimmed {trimmed} entries; lengths {self.lengths}")
+        return trimmed
+
+    async def run(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "leader": self.is_leader,
+            "trimmed": self.trimmed,
+            "forced_trimmed": self.forced_trimmed,
+            "lengths": dict(self.lengths),
+            "memory_bytes": dict(self.memory_bytes),
+        }
@@ -0,0 +1,82 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timezone
+
+RETRY_FIELDS = ("_attempts", "_retry_at", "_error", "_origin_id", "_failed_at")
+
+
+class RetryLane:
+    def __init__(self, redis_client, stream_name: str, consumer_group: str, consumer_name: str,
+                 max_attempts: int = 3, base_delay_ms: int = None):
+        self.redis_client = redis_client
+        self.stream_name = stream_name
+        self.consumer_group = consumer_group
+        self.consumer_name = consumer_name
+        self.retry_stream = f"{stream_name}:retry"
+        self.dead_stream = f"{stream_name}:dead"
+        self.max_attempts = max_attempts
+        self.base_delay_ms = base_delay_ms or int(os.getenv("RETRY_BASE_DELAY_MS", "1000"))
+        self.batch_size = int(os.getenv("RETRY_BATCH_SIZE", "32"))
+        self.retried = 0
+        self.dead_lettered = 0
+
+    def enqueue(self, pipe, message_id: str, message_data: dict, error: Exception):
+        attempts = int(message_data.get("_attempts", 0)) + 1
+        fields = {k: v for k, v in message_data.items() if k not in RETRY_FIELDS}
+        fields["_attempts"] = attempts
+        fields["_error"] = f"{type(error).__name__}: {error}"[:500]
+        fields["_origin_id"] = message_data.get("_origin_id", message_id)
+
+        if attempts >= self.max_attempts:
+            fields["_failed_at"] = datetime.now(timezone.utc).isoformat()
+            pipe.xadd(self.dead_stream, fields)
+            self.dead_lettered += 1
+        else:
+            delay_ms = self.base_delay_ms * 2 ** (attempts - 1)
+            fields["_retry_at"] = int(time.time() * 1000) + delay_ms
+            pipe.xadd(self.retry_stream, fields)
+            self.retried += 1
+
+    async def _ensure_consumer_group(self):
+        try:
+            await self.redis_client.xgroup_create(self.retry_stream, self.consumer_group, id="0", mkstream=True)
+        except Exception:
+            pass
+
+    async def drain(self, process_batch, block_ms: int = 5000):
+        await self._ensure_consumer_group()
+        print(f"Retry lane draining {self.retry_stream} (dead letters -> {self.dead_stream})")
+
+        # Entries read before they are due wait here rather than holding up
+        # the due ones; they stay pending on this consumer meanwhile.
+        waiting = []
+        while True:
+            try:
+                block = block_ms
+                if waiting:
+                    next_due_ms = min(int(data.get("_retry_at", 0)) for _, data in waiting)
+                    block = max(1, min(block_ms, next_due_ms - int(time.time() * 1000)))
+
+                if len(waiting) < self.batch_size:
+                    messages = await self.redis_client.xreadgroup(
+                        self.consumer_group,
+                        self.consumer_name,
+                        streams={self.retry_stream: ">"},
+                        count=self.batch_size - len(waiting),
+                        block=block
+                    )
+                    waiting += [entry for _, stream_entries in messages or [] for entry in stream_entries]
+                else:
+                    await asyncio.sleep(block / 1000.0)
+
+                now_ms = time.time() * 1000
+                due = [entry for entry in waiting if int(entry[1].get("_retry_at", 0)) <= now_ms]
+                if not due:
+                    continue
+                waiting = [entry for entry in waiting if int(entry[1].get("_retry_at", 0)) > now_ms]
+
+                await process_batch(due, stream_name=self.retry_stream)
+            except Exception as e:
+                print(f"Retry lane error: {e}")
+                await asyncio.sleep(1)
@@ -0,0 +1,98 @@
+import os
+import time
+import asyncio
+import importlib
+from datetime import datetime, timezone
+
+WARMUP_TEXTS = [
+    "I absolutely love this, best purchase ever!",
+    "Terrible experience, would not recommend.",
+    "Just received it today, will test it out.",
+    "Wow, I did not expect that at all.",
+]
+
+BACKEND_MODULES = {
+    "local": ("torch", "transformers"),
+    "onnx": ("onnxruntime", "transformers"),
+}
+
+
+def import_backends(model_type: str):
+    for module in BACKEND_MODULES.get(model_type, ()):
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"Could not import {module}: {e}")
+
+
+class WorkerStartup:
+    def __init__(self, redis_client, analyzer, consumer_name: str, ttl_seconds: int = None):
+        self.redis_client = redis_client
+        self.analyzer = analyzer
+        self.key = f"{os.getenv('WORKER_STATUS_PREFIX', 'worker_status')}:{consumer_name}"
+        self.ttl_seconds = ttl_seconds or int(os.getenv("WORKER_STATUS_TTL_SECONDS", "60"))
+        self.ready = False
+        self.timings = {}
+
+    async def _publish(self, fields: dict):
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(self.key, mapping=fields)
+                pipe.expire(self.key, self.ttl_seconds)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Failed to publish worker status: {e}")
+
+    async def _warm_up(self):
+        # Bypass the shared cache so the warm-up batch really exercises the
+        # models instead of returning results another worker stored.
+        cache, self.analyzer.cache = self.analyzer.cache, None
+        try:
+            await asyncio.gather(
+                self.analyzer.analyze_sentiment_batch(WARMUP_TEXTS),
+                self.analyzer.analyze_emotion_batch(WARMUP_TEXTS)
+            )
+        finally:
+            self.analyzer.cache = cache
+
+    async def start(self) -> dict:
+        loop = asyncio.get_running_loop()
+        await self._publish({
+            "ready": 0,
+            "pid": os.getpid(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        })
+
+        started = time.perf_counter()
+        await loop.run_in_executor(None, import_backends, self.analyzer.model_type)
+        imported = time.perf_counter()
+        await loop.run_in_executor(None, self.analyzer.load_models)
+        loaded = time.perf_counter()
+        await self._warm_up()
+        warmed = time.perf_counter()
+
+        self.timings = {
+            "import_seconds": round(imported - started, 3),
+            "load_seconds": round(loaded - imported, 3),
+            "warmup_seconds": round(warmed - loaded, 3),
+            "total_seconds": round(warmed - started, 3),
+        }
+        self.ready = True
+        await self._publish(dict(self.timings, ready=1, ready_at=datetime.now(timezone.utc).isoformat()))
+        print(f"Worker ready: {self.timings}")
+        return self.timings
+
+    async def heartbeat(self):
+        while True:
+            await asyncio.sleep(max(1, self.ttl_seconds // 3))
+            try:
+                await self.redis_client.expire(self.key, self.ttl_seconds)
+            except Exception as e:
+                print(f"Worker status heartbeat failed: {e}")
+
+    async def stop(self):
+        self.ready = False
+        try:
+            await self.redis_client.delete(self.key)
+        except Exception:
+            pass
@@ -0,0 +1,60 @@
+import json
+import asyncio
+
+REASONS = {200: "OK", 404: "Not Found", 500: "Internal Server Error"}
+
+
+class StatusServer:
+    def __init__(self, host: str = "0.0.0.0", port: int = 8081):
+        self.host = host
+        self.port = port
+        self.routes = {}
+        self.server = None
+
+    def route(self, path: str, handler, content_type: str = "application/json"):
+        self.routes[path] = (handler, content_type)
+
+    async def _render(self, path: str):
+        if path not in self.routes:
+            return 404, "application/json", json.dumps({"error": f"unknown path {path}"})
+        handler, content_type = self.routes[path]
+        body = handler()
+        if asyncio.iscoroutine(body):
+            body = await body
+        if not isinstance(body, str):
+            body = json.dumps(body, default=str)
+        return 200, content_type, body
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?", 1)[0] if len(parts) > 1 else "/"
+            try:
+                status, content_type, body = await self._render(path)
+            except Exception as e:
+                status, content_type, body = 500, "application/json", json.dumps({"error": str(e)})
+
+            payload = body.encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+        except Exception as e:
+            print(f"Status server error: {e}")
+        finally:
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        print(f"Status server listening on {self.host}:{self.port} ({', '.join(sorted(self.routes))})")
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
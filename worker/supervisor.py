@@ -0,0 +1,228 @@
+import os
+import time
+import socket
+import signal
+import asyncio
+import multiprocessing
+import redis.asyncio as redis
+
+from adaptive import cpu_utilization, read_group_lag
+from status_server import StatusServer
+
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+STREAM_NAME = os.getenv("REDIS_STREAM_NAME", "social_posts_stream")
+CONSUMER_GROUP = os.getenv("REDIS_CONSUMER_GROUP", "sentiment_workers")
+
+
+def _run_child(consumer_name: str, progress, metrics_port: int):
+    # Each child is a full SentimentWorker with its own event loop, models
+    # and Redis/DB connections; only the progress counter is shared.
+    os.environ["WORKER_METRICS_PORT"] = str(metrics_port)
+    from worker import main as worker_main
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(worker_main(consumer_name, progress))
+    except KeyboardInterrupt:
+        pass
+
+
+class ChildWorker:
+    def __init__(self, slot: int, consumer_name: str, process, progress):
+        self.slot = slot
+        self.consumer_name = consumer_name
+        self.process = process
+        self.progress = progress
+        self.started_at = time.time()
+        self.restarts = 0
+        self.last_count = 0
+        self.last_sampled = time.monotonic()
+        self.throughput = 0.0
+
+    def sample(self):
+        now = time.monotonic()
+        count = self.progress.value
+        elapsed = now - self.last_sampled
+        if elapsed > 0:
+            self.throughput = max(0, count - self.last_count) / elapsed
+        self.last_count = count
+        self.last_sampled = now
+
+    def status(self) -> dict:
+        return {
+            "slot": self.slot,
+            "consumer": self.consumer_name,
+            "pid": self.process.pid,
+            "alive": self.process.is_alive(),
+            "processed": self.progress.value,
+            "messages_per_second": round(self.throughput, 2),
+            "restarts": self.restarts,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+        }
+
+
+class WorkerSupervisor:
+    def __init__(self, redis_client, stream_name: str = None, consumer_group: str = None,
+                 min_workers: int = None, max_workers: int = None):
+        self.redis_client = redis_client
+        self.stream_name = stream_name or STREAM_NAME
+        self.consumer_group = consumer_group or CONSUMER_GROUP
+        self.min_workers = min_workers or int(os.getenv("SUPERVISOR_MIN_WORKERS", "1"))
+        self.max_workers = max_workers or int(os.getenv("SUPERVISOR_MAX_WORKERS", str(os.cpu_count() or 1)))
+        self.initial_workers = int(os.getenv("SUPERVISOR_INITIAL_WORKERS", str(self.min_workers)))
+        self.interval_seconds = float(os.getenv("SUPERVISOR_INTERVAL_SECONDS", "10"))
+        self.scale_up_lag = int(os.getenv("SUPERVISOR_SCALE_UP_LAG", "500"))
+        self.scale_down_lag = int(os.getenv("SUPERVISOR_SCALE_DOWN_LAG", "50"))
+        self.max_cpu = float(os.getenv("SUPERVISOR_MAX_CPU", "0.85"))
+        self.cooldown_seconds = float(os.getenv("SUPERVISOR_COOLDOWN_SECONDS", "30"))
+        self.consumer_prefix = os.getenv("WORKER_CONSUMER_PREFIX", f"worker-{socket.gethostname()}")
+        self.metrics_port = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+        self.context = multiprocessing.get_context("spawn")
+        self.children = {}
+        self.crashes = 0
+        self.last_scaled = 0.0
+        self.lag = None
+        self.pending = 0
+        self.cpu = 0.0
+
+    def spawn(self, slot: int) -> ChildWorker:
+        # Consumer names are tied to the slot, not the PID, so a restarted
+        # child takes over its predecessor's name instead of adding a new one.
+        consumer_name = f"{self.consumer_prefix}-{slot}"
+        progress = self.context.Value("q", 0)
+        process = self.context.Process(
+            target=_run_child,
+            args=(consumer_name, progress, self.metrics_port + slot if self.metrics_port else 0),
+            name=consumer_name,
+            # Not daemonic: a daemonic child may not start processes of its
+            # own, which the process inference pool needs. run() stops the
+            # children on the way out instead.
+            daemon=False
+        )
+        process.start()
+        child = ChildWorker(slot, consumer_name, process, progress)
+        self.children[slot] = child
+        print(f"Started {consumer_name} (pid {process.pid})")
+        return child
+
+    def stop_child(self, slot: int):
+        child = self.children.pop(slot)
+        child.process.terminate()
+        child.process.join(timeout=30)
+        if child.process.is_alive():
+            child.process.kill()
+        print(f"Stopped {child.consumer_name} (pid {child.process.pid})")
+
+    def restart_crashed(self) -> int:
+        restarted = 0
+        for slot, child in list(self.children.items()):
+            if child.process.is_alive():
+                continue
+            self.crashes += 1
+            print(f"{child.consumer_name} exited with code {child.process.exitcode}; restarting")
+            replacement = self.spawn(slot)
+            replacement.restarts = child.restarts + 1
+            restarted += 1
+        return restarted
+
+    def decide(self, lag, pending: int, cpu: float, workers: int):
+        backlog = lag if lag is not None else pending
+        if workers < self.min_workers:
+            return self.min_workers, "below minimum"
+        if workers > self.max_workers:
+            return self.max_workers, "above maximum"
+        if time.monotonic() - self.last_scaled < self.cooldown_seconds:
+            return workers, "cooling down"
+        if backlog > self.scale_up_lag * workers:
+            if workers >= self.max_workers:
+                return workers, f"backlog {backlog} but already at max_workers"
+            if cpu >= self.max_cpu:
+                return workers, f"backlog {backlog} but CPU at {cpu:.0%}"
+            return workers + 1, f"backlog {backlog} > {self.scale_up_lag} per worker"
+        if backlog < self.scale_down_lag and workers > self.min_workers:
+            return workers - 1, f"backlog {backlog} < {self.scale_down_lag}"
+        return workers, "steady"
+
+    async def scale(self) -> int:
+        try:
+            self.lag, self.pending = await read_group_lag(self.redis_client, self.stream_name, self.consumer_group)
+        except Exception as e:
+            print(f"Could not read consumer group lag: {e}")
+            return len(self.children)
+        self.cpu = cpu_utilization()
+
+        workers = len(self.children)
+        target, reason = self.decide(self.lag, self.pending, self.cpu, workers)
+        if target == workers:
+            return workers
+
+        print(f"Scaling workers {workers}->{target} ({reason}; lag={self.lag}, pending={self.pending}, cpu={self.cpu:.0%})")
+        while len(self.children) < target:
+            self.spawn(next(slot for slot in range(self.max_workers) if slot not in self.children))
+        while len(self.children) > target:
+            # Entries the stopped child had in flight stay pending and are
+            # picked up by the other workers' PendingReclaimer.
+            await asyncio.get_running_loop().run_in_executor(None, self.stop_child, max(self.children))
+        self.last_scaled = time.monotonic()
+        return target
+
+    def status(self) -> dict:
+        children = [self.children[slot].status() for slot in sorted(self.children)]
+        return {
+            "workers": len(children),
+            "min_workers": self.min_workers,
+            "max_workers": self.max_workers,
+            "lag": self.lag,
+            "pending": self.pending,
+            "cpu_utilization": round(self.cpu, 3),
+            "crashes": self.crashes,
+            "processed": sum(child["processed"] for child in children),
+            "messages_per_second": round(sum(child["messages_per_second"] for child in children), 2),
+            "children": children,
+        }
+
+    async def run(self, stop_event: asyncio.Event = None):
+        stop_event = stop_event or asyncio.Event()
+        for slot in range(max(self.min_workers, min(self.initial_workers, self.max_workers))):
+            self.spawn(slot)
+
+        try:
+            while not stop_event.is_set():
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=self.interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                if stop_event.is_set():
+                    break
+                self.restart_crashed()
+                for child in self.children.values():
+                    child.sample()
+                await self.scale()
+        finally:
+            for slot in list(self.children):
+                self.stop_child(slot)
+
+
+async def main():
+    print("WorkerSupervisor starting...")
+    redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+    supervisor = WorkerSupervisor(redis_client)
+
+    server = StatusServer(port=int(os.getenv("SUPERVISOR_STATUS_PORT", "8081")))
+    server.route("/status", supervisor.status)
+    await server.start()
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    try:
+        await supervisor.run(stop_event)
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
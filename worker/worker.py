@@ -1,14 +1,30 @@
 import sys
 import os
+import json
+import time
+import random
 import asyncio
+from collections import OrderedDict
 from datetime import datetime, timezone
 import redis.asyncio as redis
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.database import AsyncSessionLocal
-from backend.models.models import SocialMediaPost, SentimentAnalysis
 from backend.services.sentiment_analyzer import SentimentAnalyzer
+from backend.services.inference_cache import InferenceCache
+from common.stream_codec import decode_entry
+from common.text_hash import text_hash
+from batch_scheduler import MicroBatchScheduler
+from batch_writer import BatchWriter
+from startup import WorkerStartup
+from retry_lane import RetryLane
+from reclaim import PendingReclaimer
+from adaptive import AdaptiveController
+from metrics import MetricsRegistry, CONTENT_TYPE
+from emotion_lane import EmotionBackfillLane
+from status_server import StatusServer
+from retention import StreamRetention
 
 REDIS_HOST = os.getenv("REDIS_HOST", "redis")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
@@ -17,16 +33,125 @@ CONSUMER_GROUP = os.getenv("REDIS_CONSUMER_GROUP", "sentiment_workers")
 
 
 class SentimentWorker:
-    def __init__(self, redis_client, db_session_maker, stream_name: str = None, consumer_group: str = None):
+    def __init__(self, redis_client, db_session_maker, stream_name: str = None, consumer_group: str = None,
+                 consumer_name: str = None):
         self.redis_client = redis_client
         self.db_session_maker = db_session_maker
         self.stream_name = stream_name or os.getenv("REDIS_STREAM_NAME", "social_posts_stream")
         self.consumer_group = consumer_group or os.getenv("REDIS_CONSUMER_GROUP", "sentiment_workers")
-        self.consumer_name = f"worker-{os.getpid()}"
-        self.analyzer = SentimentAnalyzer(model_type='local')
+        self.consumer_name = consumer_name or os.getenv("WORKER_CONSUMER_NAME") or f"worker-{os.getpid()}"
+        self.progress = None
+        cache = None
+        if os.getenv("INFERENCE_CACHE_ENABLED", "true").lower() == "true":
+            cache = InferenceCache(redis_client)
+        self.analyzer = SentimentAnalyzer(
+            model_type=os.getenv("ANALYZER_MODEL_TYPE", "local"),
+            cache=cache,
+            load_models=False
+        )
+        # With the inference cache off, repeats tagged by the ingester are still
+        # answered from recent results, looked up by their content_hash.
+        self.repeat_results = OrderedDict() if cache is None else None
+        self.repeat_results_size = int(os.getenv("WORKER_REPEAT_RESULTS_SIZE", "10000"))
+        self.repeats_served = 0
+        self.startup = WorkerStartup(redis_client, self.analyzer, self.consumer_name)
+        self.writer = BatchWriter(db_session_maker)
         self.messages_processed = 0
         self.errors = 0
-        self.max_retries = 3
+        self.redis_round_trips = 0
+        self.content_repeats = 0
+        self.max_retries = int(os.getenv("WORKER_MAX_RETRIES", "3"))
+        self.retry_lane = RetryLane(
+            redis_client,
+            self.stream_name,
+            self.consumer_group,
+            self.consumer_name,
+            max_attempts=self.max_retries
+        )
+        self.scheduler = MicroBatchScheduler(
+            self._read_messages,
+            max_batch_size=int(os.getenv("WORKER_MAX_BATCH_SIZE", "64")),
+            max_tokens=int(os.getenv("WORKER_MAX_BATCH_TOKENS", "8192")),
+            max_wait_ms=int(os.getenv("WORKER_MAX_WAIT_MS", "50"))
+        )
+        self.adaptive = None
+        if os.getenv("WORKER_ADAPTIVE_BATCHING", "true").lower() == "true":
+            self.adaptive = AdaptiveController(redis_client, self.stream_name, self.consumer_group, self.scheduler)
+        self.broadcast_channel = os.getenv("REDIS_BROADCAST_CHANNEL", "sentiment_updates")
+        self.last_batch_full = False
+        self.emotion_lane = None
+        if os.getenv("WORKER_DEFERRED_EMOTION", "false").lower() == "true":
+            self.emotion_lane = EmotionBackfillLane(
+                redis_client,
+                self.stream_name,
+                self.consumer_group,
+                self.consumer_name,
+                self.analyzer,
+                self.writer,
+                is_busy=lambda: self.last_batch_full,
+                broadcast_channel=self.broadcast_channel
+            )
+        reclaimed = [self.stream_name, self.retry_lane.retry_stream]
+        if self.emotion_lane is not None:
+            reclaimed.append(self.emotion_lane.emotion_stream)
+        self.reclaimer = PendingReclaimer(
+            redis_client,
+            reclaimed,
+            self.consumer_group,
+            self.consumer_name
+        )
+        self.retention = None
+        if os.getenv("STREAM_RETENTION_ENABLED", "true").lower() == "true":
+            retained = [self.stream_name, self.retry_lane.retry_stream, self.retry_lane.dead_stream]
+            if self.emotion_lane is not None:
+                retained += [self.emotion_lane.emotion_stream, self.emotion_lane.dead_stream]
+            self.retention = StreamRetention(redis_client, retained, self.consumer_name)
+        self.log_sample_rate = float(os.getenv("WORKER_LOG_SAMPLE_RATE", "0"))
+        self.stats_interval_seconds = float(os.getenv("WORKER_STATS_INTERVAL_SECONDS", "30"))
+        self.metrics_port = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+        self.metrics = MetricsRegistry()
+        self.stage_seconds = self.metrics.histogram(
+            "sentiment_worker_stage_seconds", "Seconds spent in each worker pipeline stage.", "stage"
+        )
+        self.analyzer.observer = self.stage_seconds.observe
+        self._register_metrics()
+
+    def _register_metrics(self):
+        def cache_hits():
+            cache = self.analyzer.cache
+            return self.repeats_served + (0 if cache is None else cache.local_hits + cache.redis_hits)
+
+        self.metrics.counter("sentiment_worker_processed_total", "Posts analyzed and persisted.",
+                             lambda: self.messages_processed)
+        self.metrics.counter("sentiment_worker_failed_total", "Failed processing attempts.", lambda: self.errors)
+        self.metrics.counter("sentiment_worker_retried_total", "Messages sent to the retry stream.",
+                             lambda: self.retry_lane.retried)
+        self.metrics.counter("sentiment_worker_dead_lettered_total", "Messages sent to the dead-letter stream.",
+                             lambda: self.retry_lane.dead_lettered)
+        self.metrics.counter("sentiment_worker_reclaimed_total", "Pending entries claimed from idle consumers.",
+                             lambda: self.reclaimer.reclaimed)
+        self.metrics.counter("sentiment_worker_cached_total", "Inference results served from the cache.", cache_hits)
+        self.metrics.counter("sentiment_worker_cascade_posts_total", "Posts decided by each cascade stage.",
+                             lambda: self.analyzer.stage_counts, label="stage")
+        self.metrics.counter("sentiment_worker_content_repeats_total", "Posts the ingester tagged as repeated content.",
+                             lambda: self.content_repeats)
+        self.metrics.counter("sentiment_worker_emotion_backfilled_total", "Deferred emotions written by the backfill lane.",
+                             lambda: 0 if self.emotion_lane is None else self.emotion_lane.backfilled)
+        self.metrics.counter("sentiment_worker_emotion_dead_lettered_total",
+                             "Deferred emotion entries dead-lettered after repeated failures.",
+                             lambda: 0 if self.emotion_lane is None else self.emotion_lane.dead_lettered)
+        self.metrics.gauge("sentiment_worker_batch_size", "Current micro-batch size limit.",
+                           lambda: self.scheduler.max_batch_size)
+        if self.retention is not None:
+            self.metrics.gauge("sentiment_worker_stream_length", "Entries in each Redis stream.",
+                               lambda: self.retention.lengths, label="stream")
+            self.metrics.gauge("sentiment_worker_stream_memory_bytes", "Redis MEMORY USAGE of each stream.",
+                               lambda: self.retention.memory_bytes, label="stream")
+            self.metrics.counter("sentiment_worker_stream_trimmed_total", "Stream entries trimmed by this worker.",
+                                 lambda: self.retention.trimmed)
+            self.metrics.counter("sentiment_worker_stream_force_trimmed_total",
+                                 "Unacknowledged entries dropped by the hard length ceiling.",
+                                 lambda: self.retention.forced_trimmed)
 
     async def _ensure_consumer_group(self):
         try:
@@ -40,136 +165,289 @@ class SentimentWorker:
         except Exception:
             pass
 
-    async def process_message(self, message_id: str, message_data: dict) -> bool:
-        retries = 0
-        while retries < self.max_retries:
-            try:
-                post_id = message_data.get("post_id")
-                content = message_data.get("content") or message_data.get("text")
-                platform = message_data.get("platform") or message_data.get("source", "unknown")
-                author = message_data.get("author", "anonymous")
-                created_at_str = message_data.get("created_at")
-
-                if not content or not post_id:
-                    await self.redis_client.xack(self.stream_name, self.consumer_group, message_id)
-                    return True
-
-
-                sentiment_task = self.analyzer.analyze_sentiment(content)
-                emotion_task = self.analyzer.analyze_emotion(content)
-                
-                sentiment_result, emotion_result = await asyncio.gather(sentiment_task, emotion_task)
-                
-
-                if not sentiment_result or not emotion_result:
-                     raise ValueError("Analysis returned empty results")
-
-                created_at = None
-                if created_at_str:
-                    try:
-                        created_at = datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
-                    except Exception:
-                        created_at = datetime.now(timezone.utc)
-
-                async with self.db_session_maker() as session:
-                    post = SocialMediaPost(
-                        post_id=post_id,
-                        platform=platform,
-                        content=content,
-                        author=author,
-                        created_at=created_at,
-                        ingested_at=datetime.now(timezone.utc)
-                    )
-                    session.add(post)
-
-                    try:
-                        await session.flush()
-                    except Exception:
-                        await session.rollback()
-                        async with self.db_session_maker() as new_session:
-                            analysis = SentimentAnalysis(
-                                post_id=post_id,
-                                model_name=sentiment_result["model_name"],
-                                sentiment_label=sentiment_result["sentiment_label"],
-                                confidence_score=sentiment_result["confidence_score"],
-                                emotion=emotion_result["emotion"],
-                                analyzed_at=datetime.now(timezone.utc)
-                            )
-                            new_session.add(analysis)
-                            await new_session.commit()
-                            await self.redis_client.xack(self.stream_name, self.consumer_group, message_id)
-                            self.messages_processed += 1
-                            return True
-
-                    analysis = SentimentAnalysis(
-                        post_id=post_id,
-                        model_name=sentiment_result["model_name"],
-                        sentiment_label=sentiment_result["sentiment_label"],
-                        confidence_score=sentiment_result["confidence_score"],
-                        emotion=emotion_result["emotion"],
-                        analyzed_at=datetime.now(timezone.utc)
-                    )
-                    session.add(analysis)
-                    await session.commit()
+    @property
+    def round_trips_per_message(self) -> float:
+        if not self.messages_processed:
+            return 0.0
+        round_trips = self.redis_round_trips
+        if self.analyzer.cache is not None:
+            round_trips += self.analyzer.cache.redis_round_trips
+        return round_trips / self.messages_processed
+
+    async def _ack(self, message_ids: list, stream_name: str = None, failed: list = None, processed: list = None):
+        if not message_ids:
+            return
+        started = time.perf_counter()
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            # Failed messages are re-queued, and deferred emotion work is
+            # queued, in the same round trip that acks them, so a crash can
+            # never drop a message between the two.
+            for message_id, message_data, error in failed or []:
+                self.retry_lane.enqueue(pipe, message_id, message_data, error)
+            if self.emotion_lane is not None:
+                for post, result in processed or []:
+                    if result["emotion"] is None:
+                        self.emotion_lane.enqueue(pipe, post, result)
+            pipe.xack(stream_name or self.stream_name, self.consumer_group, *message_ids)
+            if processed and self.broadcast_channel:
+                pipe.publish(self.broadcast_channel, self._broadcast_payload(processed))
+            await pipe.execute()
+        self.redis_round_trips += 1
+        self.stage_seconds.observe("ack", time.perf_counter() - started)
+
+    def _broadcast_payload(self, processed: list) -> str:
+        return json.dumps({
+            "type": "new_posts",
+            "posts": [
+                {
+                    "post_id": post["post_id"],
+                    "content": post["content"][:100],
+                    "platform": post["platform"],
+                    "sentiment_label": result["sentiment_label"],
+                    "confidence_score": result["confidence_score"],
+                    "emotion": result["emotion"],
+                }
+                for post, result in processed
+            ],
+        })
+
+    def _log_processed(self, post: dict, result: dict):
+        if self.log_sample_rate <= 0 or random.random() >= self.log_sample_rate:
+            return
+        print(f"Processed: {post['post_id']} | {result['sentiment_label']} ({result['confidence_score']:.2f}) | {result['emotion']}")
+
+    def _parse_message(self, message_data: dict):
+        try:
+            message_data = decode_entry(message_data)
+        except Exception as e:
+            print(f"Skipping undecodable stream entry: {e}")
+            return None
 
-                await self.redis_client.xack(self.stream_name, self.consumer_group, message_id)
-                self.messages_processed += 1
+        post_id = message_data.get("post_id")
+        content = message_data.get("content") or message_data.get("text")
+        if not content or not post_id:
+            return None
 
-                print(f"Processed: {post_id} | {sentiment_result['sentiment_label']} ({sentiment_result['confidence_score']:.2f}) | {emotion_result['emotion']}")
+        created_at = None
+        created_at_str = message_data.get("created_at")
+        if created_at_str:
+            try:
+                created_at = datetime.fromisoformat(created_at_str.replace('Z', '+00:00'))
+            except Exception:
+                created_at = datetime.now(timezone.utc)
+
+        return {
+            "post_id": post_id,
+            "platform": message_data.get("platform") or message_data.get("source", "unknown"),
+            "content": content,
+            "author": message_data.get("author", "anonymous"),
+            "created_at": created_at,
+            "content_hash": message_data.get("content_hash"),
+        }
+
+    async def process_message(self, message_id: str, message_data: dict, stream_name: str = None) -> bool:
+        try:
+            post = self._parse_message(message_data)
+            if post is None:
+                await self._ack([message_id], stream_name)
                 return True
 
-            except Exception as e:
-                retries += 1
-                self.errors += 1
-                print(f"Error processing message {message_id} (retry {retries}/{self.max_retries}): {e}")
-                if retries >= self.max_retries:
-                    await self.redis_client.xack(self.stream_name, self.consumer_group, message_id)
-                    return False
-                await asyncio.sleep(1)
+            results = await self._analyze([post])
+            if not results or not results[0]:
+                raise ValueError("Analysis returned empty results")
 
-        return False
+            result = results[0]
+            await self.writer.write([(post, result)])
 
-    async def run(self, batch_size: int = 10, block_ms: int = 5000):
+            await self._ack([message_id], stream_name, processed=[(post, result)])
+            self.messages_processed += 1
+
+            self._log_processed(post, result)
+            return True
+
+        except Exception as e:
+            self.errors += 1
+            attempt = int(message_data.get("_attempts", 0)) + 1
+            print(f"Error processing message {message_id} (attempt {attempt}/{self.max_retries}): {e}")
+            await self._ack([message_id], stream_name, failed=[(message_id, message_data, e)])
+            return False
+
+    async def _process_individually(self, posts: list, stream_name: str = None) -> int:
+        outcomes = await asyncio.gather(
+            *(self.process_message(message_id, message_data, stream_name) for message_id, message_data, _ in posts),
+            return_exceptions=True
+        )
+        return sum(1 for outcome in outcomes if outcome is True)
+
+    async def _analyze(self, posts: list) -> list:
+        with_emotion = self.emotion_lane is None
+        if self.repeat_results is None:
+            # Tagged repeats share the inference cache key, so batch_analyze
+            # serves them without another model pass.
+            return await self.analyzer.batch_analyze([post["content"] for post in posts], with_emotion=with_emotion)
+
+        results = [None] * len(posts)
+        pending = []
+        for i, post in enumerate(posts):
+            key = (post["content_hash"], with_emotion)
+            stored = self.repeat_results.get(key) if post["content_hash"] else None
+            if stored is None:
+                pending.append(i)
+            else:
+                self.repeat_results.move_to_end(key)
+                results[i] = dict(stored)
+                self.repeats_served += 1
+
+        if pending:
+            analyzed = await self.analyzer.batch_analyze([posts[i]["content"] for i in pending], with_emotion=with_emotion)
+            for i, result in zip(pending, analyzed):
+                results[i] = result
+                if result and self.repeat_results_size > 0:
+                    key = (posts[i]["content_hash"] or text_hash(posts[i]["content"]), with_emotion)
+                    self.repeat_results[key] = dict(result)
+                    self.repeat_results.move_to_end(key)
+            while len(self.repeat_results) > self.repeat_results_size:
+                self.repeat_results.popitem(last=False)
+        return results
+
+    async def process_batch(self, entries: list, stream_name: str = None) -> int:
+        posts = []
+        skipped_ids = []
+        for message_id, message_data in entries:
+            post = self._parse_message(message_data)
+            if post is None:
+                skipped_ids.append(message_id)
+            else:
+                posts.append((message_id, message_data, post))
+
+        if not posts:
+            await self._ack(skipped_ids, stream_name)
+            return 0
+
+        now_ms = time.time() * 1000
+        for message_id, _, _ in posts:
+            # Stream IDs start with the millisecond timestamp of the XADD.
+            self.stage_seconds.observe("queue_wait", max(0.0, now_ms - int(message_id.split("-")[0])) / 1000)
+        self.content_repeats += sum(1 for _, _, post in posts if post["content_hash"])
+
+        started = time.perf_counter()
+        try:
+            results = await self._analyze([post for _, _, post in posts])
+        except Exception as e:
+            print(f"Batch analysis failed, processing {len(posts)} messages individually: {e}")
+            await self._ack(skipped_ids, stream_name)
+            return await self._process_individually(posts, stream_name)
+
+        analyzed = time.perf_counter()
+        try:
+            await self.writer.write([(post, result) for (_, _, post), result in zip(posts, results)])
+        except Exception as e:
+            self.errors += 1
+            print(f"Batch write of {len(posts)} posts failed, retrying individually: {e}")
+            await self._ack(skipped_ids, stream_name)
+            return await self._process_individually(posts, stream_name)
+
+        written = time.perf_counter()
+        self.stage_seconds.observe("db_write", written - analyzed)
+        await self._ack(
+            skipped_ids + [message_id for message_id, _, _ in posts],
+            stream_name,
+            processed=[(post, result) for (_, _, post), result in zip(posts, results)]
+        )
+        self.messages_processed += len(posts)
+        if self.adaptive is not None:
+            self.adaptive.record(len(posts), analyzed - started, written - analyzed)
+
+        for (_, _, post), result in zip(posts, results):
+            self._log_processed(post, result)
+
+        return len(posts)
+
+    async def process_reclaimed(self, entries: list, stream_name: str = None) -> int:
+        if self.emotion_lane is not None and stream_name == self.emotion_lane.emotion_stream:
+            return await self.emotion_lane.process(entries)
+        return await self.process_batch(entries, stream_name=stream_name)
+
+    async def _read_messages(self, count: int, block_ms: int) -> list:
+        started = time.perf_counter()
+        messages = await self.redis_client.xreadgroup(
+            self.consumer_group,
+            self.consumer_name,
+            streams={self.stream_name: ">"},
+            count=count,
+            block=block_ms
+        )
+        self.redis_round_trips += 1
+        entries = [entry for _, entries in messages or [] for entry in entries]
+        if entries:
+            self.stage_seconds.observe("stream_read", time.perf_counter() - started)
+        return entries
+
+    async def run(self, batch_size: int = None, block_ms: int = 5000):
         await self._ensure_consumer_group()
+        if batch_size:
+            self.scheduler.max_batch_size = batch_size
+        self.scheduler.block_ms = block_ms
+        await self.startup.start()
+        asyncio.create_task(self.startup.heartbeat())
+        asyncio.create_task(self.retry_lane.drain(self.process_batch))
+        asyncio.create_task(self.reclaimer.run(self.process_reclaimed))
+        if self.adaptive is not None:
+            asyncio.create_task(self.adaptive.run())
+        if self.emotion_lane is not None:
+            asyncio.create_task(self.emotion_lane.run())
+        if self.retention is not None:
+            asyncio.create_task(self.retention.run())
+        if self.metrics_port:
+            server = StatusServer(port=self.metrics_port)
+            server.route("/metrics", self.metrics.render, CONTENT_TYPE)
+            await server.start()
         print(f"SentimentWorker {self.consumer_name} started. Waiting for messages from {self.stream_name}...")
 
+        last_stats = time.monotonic()
         while True:
             try:
-                messages = await self.redis_client.xreadgroup(
-                    self.consumer_group,
-                    self.consumer_name,
-                    streams={self.stream_name: ">"},
-                    count=batch_size,
-                    block=block_ms
-                )
-
-                if not messages:
+                batch = await self.scheduler.next_batch()
+                if not batch:
+                    self.last_batch_full = False
                     continue
 
-                tasks = []
-                for stream_name, entries in messages:
-                    for message_id, message_data in entries:
-                        tasks.append(self.process_message(message_id, message_data))
-
-                if tasks:
-                    await asyncio.gather(*tasks, return_exceptions=True)
-
-                if self.messages_processed > 0 and self.messages_processed % 10 == 0:
-                    print(f"Stats: processed={self.messages_processed}, errors={self.errors}")
+                self.last_batch_full = len(batch) >= self.scheduler.max_batch_size
+                await self.process_batch(batch)
+                if self.progress is not None:
+                    self.progress.value = self.messages_processed
+
+                # Time-based so the summary costs nothing per batch; the same
+                # numbers are on /metrics.
+                if self.stats_interval_seconds and time.monotonic() - last_stats >= self.stats_interval_seconds:
+                    last_stats = time.monotonic()
+                    print(
+                        f"Stats: processed={self.messages_processed}, errors={self.errors}, "
+                        f"retried={self.retry_lane.retried}, dead_lettered={self.retry_lane.dead_lettered}, "
+                        f"last_batch={len(batch)}, redis_round_trips/msg={self.round_trips_per_message:.3f}"
+                    )
+                    print(f"Pending reclaim: {self.reclaimer.stats()}")
+                    if self.retention is not None:
+                        print(f"Stream retention: {self.retention.stats()}")
+                    if self.analyzer.cache is not None:
+                        print(f"Inference cache: {self.analyzer.cache.stats()}")
+                    if self.analyzer.cascade:
+                        print(f"Cascade stage shares: {self.analyzer.stage_shares()}")
 
             except Exception as e:
                 print(f"Worker loop error: {e}")
                 await asyncio.sleep(5)
 
 
-async def main():
+async def main(consumer_name: str = None, progress=None):
     print("SentimentWorker starting...")
-    print("Loading ML models...")
 
     redis_client = redis.Redis(
         host=REDIS_HOST,
         port=REDIS_PORT,
-        decode_responses=True
+        decode_responses=True,
+        # msgpack payloads are not valid UTF-8; keep their bytes recoverable.
+        encoding_errors="surrogateescape"
     )
 
     while True:
@@ -185,10 +463,15 @@ async def main():
         redis_client=redis_client,
         db_session_maker=AsyncSessionLocal,
         stream_name=STREAM_NAME,
-        consumer_group=CONSUMER_GROUP
+        consumer_group=CONSUMER_GROUP,
+        consumer_name=consumer_name
     )
+    worker.progress = progress
 
-    await worker.run()
+    try:
+        await worker.run()
+    finally:
+        await worker.startup.stop()
 
 
 if __name__ == "__main__":